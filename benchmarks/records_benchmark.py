@@ -0,0 +1,105 @@
+"""Compare dict-built pairs against msgspec records on 100-pair responses
+
+Each approach starts from the raw response bytes, as the service does.
+
+Run from the repository root:
+
+    python benchmarks/records_benchmark.py
+"""
+import json
+import random
+import sys
+import timeit
+import tracemalloc
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import msgspec  # noqa: E402
+
+from services.records import Pair, TokenInfo, convert  # noqa: E402
+from services.schemas import NewPairsData, gmgn_decoder  # noqa: E402
+
+PAIR_COUNT = 100
+TOKEN_KEYS = list(TokenInfo.__struct_fields__)
+PAIR_KEYS = ["id", "quote_reserve", "initial_liquidity", "initial_quote_reserve", "creator",
+             "pool_type_str", "pool_type", "quote_symbol", "open_timestamp", "launchpad"]
+
+
+def make_upstream_pair(i: int) -> dict:
+    """A GMGN new_pairs entry, including fields the server never reads"""
+    token = {
+        "symbol": f"TKN{i}", "name": f"Token {i}", "logo": f"https://cdn.example/{i}.png",
+        "total_supply": 1_000_000_000, "price": str(random.random()), "holder_count": random.randint(100, 5000),
+        "launchpad_status": 1, "price_change_percent1m": "0.5", "price_change_percent5m": "-1.2",
+        "price_change_percent1h": "12.8", "burn_ratio": "1", "burn_status": "burn", "is_show_alert": False,
+        "hot_level": 1, "liquidity": str(random.random() * 1e6), "top_10_holder_rate": "0.21",
+        "renounced_mint": 1, "renounced_freeze_account": 1, "market_cap": str(random.random() * 1e7),
+        "creator_balance_rate": "0.0", "creator_token_status": "creator_close", "rat_trader_amount_rate": 0.01,
+        "bluechip_owner_percentage": 0.02, "smart_degen_count": 3, "renowned_count": 1,
+        "volume": str(random.random() * 1e6), "swaps": 1200, "buys": 700, "sells": 500, "buy_tax": None,
+        "sell_tax": None, "is_honeypot": 0, "renounced": 1, "dev_token_burn_amount": None,
+        "dev_token_burn_ratio": None, "dexscr_ad": 0, "dexscr_update_link": 0, "cto_flag": 0,
+        "twitter_change_flag": 0, "address": f"Mint{i:040d}",
+        "social_links": {"twitter_username": f"tkn{i}", "website": "", "telegram": ""},
+        "pool_info": {"reserve": "123.4", "fee": "0.25"}, "image_dex": "https://cdn.example/dex.png",
+    }
+    return {
+        "id": i, "address": f"Pool{i:040d}", "base_address": f"Mint{i:040d}", "quote_address": "So11111111111111111111111111111111111111112",
+        "quote_reserve": "84.2", "initial_liquidity": "20.1", "initial_quote_reserve": "79.0",
+        "creator": f"Creator{i:033d}", "pool_type_str": "raydium", "pool_type": 1, "quote_symbol": "SOL",
+        "base_token_info": token, "open_timestamp": 1736000000 + i, "launchpad": "pump",
+        "creation_timestamp": 1735990000 + i, "quote_token_info": {"symbol": "SOL", "decimals": 9},
+    }
+
+
+def build_dicts(payload: bytes) -> List[dict]:
+    """The pre-records approach: json.loads, then copy every field into nested dicts"""
+    return [
+        {
+            **{key: pair.get(key) for key in PAIR_KEYS},
+            "address": pair["base_address"],
+            "base_token_info": {key: pair["base_token_info"].get(key) for key in TOKEN_KEYS},
+        }
+        for pair in json.loads(payload)["data"]["pairs"]
+    ]
+
+
+def build_records(payload: bytes) -> List[Pair]:
+    """json.loads, then convert the decoded dicts into records"""
+    return convert(json.loads(payload)["data"]["pairs"], List[Pair])
+
+
+def decode_records(payload: bytes) -> List[Pair]:
+    """One pass from bytes into records, as GMGNScanService._make_request does"""
+    return gmgn_decoder(NewPairsData).decode(payload).data.pairs
+
+
+def retained_bytes(build, payload: bytes, copies: int = 50) -> float:
+    """Average bytes kept alive per cached response once the decoded JSON is gone"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    kept = [build(payload) for _ in range(copies)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del kept
+    return size / copies
+
+
+def main():
+    random.seed(1)
+    pairs = [make_upstream_pair(i) for i in range(PAIR_COUNT)]
+    payload = msgspec.json.encode({"code": 0, "data": {"pairs": pairs}})
+
+    print(f"{PAIR_COUNT}-pair response, {len(payload) / 1024:.1f} KiB of JSON\n")
+    print(f"{'approach':<10}{'build (us)':>14}{'retained (KiB)':>18}")
+    for label, build in (("dicts", build_dicts), ("records", build_records), ("decoded", decode_records)):
+        runs = 200
+        seconds = timeit.timeit(lambda: build(payload), number=runs) / runs
+        print(f"{label:<10}{seconds * 1e6:>14.1f}{retained_bytes(build, payload) / 1024:>18.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,26 @@
 from pydantic import BaseModel, Field
 from typing import Optional, List
-from services.etherscan_service import EtherscanService
+from services.etherscan_service import ETHERSCAN_ENS_LIMIT, EtherscanService
 from services.gmgnscan_service import GMGNScanService
 from services.solscan_nokey_service import SolscanService
-from services.solana_explorer_service import SolanaExplorerService
+from services.solana_explorer_service import TRANSFER_CACHE_MAX, SolanaExplorerService
 from services.solbreach import SolbeachService
 import os
 from dotenv import load_dotenv
 from typing import Any
 import asyncio
+import anyio
+import contextvars
+import uuid
 import httpx
 import time
+from decimal import Decimal
 from mcp.server.models import InitializationOptions
 from mcp.types import (
     ClientCapabilities,
     TextContent,
     Tool,
+    Resource,
     ListRootsResult,
     RootsCapability,
     CallToolResult
@@ -31,8 +36,21 @@ from starlette.applications import Starlette
 from starlette.routing import Route,Mount
 from starlette.requests import Request
 from mcp.server.sse import SseServerTransport
-from starlette.responses import Response
+from starlette.responses import JSONResponse, Response
 from services.aveai_service import AveAIService
+from services.market_refresher import MarketRefresher
+from services.subscription_hub import SubscriptionHub
+from services.token_table import TokenTable, INDEXED_FIELDS
+from services.records import number
+from services.deadline import call_scope, run_in_thread
+from services.token_flows import format_units
+from services.gas_sampler import GasSampler
+from services.abi_views import render_page, select_entries
+from services.cache_snapshot import load_snapshot, write_snapshot
+from services.session_scheduler import FairScheduler, QuotaExceeded, parse_limits
+from pydantic import AnyUrl
+from contextlib import aclosing, asynccontextmanager
+from functools import partial
  
 
 
@@ -49,15 +67,30 @@ ETHERSCAN_API_KEY = os.getenv("ETHERSCAN_API_KEY")
 if not ETHERSCAN_API_KEY:
     raise ValueError("ETHERSCAN_API_KEY environment variable is required")
 
-etherscan_service = EtherscanService(api_key=ETHERSCAN_API_KEY)
+# Optional JSON-RPC node for balance, gas and code reads (falls back to Etherscan)
+ETH_RPC_URL = os.getenv("ETH_RPC_URL")
+
+etherscan_service = EtherscanService(api_key=ETHERSCAN_API_KEY, rpc_url=ETH_RPC_URL)
 gmgnscan_service = GMGNScanService()
 solscan_service = SolscanService()
 solbeach_service = SolbeachService()
-solana_explorer_service = SolanaExplorerService()
+# Solana JSON-RPC endpoint for account and token reads (defaults to the public explorer API)
+solana_explorer_service = SolanaExplorerService(
+    rpc_url=os.getenv("SOLANA_RPC_URL"),
+    ws_url=os.getenv("SOLANA_WS_URL")
+)
 
 class CheckBalanceInput(BaseModel):
     address: str = Field(..., description="Ethereum address (0x format)", pattern=r"^0x[a-fA-F0-9]{40}$")
 
+class CheckBalancesInput(BaseModel):
+    addresses: List[str] = Field(..., min_length=1, max_length=100, description="Ethereum addresses (0x format)")
+
+class TokenBalancesInput(BaseModel):
+    address: str = Field(..., description="Ethereum address (0x format)", pattern=r"^0x[a-fA-F0-9]{40}$")
+    tokens: Optional[List[str]] = Field(None, max_length=5000, description="ERC20 token contracts to check; defaults to every token in the address's transfer history")
+    include_zero: bool = Field(default=False, description="Include tokens with a zero balance")
+
 class TransactionHistoryInput(BaseModel):
     address: str = Field(..., description="Ethereum address (0x format)", pattern=r"^0x[a-fA-F0-9]{40}$")
     startblock: Optional[int] = Field(0, description="Starting block number")
@@ -65,32 +98,66 @@ class TransactionHistoryInput(BaseModel):
     page: Optional[int] = Field(1, ge=1, description="Page number")
     offset: Optional[int] = Field(10, ge=1, le=100, description="Number of transactions per page")
     sort: Optional[str] = Field("desc", description="Sort by 'asc' or 'desc'")
+    decode: bool = Field(default=True, description="Decode called functions from the local selector index")
+    include_logs: bool = Field(default=False, description="Also fetch receipts and decode each transaction's event logs; a transaction whose receipt could not be read is marked as such")
 
 class TokenTransferInput(BaseModel):
     address: str = Field(..., description="Ethereum address (0x format)", pattern=r"^0x[a-fA-F0-9]{40}$")
  #   limit: Optional[int] = Field(Query(None, ge=1, le=100), description="Number of transfers to return (max 100)")
 
+class TokenFlowInput(BaseModel):
+    address: str = Field(..., description="Ethereum address (0x format)", pattern=r"^0x[a-fA-F0-9]{40}$")
+    contract_address: Optional[str] = Field(None, description="Only aggregate this token contract (0x format)", pattern=r"^0x[a-fA-F0-9]{40}$")
+    max_transfers: int = Field(default=2000, ge=1, le=10000, description="Maximum number of transfers to aggregate, oldest first")
+    top_tokens: int = Field(default=20, ge=1, le=100, description="Number of tokens to report, busiest first")
+    top_counterparties: int = Field(default=3, ge=0, le=20, description="Number of counterparties to list per token")
+    label_counterparties: bool = Field(default=False, description="Show ENS names next to listed counterparties")
+
 class ContractInput(BaseModel):
     address: str = Field(..., description="Contract address (0x format)", pattern=r"^0x[a-fA-F0-9]{40}$")
+    kind: str = Field(default="all", description="Entries to include (all/functions/events/errors)", pattern=r"^(all|functions|events|errors)$")
+    name_filter: Optional[str] = Field(None, description="Only include entries whose name contains this text (case-insensitive)")
+    format: str = Field(default="signatures", description="Output format: one-line signatures, minified json, or pretty json", pattern=r"^(signatures|json|pretty)$")
+    max_bytes: int = Field(default=16000, ge=1000, le=200000, description="Maximum size of the returned entries in bytes")
+    cursor: int = Field(default=0, ge=0, description="Index of the first entry to return, from a previous page's next cursor")
+
+class ContractCodeInput(BaseModel):
+    address: str = Field(..., description="Ethereum address (0x format)", pattern=r"^0x[a-fA-F0-9]{40}$")
+
+class GasStatsInput(BaseModel):
+    windows: List[int] = Field(default=[5, 60], min_length=1, max_length=6, description="Time windows in minutes to compute statistics over")
 
 class ENSNameInput(BaseModel):
     address: str = Field(..., description="Ethereum address (0x format)", pattern=r"^0x[a-fA-F0-9]{40}$")
 
+class ENSNamesInput(BaseModel):
+    addresses: List[str] = Field(..., min_length=1, max_length=200, description="Ethereum addresses (0x format)")
+
 class SolbeachAccountInput(BaseModel):
     address: str = Field(..., description="Solana address")
 
 class SolanaExplorerAccountInput(BaseModel):
     address: str = Field(..., description="Solana address")
 
+# GMGN holdings paged through for get-sol-token-holdings prices
+PRICED_HOLDINGS_MAX = 1000
+
+class SolTokenHoldingsInput(BaseModel):
+    address: str = Field(..., description="Solana wallet address")
+    include_zero: bool = Field(default=False, description="Include empty token accounts")
+    with_prices: bool = Field(default=False, description="Overlay GMGN prices and USD values (rate-limited GMGN requests, one per 100 holdings)")
+    limit: int = Field(default=50, ge=1, le=1000, description="Maximum number of tokens to list")
+
 class GetWalletHoldingsInput(BaseModel):
     chain: str = Field(default="sol", description="Chain name (e.g. sol)")
     address: str = Field(..., description="Wallet address")
-    limit: int = Field(default=10, ge=1, le=100, description="Number of holdings to return")
+    limit: int = Field(default=10, ge=1, le=100, description="Number of holdings to return (page size when max_holdings is set)")
     orderby: str = Field(default="last_active_timestamp", description="Field to order results by")
     direction: str = Field(default="desc", description="Sort direction (asc/desc)")
     showsmall: bool = Field(default=False, description="Show small holdings")
     sellout: bool = Field(default=False, description="Show sold out tokens")
     hide_abnormal: bool = Field(default=True, description="Hide abnormal tokens")
+    max_holdings: Optional[int] = Field(default=None, ge=1, le=5000, description="Follow pagination until this many holdings are fetched")
 
 class GetNewPairsInput(BaseModel):
     chain: str = Field(default="sol", description="Chain name (e.g. sol)")
@@ -151,6 +218,18 @@ class GetNewPairsInput(BaseModel):
 
  
 
+class GetEnrichedNewPairsInput(GetNewPairsInput):
+    kline_resolution: str = Field(
+        default="1h",
+        description="Kline period attached to each pair (5m, 1h, 4h, 1d, 1w)"
+    )
+    kline_hours: int = Field(
+        default=24,
+        ge=1,
+        le=24 * 30,
+        description="Hours of kline history attached to each pair"
+    )
+
 class GetTokenKlineInput(BaseModel):
     chain: str = Field(default="sol", description="Chain name (e.g. sol)")
     token_address: str = Field(..., description="Token address")
@@ -171,14 +250,28 @@ class GetTokenKlineInput(BaseModel):
 
 class GetSOLTransfersInput(BaseModel):
     address: str = Field(..., description="Solana address")
-    page: int = Field(default=1, ge=1, description="Page number")
-    page_size: int = Field(default=10, ge=1, le=50, description="Number of items per page")
-    sort_by: str = Field(default="block_time", description="Field to sort by")
-    sort_order: str = Field(default="desc", description="Sort direction (asc/desc)")
+    limit: int = Field(default=20, ge=1, le=500, description="Number of transfers to return, newest first")
+    max_signatures: int = Field(default=200, ge=1, le=5000, description="How many recent transactions to scan (cached between calls)")
+    mint: Optional[str] = Field(default=None, description="Only transfers of this token mint (use SOL for native SOL)")
 
 class GetSOLTokenSecurityInput(BaseModel):
     chain: str = Field(default="sol", description="Chain name (e.g. sol)")
     token_address: str = Field(..., description="SOL Token address")
+
+class ScreenSOLTokenSecurityInput(BaseModel):
+    chain: str = Field(default="sol", description="Chain name (e.g. sol)")
+    token_addresses: List[str] = Field(..., min_length=1, max_length=200, description="SOL Token addresses to screen")
+
+class RangeFilter(BaseModel):
+    field: str = Field(..., description=f"Indexed field ({', '.join(INDEXED_FIELDS)})")
+    min: Optional[float] = Field(default=None, description="Inclusive lower bound")
+    max: Optional[float] = Field(default=None, description="Inclusive upper bound")
+
+class QueryTokenTableInput(BaseModel):
+    filters: List[RangeFilter] = Field(default=[], description="Range filters, all must match")
+    sort_by: str = Field(default="market_cap", description=f"Field to order results by ({', '.join(INDEXED_FIELDS)})")
+    direction: str = Field(default="desc", description="Sort direction (asc/desc)", pattern=r"^(asc|desc)$")
+    limit: int = Field(default=20, ge=1, le=500, description="Number of tokens to return")
 # class ListToolsResponse(BaseModel):
 #     tools: List[Tool]
 
@@ -190,6 +283,166 @@ class GetTreasureListInput(BaseModel):
     page_no: int = Field(default=1, ge=1, description="Page number")
     page_size: int = Field(default=50, ge=1, le=100, description="Page size")
     category: str = Field(default="hot", description="Category (e.g. hot)")
+    total: Optional[int] = Field(default=None, ge=1, le=1000, description="Fetch pages concurrently until this many pairs are collected (page_no is ignored)")
+
+# Default parameter sets that make up most calls; kept warm in the background
+DEFAULT_NEW_PAIRS_INPUT = GetNewPairsInput()
+DEFAULT_TREASURE_LIST_INPUT = GetTreasureListInput()
+
+market_refresher = MarketRefresher(
+    interval=float(os.getenv("MARKET_REFRESH_INTERVAL", "15")),
+    max_interval=float(os.getenv("MARKET_REFRESH_MAX_INTERVAL", "300")),
+    idle_after=float(os.getenv("MARKET_REFRESH_IDLE_AFTER", "120"))
+)
+
+async def fetch_default_new_pairs():
+    return await gmgnscan_service.get_new_pairs(**DEFAULT_NEW_PAIRS_INPUT.model_dump())
+
+async def fetch_default_treasure_list():
+    with AveAIService() as service:
+        return await run_in_thread(
+            service.get_treasure_list, **DEFAULT_TREASURE_LIST_INPUT.model_dump(exclude={"total"})
+        )
+
+# Pair records from both sources, queryable locally without another upstream call
+token_table = TokenTable(row_ttl=float(os.getenv("TOKEN_TABLE_ROW_TTL", "900")))
+TOKEN_TABLE_MAX_AGE = float(os.getenv("TOKEN_TABLE_MAX_AGE", "60"))
+
+market_refresher.register(
+    "new-pairs", fetch_default_new_pairs, on_update=partial(token_table.ingest, source="gmgn")
+)
+market_refresher.register(
+    "hot-pairs", fetch_default_treasure_list, on_update=partial(token_table.ingest, source="ave")
+)
+
+async def refresh_token_table():
+    async def pairs_for(key, fetch):
+        snapshot = market_refresher.get(key)
+        return snapshot.data if snapshot else await fetch()
+
+    gmgn_pairs, ave_pairs = await asyncio.gather(
+        pairs_for("new-pairs", fetch_default_new_pairs),
+        pairs_for("hot-pairs", fetch_default_treasure_list),
+        return_exceptions=True
+    )
+    for pairs, source in ((gmgn_pairs, "gmgn"), (ave_pairs, "ave")):
+        if not isinstance(pairs, Exception):
+            token_table.ingest(pairs, source=source)
+
+# Gas prices sampled in the background; tools and the gas feed read the ring buffer
+gas_sampler = GasSampler(
+    etherscan_service.get_gas_oracle,
+    interval=float(os.getenv("GAS_SAMPLE_INTERVAL", "12")),
+    capacity=int(os.getenv("GAS_SAMPLE_CAPACITY", "1800"))
+)
+
+def format_decoded(decoded: dict) -> str:
+    if decoded["args"] is None:
+        return f"{decoded['signature']} (arguments did not decode)"
+    name = decoded["signature"].split("(", 1)[0]
+    return f"{name}(" + ", ".join(f"{arg}={value}" if arg else value for arg, value in decoded["args"]) + ")"
+
+def format_call(tx: dict) -> str:
+    selector = tx["input"][:10]
+    if tx.get("call"):
+        return f"{format_decoded(tx['call'])} [{selector}]"
+    # Etherscan's own label when the ABI has not been indexed yet
+    if tx.get("functionName"):
+        return f"{tx['functionName']} [{selector}]"
+    return f"unknown selector {selector}"
+
+def format_price(price: Any) -> str:
+    """A price in plain decimal notation, so $0.0000054 never shows as $5.4e-06
+
+    Strings are shown as the upstream sent them.
+    """
+    if isinstance(price, (int, float)) and not isinstance(price, bool):
+        return format(Decimal(repr(price)), "f")
+    return str(price)
+
+def format_log(log: dict) -> str:
+    if log["event"]:
+        return f"{log['address']} {format_decoded(log['event'])}"
+    return f"{log['address']} unknown topic {log['topic']}"
+
+async def current_gas_sample():
+    return gas_sampler.latest(max_age=gas_sampler.interval * 2) or await gas_sampler.sample()
+
+async def fetch_gas_prices_feed():
+    sample = await current_gas_sample()
+    return {"safeGwei": str(sample.safe), "proposeGwei": str(sample.propose), "fastGwei": str(sample.fast)}
+
+GAS_PRICES_URI = "feed://gas-prices"
+NEW_PAIRS_URI = "feed://new-pairs"
+
+async def fetch_new_pairs_feed():
+    snapshot = market_refresher.get("new-pairs")
+    return snapshot.data if snapshot else await fetch_default_new_pairs()
+
+# One shared upstream poller per feed, however many sessions subscribe
+subscription_hub = SubscriptionHub()
+subscription_hub.register(
+    GAS_PRICES_URI,
+    fetch_gas_prices_feed,
+    interval=float(os.getenv("GAS_PRICES_FEED_INTERVAL", "12"))
+)
+subscription_hub.register(
+    NEW_PAIRS_URI,
+    fetch_new_pairs_feed,
+    interval=float(os.getenv("NEW_PAIRS_FEED_INTERVAL", "15"))
+)
+
+@server.list_resources()
+async def handle_list_resources() -> list[Resource]:
+    """
+    List subscribable feeds.
+    """
+    return [
+        Resource(
+            uri=AnyUrl(GAS_PRICES_URI),
+            name="gas-prices",
+            description="Current Ethereum gas prices in Gwei; subscribe for change notifications",
+            mimeType="application/json"
+        ),
+        Resource(
+            uri=AnyUrl(NEW_PAIRS_URI),
+            name="new-pairs",
+            description="New trading pairs from GMGN with default filters; subscribe for change notifications",
+            mimeType="application/json"
+        ),
+    ]
+
+class SSEConnection:
+    """One SSE connection and the MCP session it carries, once a request has seen it"""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex[:12]
+        self.session: Any = None
+
+# Handlers run inside handle_sse's task, so they see its connection
+current_connection: contextvars.ContextVar[Optional[SSEConnection]] = contextvars.ContextVar(
+    "current_connection", default=None
+)
+
+def request_session() -> Any:
+    """The current request's session, remembered on its connection for cleanup"""
+    session = server.request_context.session
+    connection = current_connection.get()
+    if connection is not None:
+        connection.session = session
+    return session
+
+@server.read_resource()
+async def handle_read_resource(uri: AnyUrl) -> str:
+    return await subscription_hub.read(str(uri))
+
+@server.subscribe_resource()
+async def handle_subscribe_resource(uri: AnyUrl) -> None:
+    subscription_hub.subscribe(str(uri), request_session())
+
+@server.unsubscribe_resource()
+async def handle_unsubscribe_resource(uri: AnyUrl) -> None:
+    subscription_hub.unsubscribe(str(uri), request_session())
 
 @server.list_tools()
 async def handle_list_tools() -> list[Tool]:
@@ -217,9 +470,19 @@ async def handle_list_tools() -> list[Tool]:
             # }
             inputSchema=CheckBalanceInput.model_json_schema()
         ),
+        Tool(
+            name="get-eth-balances",
+            description="Check the ETH balances of up to 100 Eth addresses in one call",
+            inputSchema=CheckBalancesInput.model_json_schema()
+        ),
+        Tool(
+            name="get-erc20-balances",
+            description="Get current ERC20 token balances of an Ethereum address, for given tokens or every token it has transferred",
+            inputSchema=TokenBalancesInput.model_json_schema()
+        ),
         Tool(
             name="get-transactions",
-            description="Get transaction history for an Ethereum address",
+            description="Get transaction history for an Ethereum address, with called functions and event logs decoded from ABIs fetched so far",
              
             inputSchema=TransactionHistoryInput.model_json_schema()
         ),
@@ -245,9 +508,19 @@ async def handle_list_tools() -> list[Tool]:
             # }
             inputSchema=TokenTransferInput.model_json_schema()
         ),
+        Tool(
+            name="get-token-flows",
+            description="Summarize an Ethereum address's ERC20 history per token: inflow, outflow, net change, counterparties and first/last activity",
+            inputSchema=TokenFlowInput.model_json_schema()
+        ),
+        Tool(
+            name="get-contract-code",
+            description="Check whether an Ethereum address holds contract code and how large it is",
+            inputSchema=ContractCodeInput.model_json_schema()
+        ),
         Tool(
             name="get-contract-abi",
-            description="Get the ABI for a smart contract",
+            description="Get the ABI for a smart contract as signatures or JSON, filtered and paged to a byte budget",
             # inputSchema={
             #     "type": "object",
             #     "properties": {
@@ -266,6 +539,11 @@ async def handle_list_tools() -> list[Tool]:
             description="Get current gas prices in Gwei",
             inputSchema={"type": "object", "properties": {}},
         ),
+        Tool(
+            name="get-gas-stats",
+            description="Get gas price percentiles, min/max and trend over recent time windows from the background sampler",
+            inputSchema=GasStatsInput.model_json_schema()
+        ),
         Tool(
             name="get-ens-name",
             description="Get the ENS name for an Ethereum address",
@@ -282,11 +560,27 @@ async def handle_list_tools() -> list[Tool]:
             # },
             inputSchema=ENSNameInput.model_json_schema()
         ),
+        Tool(
+            name="get-ens-names",
+            description="Get verified ENS names for up to 200 Ethereum addresses at once, e.g. to label counterparties. "
+                        f"Without ETH_RPC_URL only {ETHERSCAN_ENS_LIMIT} uncached addresses are resolved per call; call again for the rest",
+            inputSchema=ENSNamesInput.model_json_schema()
+        ),
         Tool(
             name="get-new-pairs",
             description="Get new trading pairs from GMGN",
             inputSchema=GetNewPairsInput.model_json_schema()
         ),
+        Tool(
+            name="get-new-pairs-enriched",
+            description="Get new trading pairs from GMGN with token security and kline summary for each pair in one call",
+            inputSchema=GetEnrichedNewPairsInput.model_json_schema()
+        ),
+        Tool(
+            name="query-token-table",
+            description="Filter, sort and rank recently seen tokens from GMGN new pairs and Ave hot pairs locally",
+            inputSchema=QueryTokenTableInput.model_json_schema()
+        ),
         Tool(
             name="get-token-kline",
             description="Get token kline data OHLCV from GMGN",
@@ -318,22 +612,121 @@ async def handle_list_tools() -> list[Tool]:
             description="Get sol wallet holdings  token from GMGN",
             inputSchema=GetWalletHoldingsInput.model_json_schema()
         ),
-        # Tool(
-        #     name="get-sol-transfers",
-        #     description="Get Solana account transfer history",
-        #     inputSchema=GetSOLTransfersInput.model_json_schema()
-        # ),
+        Tool(
+            name="get-sol-token-holdings",
+            description="Get SPL token balances of a Solana wallet directly from RPC, optionally with GMGN prices",
+            inputSchema=SolTokenHoldingsInput.model_json_schema()
+        ),
+        Tool(
+            name="get-sol-transfers",
+            description="Get Solana account transfer history (SOL and SPL tokens) from RPC",
+            inputSchema=GetSOLTransfersInput.model_json_schema()
+        ),
         Tool(
             name="get-sol-token-security",
             description="Get SOL token security information from GMGN",
             inputSchema=GetSOLTokenSecurityInput.model_json_schema()
         ),
+        Tool(
+            name="screen-sol-token-security",
+            description="Screen security information for a list of SOL tokens from GMGN in one call",
+            inputSchema=ScreenSOLTokenSecurityInput.model_json_schema()
+        ),
  
     ]
 
   
+# Per-tool deadlines in seconds; a client may ask for its own with `_meta.timeout`
+DEFAULT_TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "30"))
+MAX_TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT_MAX", "300"))
+TOOL_TIMEOUTS = {
+    "get-sol-transfers": 90,
+    "get-erc20-balances": 60,
+    "get-token-flows": 60,
+    "get-ens-names": 60,
+    "get-sol-wallet-holdings": 60,
+    "screen-sol-token-security": 60,
+    "get-new-pairs-enriched": 90,
+    "get-hot-pairs": 60,
+    "get-pairs": 60,
+}
+
+# Relative upstream cost of a call, charged against the session's quota and
+# used to weigh it in the fair queue; tools not listed cost 1
+TOOL_COSTS = {
+    "get-new-pairs-enriched": 5,
+    "screen-sol-token-security": 5,
+    "get-hot-pairs": 4,
+    "get-pairs": 4,
+    "get-sol-transfers": 4,
+    "get-token-flows": 4,
+    "get-erc20-balances": 3,
+    "get-sol-wallet-holdings": 3,
+}
+# Tools answered from in-process state; charged but never queued. Each check
+# says whether the call can be answered without going upstream right now:
+# gas prices and the token table only fetch when their data is stale
+LOCAL_TOOLS = {
+    "get-gas-stats": lambda: True,
+    "get-gas-prices": lambda: gas_sampler.latest(max_age=gas_sampler.interval * 2) is not None,
+    "query-token-table": lambda: not token_table.is_stale(TOKEN_TABLE_MAX_AGE),
+}
+
+default_session_limits, client_session_limits = parse_limits(os.getenv("SESSION_LIMITS", ""))
+scheduler = FairScheduler(
+    capacity=int(os.getenv("SCHEDULER_CAPACITY", "16")),
+    default_limits=default_session_limits,
+    client_limits=client_session_limits,
+    idle_ttl=float(os.getenv("SESSION_IDLE_TTL", "3600"))
+)
+
+def session_client(session: Any) -> str:
+    client_params = getattr(session, "client_params", None)
+    return client_params.clientInfo.name if client_params else "unknown"
+
+def tool_timeout(name: str) -> float:
+    meta = server.request_context.meta
+    requested = getattr(meta, "timeout", None) if meta else None
+    try:
+        if requested is not None and float(requested) > 0:
+            return min(float(requested), MAX_TOOL_TIMEOUT)
+    except (TypeError, ValueError):
+        pass
+    return TOOL_TIMEOUTS.get(name, DEFAULT_TOOL_TIMEOUT)
+
 @server.call_tool()
-async def call_tool( name: str, arguments: dict | None) -> Any:
+async def call_tool(name: str, arguments: dict | None) -> Any:
+    """Run a tool under its deadline and its session's share of the upstream
+
+    The deadline caps every upstream request the tool makes, including those
+    in executor threads, and time spent queued behind other sessions. When
+    the call times out or is cancelled because the client went away, its
+    scope is marked cancelled so threads still holding it stop before
+    issuing another request.
+    """
+    timeout = tool_timeout(name)
+    session = request_session()
+    connection = current_connection.get()
+    local = LOCAL_TOOLS.get(name)
+    with call_scope(timeout) as scope:
+        try:
+            async with asyncio.timeout(timeout):
+                async with scheduler.slot(
+                    connection.id if connection is not None else "local",
+                    session_client(session),
+                    name,
+                    cost=TOOL_COSTS.get(name, 1),
+                    queued=local is None or not local()
+                ):
+                    return await run_tool(name, arguments)
+        except QuotaExceeded as error:
+            raise ValueError(str(error))
+        except TimeoutError:
+            raise ValueError(f"Tool {name} timed out after {timeout:g}s")
+        finally:
+            scope.cancelled.set()
+
+async def run_tool( name: str, arguments: dict | None) -> Any:
     """
    
     Tools can fetch web3 data and notify clients of changes.
@@ -370,6 +763,39 @@ async def call_tool( name: str, arguments: dict | None) -> Any:
         except Exception as e:
             raise ValueError(f"Unknown tool: {e}")
 
+    elif name == "get-eth-balances":
+        try:
+            input_data = CheckBalancesInput(**arguments)
+            balances = await etherscan_service.get_address_balances(input_data.addresses)
+            response = "".join(
+                f"Address: {balance['address']}\nBalance: {balance['balanceInEth']}\n"
+                for balance in balances
+            )
+            return [TextContent(type="text", text=response)]
+        except Exception as e:
+            raise ValueError(f"Error getting balances: {str(e)}")
+
+    elif name == "get-erc20-balances":
+        try:
+            input_data = TokenBalancesInput(**arguments)
+            balances = await etherscan_service.get_token_balances(
+                input_data.address,
+                tokens=input_data.tokens,
+                include_zero=input_data.include_zero
+            )
+            formatted_balances = [
+                f"{balance['symbol'] or '?'}: {balance['balance']} ({balance['token']})\n"
+                for balance in balances
+            ]
+            response = (
+                f"ERC20 balances for {input_data.address}:\n\n{''.join(formatted_balances)}"
+                if balances
+                else f"No ERC20 balances found for {input_data.address}"
+            )
+            return [TextContent(type="text", text=response)]
+        except Exception as e:
+            raise ValueError(f"Error getting ERC20 balances: {str(e)}")
+
     elif name == "get-transactions":
         try:
             input_data = TransactionHistoryInput(**arguments)
@@ -381,6 +807,8 @@ async def call_tool( name: str, arguments: dict | None) -> Any:
                 offset=input_data.offset,
                 sort=input_data.sort
             )
+            if input_data.decode or input_data.include_logs:
+                transactions = await etherscan_service.decode_transactions(transactions, input_data.include_logs)
             formatted_transactions = [
                 f"Block {tx['blockNumber']}:\n"
                 f"Time: {tx['timestamp']}\n"
@@ -388,7 +816,10 @@ async def call_tool( name: str, arguments: dict | None) -> Any:
                 f"From: {tx['from']}\n"
                 f"To: {tx['to']}\n"
                 f"Value: {tx['value']} ETH\n"
-                f"---\n"
+                + (f"Call: {format_call(tx)}\n" if input_data.decode and (tx.get('input') or "0x") != "0x" else "")
+                + "".join(f"Log: {format_log(log)}\n" for log in tx.get('logs') or [])
+                + (f"Logs unavailable: {tx['logs_error']}\n" if tx.get('logs_error') else "")
+                + f"---\n"
                 for tx in transactions
             ]
             response = (
@@ -424,28 +855,129 @@ async def call_tool( name: str, arguments: dict | None) -> Any:
         except Exception as e:
             raise ValueError(f"Unknown tool: {e}")
 
+    elif name == "get-token-flows":
+        try:
+            input_data = TokenFlowInput(**arguments)
+            result = await etherscan_service.get_token_flows(
+                input_data.address,
+                contract_address=input_data.contract_address,
+                max_transfers=input_data.max_transfers
+            )
+            flows = result["flows"]
+            shown = flows[:input_data.top_tokens]
+
+            labels = {}
+            if input_data.label_counterparties:
+                labels = await etherscan_service.get_ens_names(list({
+                    address
+                    for flow in shown
+                    for address, _ in flow.counterparties.most_common(input_data.top_counterparties)
+                }))
+
+            def format_flow(flow):
+                summary = flow.summary(input_data.top_counterparties)
+                counterparties = ", ".join(
+                    f"{address}{f' [{labels[address]}]' if labels.get(address) else ''} ({count})"
+                    for address, count in summary["top_counterparties"]
+                )
+                return (
+                    f"Token: {summary['name']} ({summary['symbol']})\n"
+                    f"Contract: {summary['contract']}\n"
+                    f"Inflow: {summary['inflow']} ({summary['transfers_in']} transfers)\n"
+                    f"Outflow: {summary['outflow']} ({summary['transfers_out']} transfers)\n"
+                    f"Net: {summary['net']}\n"
+                    f"Counterparties: {summary['counterparty_count']}"
+                    + (f" - top: {counterparties}" if counterparties else "") + "\n"
+                    f"First Activity: {datetime.fromtimestamp(summary['first_timestamp']).strftime('%Y-%m-%d %H:%M:%S')}\n"
+                    f"Last Activity: {datetime.fromtimestamp(summary['last_timestamp']).strftime('%Y-%m-%d %H:%M:%S')}\n"
+                    f"---\n"
+                )
+
+            if not flows:
+                return [TextContent(type="text", text=f"No token transfers found for {input_data.address}")]
+            header = (
+                f"Token flows for {result['address']} "
+                f"({result['transfer_count']} transfers across {len(flows)} tokens"
+                + (", oldest only - raise max_transfers for more" if result["truncated"] else "") + f"):\n\n"
+            )
+            footer = f"\n{len(flows) - len(shown)} more tokens not shown" if len(flows) > len(shown) else ""
+            return [TextContent(type="text", text=header + "".join(format_flow(flow) for flow in shown) + footer)]
+        except Exception as e:
+            raise ValueError(f"Error getting token flows: {str(e)}")
+
+    elif name == "get-contract-code":
+        try:
+            input_data = ContractCodeInput(**arguments)
+            code = await etherscan_service.get_code(input_data.address)
+            size = (len(code) - 2) // 2
+            response = (
+                f"Address {input_data.address} is a contract with {size} bytes of code"
+                if size
+                else f"Address {input_data.address} has no code (externally owned account)"
+            )
+            return [TextContent(type="text", text=response)]
+        except Exception as e:
+            raise ValueError(f"Error getting contract code: {str(e)}")
+
     elif name == "get-contract-abi":
         try:
             input_data = ContractInput(**arguments)
             abi_data = await etherscan_service.get_contract_abi(input_data.address)
-            formatted_abi = json.dumps(abi_data["abi"], indent=2)
-            return [TextContent(type="text", text=f"Contract ABI for {abi_data['address']}:\n\n{formatted_abi}")]
+            entries = select_entries(abi_data["abi"], input_data.kind, input_data.name_filter)
+            if input_data.cursor >= len(entries):
+                return [TextContent(type="text", text=f"No ABI entries for {abi_data['address']} at cursor {input_data.cursor} ({len(entries)} matching)")]
+
+            page, next_cursor = render_page(entries, input_data.format, input_data.max_bytes, input_data.cursor)
+            end = next_cursor if next_cursor is not None else len(entries)
+            header = f"Contract ABI for {abi_data['address']} (entries {input_data.cursor + 1}-{end} of {len(entries)}"
+            header += f", next cursor: {next_cursor})" if next_cursor is not None else ")"
+            return [TextContent(type="text", text=f"{header}:\n\n{page}")]
         except Exception as e:
             raise ValueError(f"Error getting contract ABI: {str(e)}")
 
     elif name == "get-gas-prices":
         try:
-            prices = await etherscan_service.get_gas_oracle()
+            sample = await current_gas_sample()
             response = (
                 "Current Gas Prices:\n"
-                f"Safe Low: {prices['safeGwei']} Gwei\n"
-                f"Standard: {prices['proposeGwei']} Gwei\n"
-                f"Fast: {prices['fastGwei']} Gwei"
+                f"Safe Low: {sample.safe:g} Gwei\n"
+                f"Standard: {sample.propose:g} Gwei\n"
+                f"Fast: {sample.fast:g} Gwei\n"
+                f"Sampled: {time.time() - sample.timestamp:.0f}s ago"
             )
             return [TextContent(type="text", text=response)]
         except Exception as e:
             raise ValueError(f"Unknown tool: {e}")
 
+    elif name == "get-gas-stats":
+        try:
+            input_data = GasStatsInput(**arguments)
+            latest = gas_sampler.latest()
+            if latest is None:
+                return [TextContent(type="text", text="No gas samples recorded yet")]
+
+            sections = [
+                f"Latest ({time.time() - latest.timestamp:.0f}s ago): "
+                f"Safe Low {latest.safe:g} / Standard {latest.propose:g} / Fast {latest.fast:g} Gwei\n"
+            ]
+            for minutes in input_data.windows:
+                stats = gas_sampler.stats(minutes * 60)
+                if stats is None:
+                    sections.append(f"\nLast {minutes} min: no samples\n")
+                    continue
+                lines = [f"\nLast {minutes} min ({stats['count']} samples over {stats['span'] / 60:.1f} min):\n"]
+                for tier, label in (("safe", "Safe Low"), ("propose", "Standard"), ("fast", "Fast")):
+                    tier_stats = stats[tier]
+                    lines.append(
+                        f"{label}: min {tier_stats['min']:.3g} / p10 {tier_stats['p10']:.3g} / "
+                        f"p50 {tier_stats['p50']:.3g} / p90 {tier_stats['p90']:.3g} / max {tier_stats['max']:.3g} Gwei, "
+                        f"trend {tier_stats['slope_per_minute']:+.3g} Gwei/min\n"
+                    )
+                sections.append("".join(lines))
+            return [TextContent(type="text", text="Gas Price Statistics:\n\n" + "".join(sections))]
+        except Exception as e:
+            raise ValueError(f"Error getting gas stats: {str(e)}")
+
     elif name == "get-ens-name":
         try:
             input_data = ENSNameInput(**arguments)
@@ -455,10 +987,23 @@ async def call_tool( name: str, arguments: dict | None) -> Any:
         except Exception as e:
             raise ValueError(f"Unknown tool: {e}")
 
+    elif name == "get-ens-names":
+        try:
+            input_data = ENSNamesInput(**arguments)
+            names = await etherscan_service.get_ens_names(input_data.addresses)
+            response = "".join(
+                f"{address}: {names[address] or '-'}\n" if address in names else f"{address}: not resolved yet, call again\n"
+                for address in dict.fromkeys(input_data.addresses)
+            )
+            return [TextContent(type="text", text=response)]
+        except Exception as e:
+            raise ValueError(f"Error getting ENS names: {str(e)}")
+
     elif name == "get-new-pairs":
         try:
             input_data = GetNewPairsInput(**arguments)
-            pairs = await gmgnscan_service.get_new_pairs(
+            snapshot = market_refresher.get("new-pairs") if input_data == DEFAULT_NEW_PAIRS_INPUT else None
+            pairs = snapshot.data if snapshot else await gmgnscan_service.get_new_pairs(
                 chain=input_data.chain,
                 period=input_data.period,
                 limit=input_data.limit,
@@ -469,43 +1014,45 @@ async def call_tool( name: str, arguments: dict | None) -> Any:
                 orderby=input_data.orderby,
                 direction=input_data.direction
             )
+            if not snapshot:
+                token_table.ingest(pairs, source="gmgn")
             formatted_pairs = [
-                (f"CA address: {pair['address']}\n"
-                f"Token: {pair['base_token_info']['name']} ({pair['base_token_info']['symbol']})\n"
-                f"Price: ${pair['base_token_info']['price']}\n"
-                f"Market Cap: ${pair['base_token_info']['market_cap']}\n"
+                (f"CA address: {pair.address}\n"
+                f"Token: {pair.base_token_info.name} ({pair.base_token_info.symbol})\n"
+                f"Price: ${format_price(pair.base_token_info.price)}\n"
+                f"Market Cap: ${pair.base_token_info.market_cap}\n"
                 f"Price Changes:\n"
-                f"1h: {pair['base_token_info']['price_change_percent1h']}%\n"
-                f"5m: {pair['base_token_info']['price_change_percent5m']}%\n"
-                f"1m: {pair['base_token_info']['price_change_percent1m']}%\n"
-                f"Liquidity: ${pair['base_token_info']['liquidity']}\n"
-                f"Volume: ${pair['base_token_info']['volume']}\n"
+                f"1h: {pair.base_token_info.price_change_percent1h}%\n"
+                f"5m: {pair.base_token_info.price_change_percent5m}%\n"
+                f"1m: {pair.base_token_info.price_change_percent1m}%\n"
+                f"Liquidity: ${pair.base_token_info.liquidity}\n"
+                f"Volume: ${pair.base_token_info.volume}\n"
                 f"Trading Activity:\n"
-                f"Total Swaps: {pair['base_token_info']['swaps']}\n"
-                f"Buys: {pair['base_token_info']['buys']}\n"
-                f"Sells: {pair['base_token_info']['sells']}\n"
-                f"Holders: {pair['base_token_info']['holder_count']}\n"
-                f"Top 10 Holders: {float(pair['base_token_info']['top_10_holder_rate'])*100:.2f}%\n"
+                f"Total Swaps: {pair.base_token_info.swaps}\n"
+                f"Buys: {pair.base_token_info.buys}\n"
+                f"Sells: {pair.base_token_info.sells}\n"
+                f"Holders: {pair.base_token_info.holder_count}\n"
+                f"Top 10 Holders: {(number(pair.base_token_info.top_10_holder_rate) or 0)*100:.2f}%\n"
                 f"Token Info:\n"
-                f"Total Supply: {pair['base_token_info']['total_supply']}\n"
-                f"Burn Ratio: {pair['base_token_info']['burn_ratio']}\n"
-                f"Burn Status: {pair['base_token_info']['burn_status']}\n"
+                f"Total Supply: {pair.base_token_info.total_supply}\n"
+                f"Burn Ratio: {pair.base_token_info.burn_ratio}\n"
+                f"Burn Status: {pair.base_token_info.burn_status}\n"
                 f"Creator Info:\n"
-                f"Creator: {pair['creator']}\n"
-                f"Creator Balance: {float(pair['base_token_info']['creator_balance_rate'])*100:.4f}%\n"
-                f"Creator Status: {pair['base_token_info']['creator_token_status']}\n"
+                f"Creator: {pair.creator}\n"
+                f"Creator Balance: {(number(pair.base_token_info.creator_balance_rate) or 0)*100:.4f}%\n"
+                f"Creator Status: {pair.base_token_info.creator_token_status}\n"
                 f"Security:\n"
-                f"Honeypot: {pair['base_token_info']['is_honeypot']}\n"
-                f"Renounced: {pair['base_token_info']['renounced']}\n"
-                f"Renounced Mint: {pair['base_token_info']['renounced_mint']}\n"
-                f"Renounced Freeze: {pair['base_token_info']['renounced_freeze_account']}\n"
+                f"Honeypot: {pair.base_token_info.is_honeypot}\n"
+                f"Renounced: {pair.base_token_info.renounced}\n"
+                f"Renounced Mint: {pair.base_token_info.renounced_mint}\n"
+                f"Renounced Freeze: {pair.base_token_info.renounced_freeze_account}\n"
                 f"Pool Info:\n"
-                f"  Type: {pair['pool_type_str']}\n"
-                f"  Quote Symbol: {pair['quote_symbol']}\n"
-                f"  Quote Reserve: {pair['quote_reserve']}\n"
-                f"  Initial Liquidity: {pair['initial_liquidity']}\n"
-                f"Social Links: {', '.join(f'{k}: {v}' for k,v in pair['base_token_info']['social_links'].items() if v)}\n"
-                f"Launch Time: {datetime.fromtimestamp(pair['open_timestamp']).strftime('%Y-%m-%d %H:%M:%S')}\n"
+                f"  Type: {pair.pool_type_str}\n"
+                f"  Quote Symbol: {pair.quote_symbol}\n"
+                f"  Quote Reserve: {pair.quote_reserve}\n"
+                f"  Initial Liquidity: {pair.initial_liquidity}\n"
+                f"Social Links: {', '.join(f'{k}: {v}' for k,v in (pair.base_token_info.social_links or {}).items() if v)}\n"
+                f"Launch Time: {datetime.fromtimestamp(number(pair.open_timestamp) or 0).strftime('%Y-%m-%d %H:%M:%S')}\n"
                 f"---\n").encode('utf-8').decode('utf-8')
                 for pair in pairs
             ]
@@ -515,6 +1062,85 @@ async def call_tool( name: str, arguments: dict | None) -> Any:
             error_msg = str(e).encode('utf-8').decode('utf-8')
             raise ValueError(f"Error getting new pairs: {error_msg}")
 
+    elif name == "get-new-pairs-enriched":
+        try:
+            input_data = GetEnrichedNewPairsInput(**arguments)
+            list_input = GetNewPairsInput(**input_data.model_dump(exclude={"kline_resolution", "kline_hours"}))
+            snapshot = market_refresher.get("new-pairs") if list_input == DEFAULT_NEW_PAIRS_INPUT else None
+            pairs = snapshot.data if snapshot else await gmgnscan_service.get_new_pairs(**list_input.model_dump())
+            to_time = int(time.time())
+            enriched = await gmgnscan_service.enrich_pairs(
+                chain=input_data.chain,
+                pairs=pairs,
+                resolution=input_data.kline_resolution,
+                from_time=to_time - input_data.kline_hours * 60 * 60,
+                to_time=to_time,
+                concurrency=int(os.getenv("TOKEN_SECURITY_CONCURRENCY", "8"))
+            )
+
+            def format_enriched(item):
+                pair, security, klines = item["pair"], item["security"], item["klines"]
+                token = pair.base_token_info
+                text = (
+                    f"CA address: {pair.address}\n"
+                    f"Token: {token.name} ({token.symbol})\n"
+                    f"Price: ${format_price(token.price)} | Market Cap: ${token.market_cap} | "
+                    f"Liquidity: ${token.liquidity} | Holders: {token.holder_count}\n"
+                )
+                if security:
+                    text += (
+                        f"Security: alert={security.is_show_alert} "
+                        f"top10={security.top_10_holder_rate} "
+                        f"renounced_mint={security.renounced_mint} "
+                        f"renounced_freeze={security.renounced_freeze_account} "
+                        f"burn={security.burn_ratio} ({security.burn_status})\n"
+                    )
+                if klines:
+                    first_open = float(klines[0].open)
+                    last_close = float(klines[-1].close)
+                    change = (last_close / first_open - 1) * 100 if first_open else 0
+                    text += (
+                        f"Kline ({input_data.kline_resolution} x{len(klines)}): "
+                        f"close ${last_close:.8f} change {change:.2f}% "
+                        f"high ${max(float(k.high) for k in klines):.8f} "
+                        f"low ${min(float(k.low) for k in klines):.8f} "
+                        f"volume {sum(float(k.volume) for k in klines):.2f}\n"
+                    )
+                for lookup, error in item["errors"].items():
+                    text += f"{lookup} unavailable: {error}\n"
+                return text + "---\n"
+
+            response = "Enriched New Trading Pairs:\n\n" + "\n".join(format_enriched(item) for item in enriched)
+            return [TextContent(type="text", text=response)]
+        except Exception as e:
+            raise ValueError(f"Error getting enriched new pairs: {str(e)}")
+
+    elif name == "query-token-table":
+        try:
+            input_data = QueryTokenTableInput(**arguments)
+            if token_table.is_stale(TOKEN_TABLE_MAX_AGE):
+                await refresh_token_table()
+            rows = token_table.query(
+                filters=[(f.field, f.min, f.max) for f in input_data.filters],
+                sort_by=input_data.sort_by,
+                direction=input_data.direction,
+                limit=input_data.limit
+            )
+            formatted_rows = [
+                f"{row['address']} | {row['symbol']} | {row['source']} | ${row['price']} | "
+                f"${row['market_cap']} | ${row['liquidity']} | ${row['volume']} | "
+                f"{row['holder_count']} | {row['price_change_1h']}% | {row['open_timestamp']}"
+                for row in rows
+            ]
+            response = (
+                f"Tokens ({len(rows)} of {len(token_table.rows)}):\n"
+                "Address | Symbol | Source | Price | Market Cap | Liquidity | Volume | Holders | 1h Change | Open Timestamp\n"
+                + "\n".join(formatted_rows)
+            )
+            return [TextContent(type="text", text=response)]
+        except Exception as e:
+            raise ValueError(f"Error querying token table: {str(e)}")
+
     elif name == "get-token-kline":
         try:
             input_data = GetTokenKlineInput(**arguments)
@@ -527,12 +1153,12 @@ async def call_tool( name: str, arguments: dict | None) -> Any:
             )
             
             formatted_klines = [
-                (f"Time: {datetime.fromtimestamp(int(kline['time'])/1000).strftime('%Y-%m-%d %H:%M:%S')}\n"
-                f"Open:   ${float(kline['open']):.8f}\n"
-                f"High:   ${float(kline['high']):.8f}\n"
-                f"Low:    ${float(kline['low']):.8f}\n"
-                f"Close:  ${float(kline['close']):.8f}\n"
-                f"Volume: {float(kline['volume']):.2f}\n"
+                (f"Time: {datetime.fromtimestamp(int(kline.time)/1000).strftime('%Y-%m-%d %H:%M:%S')}\n"
+                f"Open:   ${float(kline.open):.8f}\n"
+                f"High:   ${float(kline.high):.8f}\n"
+                f"Low:    ${float(kline.low):.8f}\n"
+                f"Close:  ${float(kline.close):.8f}\n"
+                f"Volume: {float(kline.volume):.2f}\n"
                 f"---\n").encode('utf-8').decode('utf-8')
                 for kline in klines
             ]
@@ -547,29 +1173,44 @@ async def call_tool( name: str, arguments: dict | None) -> Any:
     elif name == "get-sol-transfers":
         try:
             input_data = GetSOLTransfersInput(**arguments)
-            transfers = await solscan_service.get_account_transfers(
+            history = await solana_explorer_service.get_transfer_history(
                 address=input_data.address,
-                page=input_data.page,
-                page_size=input_data.page_size,
-                sort_by=input_data.sort_by,
-                sort_order=input_data.sort_order
+                max_signatures=input_data.max_signatures
+            )
+
+            transfers = history["transfers"]
+            if input_data.mint:
+                mint = None if input_data.mint.upper() == "SOL" else input_data.mint
+                transfers = [transfer for transfer in transfers if transfer["mint"] == mint]
+            transfers = transfers[:input_data.limit]
+            mints = await solana_explorer_service.get_mint_info(
+                list({transfer["mint"] for transfer in transfers if transfer["mint"]})
+            )
+
+            def format_transfer(transfer):
+                token = "SOL" if transfer["mint"] is None else (mints.get(transfer["mint"], {}).get("symbol") or transfer["mint"])
+                time_text = datetime.fromtimestamp(transfer["time"]).strftime('%Y-%m-%d %H:%M:%S') if transfer["time"] else "unknown"
+                return (
+                    f"Transaction: {transfer['signature']}\n"
+                    f"Time: {time_text}\n"
+                    f"Direction: {transfer['direction']}\n"
+                    f"From: {transfer['from']}\n"
+                    f"To: {transfer['to']}\n"
+                    f"Token: {token}\n"
+                    f"Amount: {format_units(transfer['amount'], transfer['decimals'])}\n"
+                    f"---\n"
+                )
+
+            scanned = f"{history['signatures']} transactions scanned"
+            if history["truncated"]:
+                scanned += f", truncated at {TRANSFER_CACHE_MAX} transfers"
+            elif history["exhausted"]:
+                scanned += ", full history"
+            response = (
+                f"Solana Account Transfers ({scanned}):\n\n" + "".join(format_transfer(transfer) for transfer in transfers)
+                if transfers
+                else f"No transfers found for {input_data.address} ({scanned})"
             )
-            
-            formatted_transfers = [
-                (f"Transaction: {transfer['transaction_id']}\n"
-                f"Time: {transfer['datetime']}\n"
-                f"Type: {transfer['type']}\n"
-                f"From: {transfer['from']}\n"
-                f"To: {transfer['to']}\n"
-                f"Token: {transfer['token']}\n"
-                f"Amount: {transfer['amount'] / (10 ** transfer['decimals'])}\n"
-                f"Direction: {transfer['direction']}\n"
-                f"---\n").encode('utf-8').decode('utf-8')
-                for transfer in transfers
-            ]
-            
-            response = ("Solana Account Transfers:\n\n" + 
-                       "\n".join(formatted_transfers)).encode('utf-8').decode('utf-8')
             return [TextContent(type="text", text=response)]
         except Exception as e:
             error_msg = str(e).encode('utf-8').decode('utf-8')
@@ -602,30 +1243,111 @@ async def call_tool( name: str, arguments: dict | None) -> Any:
     elif name == "get-sol-wallet-holdings":
         try:
             input_data = GetWalletHoldingsInput(**arguments)
-            holdings = await gmgnscan_service.get_wallet_holdings(
+
+            def format_holding(holding):
+                return (
+                    f"Token: {holding.token.name} ({holding.token.symbol})\n"
+                    f"Balance: {holding.balance}\n"
+                    f"USD Value: ${holding.usd_value}\n"
+                    f"Price: ${holding.price}\n"
+                    f"Total Profit: ${holding.total_profit}\n"
+                    f"Last Active: {datetime.fromtimestamp(holding.last_active_timestamp).strftime('%Y-%m-%d %H:%M:%S')}\n"
+                    f"---\n"
+                )
+
+            if input_data.max_holdings is None:
+                holdings = await gmgnscan_service.get_wallet_holdings(
+                    chain=input_data.chain,
+                    address=input_data.address,
+                    limit=input_data.limit,
+                    orderby=input_data.orderby,
+                    direction=input_data.direction,
+                    showsmall=input_data.showsmall,
+                    sellout=input_data.sellout,
+                    hide_abnormal=input_data.hide_abnormal
+                )
+                formatted_holdings = [format_holding(holding) for holding in holdings]
+                return [TextContent(type="text", text="Wallet Holdings:\n\n" + "".join(formatted_holdings))]
+
+            # Report each page to the client as it arrives when it asked for progress
+            meta = server.request_context.meta
+            progress_token = meta.progressToken if meta else None
+            formatted_holdings = []
+            async for page in gmgnscan_service.iter_wallet_holdings(
                 chain=input_data.chain,
                 address=input_data.address,
-                limit=input_data.limit,
+                max_holdings=input_data.max_holdings,
+                page_size=input_data.limit,
                 orderby=input_data.orderby,
                 direction=input_data.direction,
                 showsmall=input_data.showsmall,
                 sellout=input_data.sellout,
                 hide_abnormal=input_data.hide_abnormal
-            )
-            formatted_holdings = [
-                f"Token: {holding['token']['name']} ({holding['token']['symbol']})\n"
-                f"Balance: {holding['balance']}\n"
-                f"USD Value: ${holding['usd_value']}\n"
-                f"Price: ${holding['price']}\n"
-                f"Total Profit: ${holding['total_profit']}\n"
-                f"Last Active: {datetime.fromtimestamp(holding['last_active_timestamp']).strftime('%Y-%m-%d %H:%M:%S')}\n"
-                f"---\n"
-                for holding in holdings
-            ]
-            return [TextContent(type="text", text="Wallet Holdings:\n\n" + "".join(formatted_holdings))]
+            ):
+                formatted_holdings.extend(format_holding(holding) for holding in page)
+                if progress_token is not None:
+                    await server.request_context.session.send_progress_notification(
+                        progress_token, len(formatted_holdings), input_data.max_holdings
+                    )
+            return [TextContent(
+                type="text",
+                text=f"Wallet Holdings ({len(formatted_holdings)}):\n\n" + "".join(formatted_holdings)
+            )]
         except Exception as e:
             raise ValueError(f"Error getting wallet holdings: {str(e)}")
     
+    elif name == "get-sol-token-holdings":
+        try:
+            input_data = SolTokenHoldingsInput(**arguments)
+            holdings = await solana_explorer_service.get_token_holdings(
+                input_data.address, include_zero=input_data.include_zero
+            )
+
+            prices = {}
+            note = ""
+            if input_data.with_prices and holdings:
+                try:
+                    # Page through GMGN until every held mint is priced
+                    wanted = {holding["mint"] for holding in holdings}
+                    async with aclosing(gmgnscan_service.iter_wallet_holdings(
+                        chain="sol", address=input_data.address, max_holdings=PRICED_HOLDINGS_MAX,
+                        showsmall=True, hide_abnormal=False
+                    )) as pages:
+                        async for page in pages:
+                            prices.update((holding.token.address, holding) for holding in page if holding.token.address)
+                            if wanted <= prices.keys():
+                                break
+                    unpriced = len(wanted - prices.keys())
+                    if unpriced:
+                        note = f"\n({unpriced} of {len(wanted)} tokens have no GMGN price)"
+                    solana_explorer_service.remember_mints({
+                        address: {"symbol": holding.token.symbol, "name": holding.token.name}
+                        for address, holding in prices.items()
+                    })
+                    holdings.sort(key=lambda h: float(prices[h["mint"]].usd_value or 0) if h["mint"] in prices else -1, reverse=True)
+                except Exception as e:
+                    note = f"\n(GMGN prices unavailable: {str(e)})"
+
+            def format_token_holding(holding):
+                priced = prices.get(holding["mint"])
+                symbol = holding["symbol"] or (priced.token.symbol if priced else None) or "?"
+                name = holding["name"] or (priced.token.name if priced else None) or "unknown"
+                line = f"Token: {name} ({symbol})\nMint: {holding['mint']}\nBalance: {holding['amount']}\n"
+                if priced:
+                    line += f"Price: ${priced.price}\nUSD Value: ${priced.usd_value}\n"
+                return line + "---\n"
+
+            shown = holdings[:input_data.limit]
+            response = (
+                f"Token Holdings for {input_data.address} ({len(holdings)} tokens):\n\n"
+                + "".join(format_token_holding(holding) for holding in shown)
+                if holdings
+                else f"No token holdings found for {input_data.address}"
+            ) + note
+            return [TextContent(type="text", text=response)]
+        except Exception as e:
+            raise ValueError(f"Error getting token holdings: {str(e)}")
+
     elif name == "get-sol-token-security":
         try:
             input_data = GetSOLTokenSecurityInput(**arguments)
@@ -634,53 +1356,96 @@ async def call_tool( name: str, arguments: dict | None) -> Any:
                 token_address=input_data.token_address
             )
             response = (
-                f"Token Security for {security_info['address']}:\n"
-                f"Show Alert: {security_info.get('is_show_alert')}\n"
-                f"Top 10 Holder Rate: {security_info.get('top_10_holder_rate')}\n"
-                f"Renounced Mint: {security_info.get('renounced_mint')}\n"
-                f"Renounced Freeze Account: {security_info.get('renounced_freeze_account')}\n"
-                f"Burn Ratio: {security_info.get('burn_ratio')}\n"
-                f"Burn Status: {security_info.get('burn_status')}\n"
-                f"Dev Token Burn Amount: {security_info.get('dev_token_burn_amount')}\n"
-                f"Dev Token Burn Ratio: {security_info.get('dev_token_burn_ratio')}\n"
+                f"Token Security for {security_info.address}:\n"
+                f"Show Alert: {security_info.is_show_alert}\n"
+                f"Top 10 Holder Rate: {security_info.top_10_holder_rate}\n"
+                f"Renounced Mint: {security_info.renounced_mint}\n"
+                f"Renounced Freeze Account: {security_info.renounced_freeze_account}\n"
+                f"Burn Ratio: {security_info.burn_ratio}\n"
+                f"Burn Status: {security_info.burn_status}\n"
+                f"Dev Token Burn Amount: {security_info.dev_token_burn_amount}\n"
+                f"Dev Token Burn Ratio: {security_info.dev_token_burn_ratio}\n"
      
             )
             return [TextContent(type="text", text=response)]
         except Exception as e:
             raise ValueError(f"Error getting token security: {str(e)}")
 
+    elif name == "screen-sol-token-security":
+        try:
+            input_data = ScreenSOLTokenSecurityInput(**arguments)
+            screening = await gmgnscan_service.screen_token_security(
+                chain=input_data.chain,
+                token_addresses=input_data.token_addresses,
+                concurrency=int(os.getenv("TOKEN_SECURITY_CONCURRENCY", "8"))
+            )
+            rows = [
+                f"{address} | {info.is_show_alert} | {info.top_10_holder_rate} | "
+                f"{info.renounced_mint} | {info.renounced_freeze_account} | "
+                f"{info.burn_ratio} | {info.burn_status}"
+                for address, info in screening["results"].items()
+            ]
+            response = (
+                f"Token Security ({len(screening['results'])} ok, {len(screening['errors'])} failed):\n"
+                "Address | Show Alert | Top 10 Holder Rate | Renounced Mint | Renounced Freeze | Burn Ratio | Burn Status\n"
+                + "\n".join(rows)
+            )
+            if screening["errors"]:
+                response += "\n\nErrors:\n" + "\n".join(
+                    f"{address}: {error}" for address, error in screening["errors"].items()
+                )
+            return [TextContent(type="text", text=response)]
+        except Exception as e:
+            raise ValueError(f"Error screening token security: {str(e)}")
+
     elif name == "get-hot-pairs" or name == "get-pairs":
         try:
             input_data = GetTreasureListInput(**arguments)
+            snapshot = market_refresher.get("hot-pairs") if input_data == DEFAULT_TREASURE_LIST_INPUT else None
             with AveAIService() as service:
-                pairs = service.get_treasure_list(
-                    marketcap_min=input_data.marketcap_min,
-                    tvl_min=input_data.tvl_min,
-                    smart_money_buy_count_24h_min=input_data.smart_money_buy_count_24h_min,
-                    smart_money_sell_count_24h_min=input_data.smart_money_sell_count_24h_min,
-                    page_no=input_data.page_no,
-                    page_size=input_data.page_size,
-                    category=input_data.category
-                )
+                if input_data.total:
+                    pairs = await run_in_thread(
+                        service.get_treasure_list_many,
+                        total=input_data.total,
+                        marketcap_min=input_data.marketcap_min,
+                        tvl_min=input_data.tvl_min,
+                        smart_money_buy_count_24h_min=input_data.smart_money_buy_count_24h_min,
+                        smart_money_sell_count_24h_min=input_data.smart_money_sell_count_24h_min,
+                        page_size=input_data.page_size,
+                        category=input_data.category
+                    )
+                else:
+                    pairs = snapshot.data if snapshot else await run_in_thread(
+                        service.get_treasure_list,
+                        marketcap_min=input_data.marketcap_min,
+                        tvl_min=input_data.tvl_min,
+                        smart_money_buy_count_24h_min=input_data.smart_money_buy_count_24h_min,
+                        smart_money_sell_count_24h_min=input_data.smart_money_sell_count_24h_min,
+                        page_no=input_data.page_no,
+                        page_size=input_data.page_size,
+                        category=input_data.category
+                    )
+                if not snapshot:
+                    token_table.ingest(pairs, source="ave")
                 
                 formatted_pairs = [
-                #    f"Pair: {pair['id']}\n"
-                    f"Chain: {pair['chain']}\n"
-                 #   f"Token: {pair['base_token_info']['symbol']} ({pair['base_token_info']['name']})\n"
-                    f"Address: {pair['address']}\n"
-                    f"Price: ${pair['base_token_info']['price']}\n"
-                    f"Market Cap: ${pair['base_token_info']['market_cap']}\n"
-                    f"Liquidity: ${pair['base_token_info']['liquidity']}\n"
-                    f"Volume: ${pair['base_token_info']['volume']}\n"
-                    f"Holders: {pair['base_token_info']['holder_count']}\n"
+                #    f"Pair: {pair.id}\n"
+                    f"Chain: {pair.chain}\n"
+                 #   f"Token: {pair.base_token_info.symbol} ({pair.base_token_info.name})\n"
+                    f"Address: {pair.address}\n"
+                    f"Price: ${format_price(pair.base_token_info.price)}\n"
+                    f"Market Cap: ${pair.base_token_info.market_cap}\n"
+                    f"Liquidity: ${pair.base_token_info.liquidity}\n"
+                    f"Volume: ${pair.base_token_info.volume}\n"
+                    f"Holders: {pair.base_token_info.holder_count}\n"
                     f"Trading Activity:\n"
-                    f"  Swaps: {pair['base_token_info']['swaps']}\n"
-                    f"  Buys: {pair['base_token_info']['buys']}\n"
-                    f"  Sells: {pair['base_token_info']['sells']}\n"
+                    f"  Swaps: {pair.base_token_info.swaps}\n"
+                    f"  Buys: {pair.base_token_info.buys}\n"
+                    f"  Sells: {pair.base_token_info.sells}\n"
                     f"Smart Money Activity:\n"
-                    f"  Smart Money Count: {pair['base_token_info']['smart_degen_count']}\n"
-                    f"Top 10 Holders: {pair['base_token_info']['top_10_holder_rate']}%\n"
-                    f"Creator Balance: {pair['base_token_info']['creator_balance_rate']}%\n"
+                    f"  Smart Money Count: {pair.base_token_info.smart_degen_count}\n"
+                    f"Top 10 Holders: {pair.base_token_info.top_10_holder_rate}%\n"
+                    f"Creator Balance: {pair.base_token_info.creator_balance_rate}%\n"
                     f"---\n"
                     for pair in pairs
                 ]
@@ -701,23 +1466,79 @@ sse = SseServerTransport("/messages/")
 
 
 async def handle_sse(request):
-    async with sse.connect_sse(
-        request.scope, request.receive, request._send
-    ) as streams:
-        await server.run(
-            streams[0], streams[1], server.create_initialization_options()
-        )
+    # The SSE response notices the disconnect, but the session loop would keep
+    # running (and keep any in-flight tool call running) until it finishes
+    disconnected = anyio.Event()
 
+    async def receive():
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            disconnected.set()
+        return message
 
+    connection = SSEConnection()
+    current_connection.set(connection)
+    try:
+        async with sse.connect_sse(
+            request.scope, receive, request._send
+        ) as streams:
+            initialization_options = server.create_initialization_options()
+            initialization_options.capabilities.resources.subscribe = True
+            async with anyio.create_task_group() as tg:
+                async def cancel_on_disconnect():
+                    await disconnected.wait()
+                    tg.cancel_scope.cancel()
+
+                tg.start_soon(cancel_on_disconnect)
+                await server.run(
+                    streams[0], streams[1], initialization_options
+                )
+                tg.cancel_scope.cancel()
+    finally:
+        # Stop polling feeds on behalf of a client that is gone
+        if connection.session is not None:
+            subscription_hub.drop_session(connection.session)
+        scheduler.drop_session(connection.id)
+
+
+
+async def handle_usage(request):
+    return JSONResponse(scheduler.usage())
 
 routes = [
     Route("/sse", endpoint=handle_sse),
+    Route("/usage", endpoint=handle_usage),
     Mount("/messages/", app=sse.handle_post_message),
 
 ]
 
  
-starlette_app = Starlette(routes=routes,debug=True)
+@asynccontextmanager
+async def lifespan(app):
+    # Warm the in-memory caches from the last shutdown so a deploy does not
+    # send every lookup upstream at once
+    snapshot_path = os.getenv("CACHE_SNAPSHOT_PATH", "cache/snapshot.msgpack")
+    if snapshot_path:
+        load_snapshot(snapshot_path)
+    market_refresher.start()
+    gas_sampler.start()
+    if solana_explorer_service.account_watcher is not None:
+        solana_explorer_service.account_watcher.start()
+    try:
+        yield
+    finally:
+        await subscription_hub.stop()
+        await market_refresher.stop()
+        await gas_sampler.stop()
+        if solana_explorer_service.account_watcher is not None:
+            await solana_explorer_service.account_watcher.stop()
+        if etherscan_service.rpc is not None:
+            await etherscan_service.rpc.aclose()
+        if snapshot_path:
+            write_snapshot(snapshot_path)
+
+ 
+starlette_app = Starlette(routes=routes,debug=True,lifespan=lifespan)
 if __name__ == "__main__":
 
     uvicorn.run(starlette_app, host="0.0.0.0", port=28500)
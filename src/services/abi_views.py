@@ -0,0 +1,91 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+KINDS = {
+    "all": None,
+    "functions": ("function",),
+    "events": ("event",),
+    "errors": ("error",),
+}
+
+
+def canonical_type(param: Dict[str, Any]) -> str:
+    """Canonical type, expanding tuple components recursively"""
+    kind = param.get("type", "")
+    if kind.startswith("tuple"):
+        return "(" + ",".join(canonical_type(component) for component in param.get("components", [])) + ")" + kind[len("tuple"):]
+    return kind
+
+
+def _params(params: List[Dict[str, Any]]) -> str:
+    return ", ".join(
+        " ".join(part for part in (canonical_type(param), "indexed" if param.get("indexed") else "", param.get("name", "")) if part)
+        for param in params
+    )
+
+
+def canonical_signature(entry: Dict[str, Any]) -> str:
+    """Signature as hashed for selectors and topics, e.g. transfer(address,uint256)"""
+    return f"{entry.get('name', '')}({','.join(canonical_type(param) for param in entry.get('inputs', []))})"
+
+
+def entry_signature(entry: Dict[str, Any]) -> str:
+    """One-line, Solidity-like signature of an ABI entry"""
+    kind = entry.get("type", "function")
+    if kind in ("constructor", "fallback", "receive"):
+        line = f"{kind}({_params(entry.get('inputs', []))})"
+    else:
+        line = f"{kind} {entry.get('name', '')}({_params(entry.get('inputs', []))})"
+    if kind == "function":
+        if entry.get("outputs"):
+            line += f" returns ({_params(entry['outputs'])})"
+        mutability = entry.get("stateMutability")
+        if mutability and mutability != "nonpayable":
+            line += f" {mutability}"
+    if kind == "event" and entry.get("anonymous"):
+        line += " anonymous"
+    return line
+
+
+def select_entries(abi: List[Dict[str, Any]], kind: str = "all", name_filter: Optional[str] = None) -> List[Dict[str, Any]]:
+    types = KINDS[kind]
+    needle = name_filter.lower() if name_filter else None
+    return [
+        entry for entry in abi
+        if (types is None or entry.get("type", "function") in types)
+        and (needle is None or needle in entry.get("name", "").lower())
+    ]
+
+
+def render_entry(entry: Dict[str, Any], output_format: str) -> str:
+    if output_format == "signatures":
+        return entry_signature(entry)
+    if output_format == "pretty":
+        return json.dumps(entry, indent=2)
+    return json.dumps(entry, separators=(",", ":"))
+
+
+def render_page(
+    entries: List[Dict[str, Any]],
+    output_format: str = "json",
+    max_bytes: int = 16000,
+    cursor: int = 0
+) -> Tuple[str, Optional[int]]:
+    """Render entries from `cursor` on until the next would exceed `max_bytes`
+
+    At least one entry is always rendered so that pagination makes
+    progress. Returns the text and the cursor of the next page, or None
+    when the last entry was included.
+    """
+    lines = []
+    size = 0
+    index = cursor
+    while index < len(entries):
+        line = render_entry(entries[index], output_format)
+        line_size = len(line.encode("utf-8")) + 1
+        if lines and size + line_size > max_bytes:
+            break
+        lines.append(line)
+        size += line_size
+        index += 1
+    return "\n".join(lines), (index if index < len(entries) else None)
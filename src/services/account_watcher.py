@@ -0,0 +1,200 @@
+import asyncio
+import itertools
+import json
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from websockets.asyncio.client import ClientConnection, connect
+
+logger = logging.getLogger('AccountWatcher')
+
+
+@dataclass
+class _Watched:
+    lamports: Optional[int] = None
+    slot: int = -1
+    subscription: Optional[int] = None
+    # Set once a value known to postdate the subscription is in
+    live: bool = False
+
+
+class AccountWatcher:
+    """Keep lamport balances of watched Solana accounts current in memory
+
+    All watched accounts share one websocket, each with its own
+    accountSubscribe subscription, and every change notification updates the
+    cached balance. A change made before the subscription is confirmed is
+    never notified, so a balance is only served once a notification has
+    arrived or `read_account` has re-read it after the confirmation; a lookup
+    never returns something the socket is not keeping fresh. Without
+    `read_account` an account goes live on its first notification. At most
+    `max_accounts` are watched; the least recently looked-up account is
+    dropped first. After a disconnect every cached balance is discarded and
+    all accounts are resubscribed with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        ws_url: str,
+        read_account: Optional[Callable[[str], Awaitable[Tuple[int, int]]]] = None,
+        max_accounts: int = 200,
+        reconnect_delay: float = 1,
+        max_reconnect_delay: float = 30
+    ):
+        self.ws_url = ws_url
+        # Returns (lamports, slot) for an address, read over HTTP
+        self.read_account = read_account
+        self.max_accounts = max_accounts
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.accounts: "OrderedDict[str, _Watched]" = OrderedDict()
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, str] = {}
+        self._by_subscription: Dict[int, str] = {}
+        self._ws: Optional[ClientConnection] = None
+        self._task: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    def get(self, address: str) -> Optional[int]:
+        """Live lamports for a watched address, or None if not being kept fresh"""
+        watched = self.accounts.get(address)
+        if watched is None or watched.subscription is None or not watched.live:
+            return None
+        self.accounts.move_to_end(address)
+        return watched.lamports
+
+    def watch(self, address: str, lamports: Optional[int] = None, slot: int = -1) -> None:
+        """Start watching an address, optionally seeding it with a value read at `slot`
+
+        The seed is not served on its own, as it may predate the subscription.
+        """
+        watched = self.accounts.get(address)
+        if watched is None:
+            watched = self.accounts[address] = _Watched()
+            self._send_subscribe(address)
+            while len(self.accounts) > self.max_accounts:
+                self.unwatch(next(iter(self.accounts)))
+        self.accounts.move_to_end(address)
+        # A notification may already have delivered a newer value
+        if lamports is not None and slot >= watched.slot:
+            watched.lamports = lamports
+            watched.slot = slot
+
+    def unwatch(self, address: str) -> None:
+        watched = self.accounts.pop(address, None)
+        if watched is not None and watched.subscription is not None:
+            self._by_subscription.pop(watched.subscription, None)
+            self._send({"method": "accountUnsubscribe", "params": [watched.subscription]})
+
+    def _send_subscribe(self, address: str) -> None:
+        self._send(
+            {"method": "accountSubscribe", "params": [address, {"encoding": "base64", "commitment": "confirmed"}]},
+            pending=address
+        )
+
+    def _send(self, message: dict, pending: Optional[str] = None) -> None:
+        if self._ws is None:
+            # Sent on (re)connect instead
+            return
+        request_id = next(self._ids)
+        payload = json.dumps({"jsonrpc": "2.0", "id": request_id, **message})
+        self._spawn(self._transmit(self._ws, payload, request_id, pending))
+
+    def _spawn(self, coroutine: Awaitable) -> None:
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _transmit(self, ws: ClientConnection, payload: str, request_id: int, pending: Optional[str]) -> None:
+        try:
+            await ws.send(payload)
+        except Exception as error:
+            # The connection is going down; _run resubscribes on reconnect
+            logger.warning(f"Account websocket send failed: {str(error)}")
+            return
+        if pending is not None and self._ws is ws:
+            self._pending[request_id] = pending
+
+    async def _reseed(self, address: str, subscription: int) -> None:
+        try:
+            lamports, slot = await self.read_account(address)
+        except Exception as error:
+            logger.warning(f"Re-reading {address} after accountSubscribe failed: {str(error)}")
+            return
+        watched = self.accounts.get(address)
+        if watched is None or watched.subscription != subscription:
+            return
+        # A notification may already have delivered a newer value
+        if slot >= watched.slot:
+            watched.lamports = lamports
+            watched.slot = slot
+        watched.live = True
+
+    def _handle(self, message: dict) -> None:
+        if message.get("method") == "accountNotification":
+            params = message["params"]
+            address = self._by_subscription.get(params["subscription"])
+            watched = self.accounts.get(address) if address else None
+            if watched is not None:
+                watched.slot = params["result"]["context"]["slot"]
+                watched.lamports = params["result"]["value"]["lamports"] if params["result"]["value"] else 0
+                watched.live = True
+            return
+
+        address = self._pending.pop(message.get("id"), None)
+        if address is None:
+            return
+        watched = self.accounts.get(address)
+        if "error" in message:
+            logger.warning(f"accountSubscribe for {address} failed: {message['error']}")
+            self.accounts.pop(address, None)
+        elif watched is None:
+            # Unwatched before the subscription was confirmed
+            self._send({"method": "accountUnsubscribe", "params": [message["result"]]})
+        else:
+            watched.subscription = message["result"]
+            self._by_subscription[message["result"]] = address
+            if self.read_account is not None:
+                self._spawn(self._reseed(address, watched.subscription))
+
+    def _reset(self) -> None:
+        self._ws = None
+        self._pending.clear()
+        self._by_subscription.clear()
+        for watched in self.accounts.values():
+            watched.subscription = None
+            watched.lamports = None
+            watched.slot = -1
+            watched.live = False
+
+    async def _run(self) -> None:
+        delay = self.reconnect_delay
+        while True:
+            try:
+                async with connect(self.ws_url) as ws:
+                    self._ws = ws
+                    delay = self.reconnect_delay
+                    for address in self.accounts:
+                        self._send_subscribe(address)
+                    async for raw in ws:
+                        self._handle(json.loads(raw))
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.warning(f"Account websocket failed: {str(error)}")
+            finally:
+                self._reset()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
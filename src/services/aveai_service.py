@@ -1,4 +1,3 @@
-from curl_cffi import requests
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 import logging
@@ -7,6 +6,16 @@ from pathlib import Path
 from dotenv import load_dotenv
 import urllib.parse
 import uuid   
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from services.cache_backend import make_cache
+from services.records import Pair, TokenInfo, integer, number
+from services.deadline import check as check_deadline
+from services.proxy_pool import shared_pool
+from services.retry import UpstreamError, error_for_status, retry_policy
+from services.schemas import AveEnvelope, ave_treasure_decoder, schema_error
+import msgspec
 
 load_dotenv()
 
@@ -52,6 +61,14 @@ def setup_logger(name: str) -> logging.Logger:
 
 logger = setup_logger('AveAIService')
 
+# Treasure list pages, keyed by their request parameters. Built at import,
+# not per service instance, so a snapshot restored at startup reaches it.
+pair_list_cache = make_cache(
+    "ave-pair-lists",
+    ttl=float(os.getenv("PAIR_LIST_CACHE_TTL", "10")),
+    schema=List[Pair]
+)
+
 class AveAIService:
     def __init__(self):
         self.base_url = "https://febweb002.com"
@@ -60,21 +77,12 @@ class AveAIService:
         log_dir = Path("logs")
         log_dir.mkdir(parents=True, exist_ok=True)
         
-        # Load proxy configuration from environment variables
-        username = os.getenv('PROXY_USERNAME')
-        password = os.getenv('PROXY_PASSWORD')
-        proxy_host = os.getenv('PROXY_HOST')
-        proxy_port = os.getenv('PROXY_PORT')
-        
-        if not all([username, password]):
-            self.logger.warning("Proxy credentials not found in environment variables")
-            self.proxies = None
-        else:
-            proxy_url = f'http://{username}:{password}@{proxy_host}:{proxy_port}'
-            self.proxies = {
-                'http': proxy_url,
-                'https': proxy_url
-            }
+        self.logger = setup_logger(f'AveAIService.{id(self)}')
+
+        # Requests are spread over PROXY_POOL (or the single PROXY_* proxy)
+        self.proxy_pool = shared_pool("ave")
+        self.retry_policy = retry_policy("ave")
+        self.pair_list_cache = pair_list_cache
         
         # Generate unique udid
         udid = str(uuid.uuid4())
@@ -100,8 +108,7 @@ class AveAIService:
             "Priority": "u=1, i"
         }
 
-        self.logger = setup_logger(f'AveAIService.{id(self)}')
-        self.logger.info(f"Using proxy: {self.proxies}")
+        self.logger.info(f"Using proxies: {[proxy.label for proxy in self.proxy_pool.proxies]}")
 
     def __enter__(self):
         """Synchronous context manager entry"""
@@ -129,7 +136,7 @@ class AveAIService:
         page_no: int = 1,
         page_size: int = 50,
         category: str = "hot"
-    ) -> List[Dict[str, Any]]:
+    ) -> List[Pair]:
         """Get treasure list from Ave.ai"""
         try:
             params = {
@@ -145,6 +152,11 @@ class AveAIService:
                 params["smart_money_buy_count_24h_min"] = smart_money_buy_count_24h_min
             if smart_money_sell_count_24h_min > 0:
                 params["smart_money_sell_count_24h_min"] = smart_money_sell_count_24h_min
+
+            key = msgspec.json.encode(params).decode()
+            cached = self.pair_list_cache.get(key)
+            if cached is not None:
+                return cached
             
             url = f"{self.base_url}/v1api/v4/tokens/treasure/list"
             
@@ -158,73 +170,140 @@ class AveAIService:
             request_log += "\n\n"  
             self.logger.info(request_log)
             
-            # Use synchronous request directly
-            response = requests.get(
-                url,
-                params=params,
-                headers=self.headers,
-                proxies=self.proxies,
-                impersonate="chrome124"
-            )
-            
-            response.encoding = 'utf-8'
-            
-            # Print response information
-            response_log = (
-                f"\n=== HTTP Response ===\n"
-                f"HTTP/2 {response.status_code} {response.reason}\n"
-            )
-            response_log += '\n'.join(f"{k}: {v}" for k, v in response.headers.items())
-            response_log += f"\n\n{response.text}\n"  # Empty line followed by response body
-            self.logger.info(response_log)
-            
-            data = response.json()
-            if data.get("status") != 1:
-                error_msg = data.get("msg", "Failed to fetch data from Ave.ai")
-                raise Exception(error_msg)
+            data = self.retry_policy.call_sync(partial(self._request_treasure_page, url, params))
             
             formatted_pairs = []
-            for pair in data["data"]["data"]:
-                formatted_pair = {
-                    "id": pair["pair"],
-                    "address": pair["target_token"],
-                    "chain": pair["chain"],
-                    "amm": pair["amm"],
-                    "quote_reserve": float(pair["reserve1"]),
-                    "initial_liquidity": float(pair["init_tvl"]),
-                    "tvl": float(pair["tvl"]),
-                    "creator": "",  # Ave.ai API 没有
-                    "pool_type_str": pair["amm"],
-                    "pool_type": pair["amm"],
-                    "quote_symbol": pair["token1_symbol"],
-                    "base_token_info": {
-                        "symbol": pair["token0_symbol"],
-                        "name": pair["token0_symbol"],
-                        "logo": pair["token0_logo_url"],
-                        "total_supply": 0,  # API 未提供
-                        "price": float(pair["current_price_usd"]),
-                        "holder_count": int(pair["holders"]),
-                        "market_cap": float(pair["market_cap"]),
-                        "liquidity": float(pair["tvl"]),
-                        "volume": float(pair["volume_u_24h"]),
-                        "swaps": int(pair["tx_24h_count"]),
-                        "buys": int(pair["buys_tx_24h_count"]),
-                        "sells": int(pair["sells_tx_24h_count"]),
-                        "is_honeypot": False,  # API 未提供
-                        "renounced": False,  # API 未提供
-                        "burn_ratio": 0,  # API 未提供
-                        "burn_status": "",  # API 未提供
-                        "top_10_holder_rate": float(pair["holders_top10_ratio"]),
-                        "creator_balance_rate": float(pair["dev_balance_ratio_cur"]),
-                        "smart_degen_count": int(pair["smart_money_buy_count_24h"]),
-                        "renowned_count": 0,  # API 未提供
-                        "social_links": {}  # API 未提供
-                    }
-                }
+            for pair in data.data.data:
+                formatted_pair = Pair(
+                    id=pair.pair,
+                    address=pair.target_token,
+                    chain=pair.chain or "solana",
+                    quote_reserve=number(pair.reserve1),
+                    initial_liquidity=number(pair.init_tvl),
+                    tvl=number(pair.tvl),
+                    creator="",  # Ave.ai API 没有
+                    pool_type_str=pair.amm,
+                    pool_type=pair.amm,
+                    quote_symbol=pair.token1_symbol,
+                    base_token_info=TokenInfo(
+                        symbol=pair.token0_symbol,
+                        name=pair.token0_symbol,
+                        logo=pair.token0_logo_url,
+                        total_supply=0,  # API 未提供
+                        price=number(pair.current_price_usd),
+                        holder_count=integer(pair.holders),
+                        market_cap=number(pair.market_cap),
+                        liquidity=number(pair.tvl),
+                        volume=number(pair.volume_u_24h),
+                        swaps=integer(pair.tx_24h_count),
+                        buys=integer(pair.buys_tx_24h_count),
+                        sells=integer(pair.sells_tx_24h_count),
+                        is_honeypot=False,  # API 未提供
+                        renounced=False,  # API 未提供
+                        burn_ratio=0,  # API 未提供
+                        burn_status="",  # API 未提供
+                        top_10_holder_rate=number(pair.holders_top10_ratio),
+                        creator_balance_rate=number(pair.dev_balance_ratio_cur),
+                        smart_degen_count=integer(pair.smart_money_buy_count_24h),
+                        renowned_count=0,  # API 未提供
+                        social_links={}  # API 未提供
+                    )
+                )
                 formatted_pairs.append(formatted_pair)
             
+            self.pair_list_cache.set(key, formatted_pairs)
             return formatted_pairs
             
         except Exception as error:
             self.logger.error(f"Request failed: {str(error)}")
-            raise 
\ No newline at end of file
+            raise
+
+    def _request_treasure_page(self, url: str, params: Dict[str, Any]) -> AveEnvelope:
+        """One attempt at a treasure list page, decoded straight from bytes"""
+        # Use synchronous request directly
+        response = self.proxy_pool.get(
+            url,
+            params=params,
+            headers=self.headers,
+            impersonate="chrome124"
+        )
+        
+        body = response.content
+        
+        # Print response information
+        if self.logger.isEnabledFor(logging.INFO):
+            response_log = (
+                f"\n=== HTTP Response ===\n"
+                f"HTTP/2 {response.status_code} {response.reason}\n"
+            )
+            response_log += '\n'.join(f"{k}: {v}" for k, v in response.headers.items())
+            response_log += f"\n\n{body.decode('utf-8', errors='replace')}\n"  # Empty line followed by response body
+            self.logger.info(response_log)
+
+        http_error = error_for_status(response.status_code, response.headers, body)
+        if http_error is not None:
+            raise http_error
+        
+        try:
+            data = ave_treasure_decoder.decode(body)
+        except msgspec.ValidationError as error:
+            # Error responses may carry a payload that does not match the schema
+            raw = msgspec.json.decode(body)
+            if raw.get("status") == 1:
+                raise schema_error("Ave.ai", error)
+            raise UpstreamError(raw.get("msg") or "Failed to fetch data from Ave.ai")
+        if data.status != 1:
+            error_msg = data.msg or "Failed to fetch data from Ave.ai"
+            raise UpstreamError(error_msg)
+        
+        return data
+
+    def get_treasure_list_many(
+        self,
+        total: int,
+        marketcap_min: int = 100000,
+        tvl_min: int = 100000,
+        smart_money_buy_count_24h_min: int = 0,
+        smart_money_sell_count_24h_min: int = 0,
+        page_size: int = 100,
+        category: str = "hot",
+        concurrency: int = 4
+    ) -> List[Pair]:
+        """Get up to `total` pairs by fetching pages 1..N in concurrent waves
+
+        Each wave fetches up to `concurrency` pages at once. Pages are merged
+        in page order and deduplicated by pair id. The first short page marks
+        the end of the list; later pages are discarded and no further wave
+        starts. The deadline and cancellation of the tool call are checked
+        before each wave, so an abandoned call stops after the wave in flight.
+        """
+        page_count = -(-total // page_size)
+        pairs: Dict[str, Pair] = {}
+        with ThreadPoolExecutor(max_workers=min(concurrency, page_count)) as executor:
+            for first_page in range(1, page_count + 1, concurrency):
+                check_deadline()
+                # Each page runs in its own copy of the context, so pages share
+                # the caller's deadline and cancellation
+                futures = [
+                    executor.submit(
+                        contextvars.copy_context().run,
+                        self.get_treasure_list,
+                        marketcap_min=marketcap_min,
+                        tvl_min=tvl_min,
+                        smart_money_buy_count_24h_min=smart_money_buy_count_24h_min,
+                        smart_money_sell_count_24h_min=smart_money_sell_count_24h_min,
+                        page_no=page_no,
+                        page_size=page_size,
+                        category=category
+                    )
+                    for page_no in range(first_page, min(first_page + concurrency, page_count + 1))
+                ]
+                for future in futures:
+                    page = future.result()
+                    for pair in page:
+                        pairs.setdefault(pair.id, pair)
+                    if len(page) < page_size or len(pairs) >= total:
+                        return list(pairs.values())[:total]
+
+        return list(pairs.values())[:total]
+
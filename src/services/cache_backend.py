@@ -0,0 +1,150 @@
+import os
+import threading
+import time
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import msgspec
+
+from services.disk_cache import DiskTTLCache
+from services.ttl_cache import TTLCache
+
+CACHE_BACKENDS = ("tiered", "disk", "memory")
+
+_MISSING = object()
+
+# Every cache made by make_cache, one per namespace, for snapshots of their memory tiers
+_caches: Dict[str, "TwoTierCache"] = {}
+
+
+class TwoTierCache:
+    """Per-process LRU in front of the disk cache shared by all workers
+
+    Reads try this process's memory tier first, then the SQLite file every
+    worker on the host opens, so an entry fetched by one worker is a hit for
+    the others. Disk hits are promoted into memory for the rest of their
+    original lifetime, never longer. On disk values are JSON; with a
+    `schema` they are stored as builtins and converted back into records
+    (msgspec Structs and the like) when read. Keys are compared as str(key).
+    The memory tier can be pre-filled from a snapshot (see cache_snapshot);
+    it is decoded on first use rather than when handed over.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        disk: Optional[DiskTTLCache],
+        ttl: float,
+        maxsize: int = 1000,
+        schema: Any = Any
+    ):
+        self.namespace = namespace
+        self.disk = disk
+        self.ttl = ttl
+        self.schema = schema
+        self.memory = TTLCache(ttl=ttl, maxsize=maxsize)
+        self._pending: Optional[msgspec.Raw] = None
+        self._lock = threading.Lock()
+
+    def restore(self, entries: msgspec.Raw) -> None:
+        """Queue snapshot entries, still encoded, to be loaded on first access"""
+        with self._lock:
+            self._pending = entries
+
+    def _load_pending(self) -> None:
+        # Called with the lock held
+        if self._pending is None:
+            return
+        raw, self._pending = self._pending, None
+        now = time.time()
+        for key, expires_at, value in msgspec.msgpack.decode(raw):
+            # Never outlive the original TTL, never replace a fresher value
+            if expires_at <= now or self.memory.get(key, _MISSING) is not _MISSING:
+                continue
+            if self.schema is not Any:
+                value = msgspec.convert(value, self.schema, strict=False)
+            self.memory.set(key, value, ttl=expires_at - now)
+
+    def snapshot_entries(self) -> List[Tuple[str, float, Any]]:
+        """Unexpired memory-tier entries as (key, expires_at, builtins), oldest use first"""
+        with self._lock:
+            self._load_pending()
+            return [(key, expires_at, msgspec.to_builtins(value)) for key, expires_at, value in self.memory.entries()]
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        return self.get_many([key]).get(str(key), default)
+
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[str, Any]:
+        """Unexpired entries for `keys`, keyed by str(key); misses are left out"""
+        found = {}
+        missing = []
+        with self._lock:
+            self._load_pending()
+            for key in map(str, keys):
+                value = self.memory.get(key, _MISSING)
+                if value is _MISSING:
+                    missing.append(key)
+                else:
+                    found[key] = value
+        if not missing or self.disk is None:
+            return found
+
+        now = time.time()
+        promoted = {}
+        for key, (expires_at, value) in self.disk.get_entries(missing).items():
+            if self.schema is not Any:
+                value = msgspec.convert(value, self.schema, strict=False)
+            promoted[key] = (value, expires_at - now)
+            found[key] = value
+        with self._lock:
+            for key, (value, ttl) in promoted.items():
+                self.memory.set(key, value, ttl=ttl)
+        return found
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, items: Dict[Hashable, Any], ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._load_pending()
+            for key, value in items.items():
+                self.memory.set(str(key), value, ttl=ttl)
+        if self.disk is not None:
+            if self.schema is not Any:
+                items = {key: msgspec.to_builtins(value) for key, value in items.items()}
+            self.disk.set_many(items, ttl)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        return len(self.disk) if self.disk is not None else len(self.memory)
+
+
+def make_cache(namespace: str, ttl: float, maxsize: Optional[int] = None, schema: Any = Any) -> TwoTierCache:
+    """Cache for one namespace on the backend selected by CACHE_BACKEND
+
+    "tiered" (the default) puts a memory LRU in front of the shared disk
+    file, "disk" skips the memory tier and "memory" keeps entries in this
+    process only. A namespace is built once per process; later calls, such
+    as from services created per request, get the same cache back.
+    """
+    cache = _caches.get(namespace)
+    if cache is not None:
+        return cache
+
+    backend = os.getenv("CACHE_BACKEND", "tiered")
+    if backend not in CACHE_BACKENDS:
+        raise ValueError(f"Unknown CACHE_BACKEND {backend!r}, expected one of {', '.join(CACHE_BACKENDS)}")
+    if maxsize is None:
+        maxsize = int(os.getenv("CACHE_MEMORY_MAXSIZE", "1000"))
+
+    disk = None
+    if backend != "memory":
+        disk = DiskTTLCache(os.getenv("CACHE_DB_PATH", "cache/cache.db"), namespace=namespace, ttl=ttl)
+    cache = TwoTierCache(namespace, disk, ttl, maxsize=0 if backend == "disk" else maxsize, schema=schema)
+    _caches[namespace] = cache
+    return cache
+
+
+def registered_caches() -> List[TwoTierCache]:
+    return list(_caches.values())
@@ -0,0 +1,93 @@
+import logging
+import mmap
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import msgspec
+
+from services.cache_backend import TwoTierCache, registered_caches
+
+logger = logging.getLogger('CacheSnapshot')
+
+SNAPSHOT_VERSION = 1
+
+
+class Snapshot(msgspec.Struct):
+    version: int
+    written_at: float
+    # Each namespace's [key, expires_at, value] list, encoded separately so a
+    # namespace is only decoded when its cache is first used
+    namespaces: Dict[str, msgspec.Raw]
+
+
+def write_snapshot(path: str, caches: Optional[List[TwoTierCache]] = None) -> int:
+    """Write the memory tiers of all caches to a msgpack file, returning the entry count
+
+    Entries keep their absolute expiry times. The file is replaced
+    atomically, so a concurrent reader sees either the old or the new one.
+    Failures are logged rather than raised, as this runs at shutdown.
+    """
+    try:
+        return _write_snapshot(path, registered_caches() if caches is None else caches)
+    except Exception as error:
+        logger.warning(f"Failed to write cache snapshot {path}: {str(error)}")
+        return 0
+
+
+def _write_snapshot(path: str, caches: List[TwoTierCache]) -> int:
+    merged: Dict[str, Dict[str, list]] = {}
+    for cache in caches:
+        entries = merged.setdefault(cache.namespace, {})
+        for key, expires_at, value in cache.snapshot_entries():
+            if key not in entries or entries[key][1] < expires_at:
+                entries[key] = [key, expires_at, value]
+
+    snapshot = Snapshot(
+        version=SNAPSHOT_VERSION,
+        written_at=time.time(),
+        namespaces={
+            namespace: msgspec.Raw(msgspec.msgpack.encode(list(entries.values())))
+            for namespace, entries in merged.items() if entries
+        }
+    )
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(msgspec.msgpack.encode(snapshot))
+    os.replace(temp_path, path)
+    return sum(len(entries) for entries in merged.values())
+
+
+def load_snapshot(path: str, caches: Optional[List[TwoTierCache]] = None) -> int:
+    """Hand a snapshot's entries to the caches of matching namespaces
+
+    The file is memory-mapped and only its outer index is decoded here;
+    each cache decodes its own entries on first access, dropping any that
+    expired in the meantime. Returns the number of caches that got entries.
+    A missing, empty or unreadable snapshot is skipped.
+    """
+    try:
+        with open(path, "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return 0
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        snapshot = msgspec.msgpack.decode(buffer, type=Snapshot)
+    except FileNotFoundError:
+        return 0
+    except Exception as error:
+        logger.warning(f"Ignoring unreadable cache snapshot {path}: {str(error)}")
+        return 0
+    if snapshot.version != SNAPSHOT_VERSION:
+        logger.warning(f"Ignoring cache snapshot {path} with version {snapshot.version}")
+        return 0
+
+    restored = 0
+    for cache in registered_caches() if caches is None else caches:
+        entries = snapshot.namespaces.get(cache.namespace)
+        if entries is not None:
+            cache.restore(entries)
+            restored += 1
+    logger.info(f"Loaded cache snapshot written {time.time() - snapshot.written_at:.0f}s ago for {restored} caches")
+    return restored
@@ -0,0 +1,82 @@
+import asyncio
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, Callable, Iterator, Optional
+
+
+class DeadlineExceeded(Exception):
+    """The tool call ran out of time before the upstream request could start"""
+
+
+class CallCancelled(Exception):
+    """The tool call was abandoned by its client"""
+
+
+@dataclass
+class CallScope:
+    """Deadline and cancellation flag shared by every request of one tool call
+
+    `deadline` is a time.monotonic() timestamp. `cancelled` is a threading
+    event so that executor threads, which cannot be cancelled by asyncio, can
+    still notice an abandoned call before starting another upstream request.
+    """
+    deadline: Optional[float] = None
+    cancelled: threading.Event = field(default_factory=threading.Event)
+
+    def remaining(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return self.deadline - time.monotonic()
+
+    def check(self) -> None:
+        if self.cancelled.is_set():
+            raise CallCancelled("Tool call was cancelled")
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceeded("Tool call deadline exceeded")
+
+
+_current_scope: contextvars.ContextVar[Optional[CallScope]] = contextvars.ContextVar("call_scope", default=None)
+
+
+def current_scope() -> Optional[CallScope]:
+    return _current_scope.get()
+
+
+@contextmanager
+def call_scope(timeout: Optional[float]) -> Iterator[CallScope]:
+    """Run the enclosed block under a fresh deadline of `timeout` seconds"""
+    scope = CallScope(deadline=time.monotonic() + timeout if timeout else None)
+    token = _current_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _current_scope.reset(token)
+
+
+def check() -> None:
+    """Raise if the current tool call is cancelled or past its deadline"""
+    scope = current_scope()
+    if scope is not None:
+        scope.check()
+
+
+def request_timeout(default: float) -> float:
+    """Timeout for one upstream request: `default`, capped by the call deadline"""
+    scope = current_scope()
+    if scope is None:
+        return default
+    scope.check()
+    remaining = scope.remaining()
+    return default if remaining is None else min(default, remaining)
+
+
+async def run_in_thread(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """run_in_executor that carries the current call scope into the thread"""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(None, partial(context.run, fn, *args, **kwargs))
@@ -0,0 +1,138 @@
+import atexit
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+logger = logging.getLogger('DiskCache')
+
+
+class DiskTTLCache:
+    """TTL cache persisted to a SQLite file, so entries survive restarts
+
+    Several caches can share one file; each keeps its rows under its own
+    namespace. Values are stored as JSON. Expired rows are ignored on read
+    and purged when the cache is opened. In WAL mode readers never block,
+    so every worker process on the host can open the same file.
+
+    Writes are queued and committed in batches by a background thread on its
+    own connection, so set() never waits on SQLite; reads see queued entries
+    straight away. With synchronous=NORMAL a power loss may drop the last
+    commits, which only costs a cache miss.
+    """
+
+    def __init__(self, path: str, namespace: str, ttl: float):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = self._connect()
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute("DELETE FROM cache WHERE namespace = ? AND expires_at < ?", (namespace, time.time()))
+        # Rows waiting for the writer thread: {key: (json, expires_at)}
+        self._queued: Dict[str, Tuple[str, float]] = {}
+        self._queue_changed = threading.Condition()
+        self._writer: Optional[threading.Thread] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        return self.get_many([key]).get(str(key), default)
+
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[str, Any]:
+        """Unexpired entries for `keys`, keyed by str(key); misses are left out"""
+        return {key: value for key, (_, value) in self.get_entries(keys).items()}
+
+    def get_entries(self, keys: Iterable[Hashable]) -> Dict[str, Tuple[float, Any]]:
+        """Like get_many, but with each value's expiry time: {key: (expires_at, value)}"""
+        keys = [str(key) for key in keys]
+        found = {}
+        now = time.time()
+        with self._queue_changed:
+            for key in keys:
+                row = self._queued.get(key)
+                if row is not None and row[1] >= now:
+                    found[key] = (row[1], json.loads(row[0]))
+        keys = [key for key in keys if key not in found]
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT key, value, expires_at FROM cache WHERE namespace = ? AND expires_at >= ? "
+                    f"AND key IN ({','.join('?' * len(chunk))})",
+                    (self.namespace, time.time(), *chunk)
+                )
+                found.update((key, (expires_at, json.loads(value))) for key, value, expires_at in rows)
+        return found
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, items: Dict[Hashable, Any], ttl: Optional[float] = None) -> None:
+        """Queue entries for the writer thread; they are readable immediately"""
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        rows = {str(key): (json.dumps(value), expires_at) for key, value in items.items()}
+        with self._queue_changed:
+            self._queued.update(rows)
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name=f"disk-cache-{self.namespace}", daemon=True)
+                self._writer.start()
+                atexit.register(self.flush)
+            self._queue_changed.notify_all()
+
+    def flush(self, timeout: float = 5) -> bool:
+        """Wait until queued writes are committed, returning False on timeout"""
+        with self._queue_changed:
+            return self._queue_changed.wait_for(lambda: not self._queued, timeout)
+
+    def _write_loop(self) -> None:
+        db = self._connect()
+        while True:
+            with self._queue_changed:
+                self._queue_changed.wait_for(lambda: self._queued)
+                batch = dict(self._queued)
+            try:
+                # One transaction for the whole batch rather than one per row
+                db.execute("BEGIN")
+                try:
+                    db.executemany(
+                        "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                        [(self.namespace, key, value, expires_at) for key, (value, expires_at) in batch.items()]
+                    )
+                except Exception:
+                    db.execute("ROLLBACK")
+                    raise
+                db.execute("COMMIT")
+            except Exception as error:
+                logger.warning(f"Dropping {len(batch)} {self.namespace} cache writes: {str(error)}")
+            with self._queue_changed:
+                for key, row in batch.items():
+                    # Keep entries replaced while the batch was being written
+                    if self._queued.get(key) is row:
+                        del self._queued[key]
+                self._queue_changed.notify_all()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        self.flush()
+        with self._lock:
+            (count,) = self._db.execute(
+                "SELECT COUNT(*) FROM cache WHERE namespace = ? AND expires_at >= ?", (self.namespace, time.time())
+            ).fetchone()
+        return count
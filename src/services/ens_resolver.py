@@ -0,0 +1,69 @@
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from eth_abi import decode
+from ens.utils import normal_name_to_hash, raw_name_to_hash
+
+ENS_REGISTRY = "0x00000000000C2E074eC69A0dFb2997BA6C7d2e1e"
+RESOLVER_SELECTOR = "0x0178b8bf"  # resolver(bytes32)
+NAME_SELECTOR = "0x691f3431"  # name(bytes32)
+ADDR_SELECTOR = "0x3b3b57de"  # addr(bytes32)
+
+# Runs eth_calls given as (to, data) in one round trip; None for a call that failed
+EthCalls = Callable[[List[Tuple[str, str]]], Awaitable[List[Optional[bytes]]]]
+
+
+def _node(namehash: bytes) -> str:
+    return "0x" + bytes(namehash).hex()
+
+
+def _word_to_address(data: Optional[bytes]) -> Optional[str]:
+    if not data or len(data) < 32 or not any(data[12:32]):
+        return None
+    return "0x" + data[12:32].hex()
+
+
+def _decode_name(data: Optional[bytes]) -> Optional[str]:
+    if not data:
+        return None
+    try:
+        return decode(["string"], data)[0] or None
+    except Exception:
+        return None
+
+
+async def reverse_resolve(addresses: List[str], eth_calls: EthCalls) -> Dict[str, Optional[str]]:
+    """Primary ENS names for lowercase addresses, verified by a forward lookup
+
+    Resolution takes four rounds of eth_calls, each covering every address
+    still in play: the reverse record's resolver, its name(), the name's
+    resolver and its addr(). A name only counts if addr() points back at
+    the address, so anyone can claim a reverse record but not a false one.
+    """
+    names: Dict[str, Optional[str]] = {address: None for address in addresses}
+    reverse_nodes = {address: _node(raw_name_to_hash(f"{address[2:]}.addr.reverse")) for address in addresses}
+
+    results = await eth_calls([(ENS_REGISTRY, RESOLVER_SELECTOR + reverse_nodes[a][2:]) for a in addresses])
+    resolvers = {a: r for a, r in zip(addresses, map(_word_to_address, results)) if r}
+
+    pending = list(resolvers)
+    results = await eth_calls([(resolvers[a], NAME_SELECTOR + reverse_nodes[a][2:]) for a in pending])
+    claimed: Dict[str, Tuple[str, str]] = {}
+    for address, name in zip(pending, map(_decode_name, results)):
+        if not name:
+            continue
+        try:
+            claimed[address] = (name, _node(normal_name_to_hash(name)))
+        except Exception:
+            # Names that fail normalization cannot resolve forward either
+            continue
+
+    pending = list(claimed)
+    results = await eth_calls([(ENS_REGISTRY, RESOLVER_SELECTOR + claimed[a][1][2:]) for a in pending])
+    forward_resolvers = {a: r for a, r in zip(pending, map(_word_to_address, results)) if r}
+
+    pending = list(forward_resolvers)
+    results = await eth_calls([(forward_resolvers[a], ADDR_SELECTOR + claimed[a][1][2:]) for a in pending])
+    for address, resolved in zip(pending, map(_word_to_address, results)):
+        if resolved == address:
+            names[address] = claimed[address][0]
+    return names
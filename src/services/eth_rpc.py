@@ -0,0 +1,90 @@
+import itertools
+import logging
+from functools import partial
+from typing import Any, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from services.deadline import request_timeout
+from services.retry import UpstreamError, error_for_status, retry_policy
+
+logger = logging.getLogger('EthRPC')
+
+
+class RPCError(Exception):
+    """A JSON-RPC error object returned by the node"""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(f"RPC error {code}: {message}")
+        self.code = code
+
+
+class EthRPCClient:
+    """Minimal async Ethereum JSON-RPC client with batch support
+
+    `batch` sends many calls as one JSON-RPC array in a single HTTP request
+    and returns results in call order. One shared httpx client keeps the
+    connection to the node alive between calls.
+    """
+
+    def __init__(self, url: str, max_batch_size: int = 100):
+        self.url = url
+        self.max_batch_size = max_batch_size
+        self.retry_policy = retry_policy(urlsplit(url).netloc)
+        self._ids = itertools.count(1)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient()
+        return self._client
+
+    async def _post(self, payload: Any) -> Any:
+        response = await self._http().post(self.url, json=payload, timeout=request_timeout(10))
+        http_error = error_for_status(response.status_code, response.headers, response.content)
+        if http_error is not None:
+            raise http_error
+        return response.json()
+
+    async def call(self, method: str, params: Sequence[Any] = ()) -> Any:
+        (result,) = await self.batch([(method, params)])
+        return result
+
+    async def batch(self, calls: Sequence[Tuple[str, Sequence[Any]]], return_exceptions: bool = False) -> List[Any]:
+        """Run calls as JSON-RPC batches of up to `max_batch_size` each
+
+        Raises RPCError if any call in the batch failed, or with
+        `return_exceptions` puts the RPCError in that call's result slot.
+        """
+        results = []
+        for start in range(0, len(calls), self.max_batch_size):
+            chunk = calls[start:start + self.max_batch_size]
+            payload = [
+                {"jsonrpc": "2.0", "id": next(self._ids), "method": method, "params": list(params)}
+                for method, params in chunk
+            ]
+            replies = await self.retry_policy.call(partial(self._post, payload))
+            if not isinstance(replies, list):
+                # Some nodes answer a rejected batch with a single error object
+                error = replies.get("error") or {}
+                raise UpstreamError(error.get("message") or "Invalid JSON-RPC batch response")
+
+            by_id = {reply.get("id"): reply for reply in replies}
+            for request in payload:
+                reply = by_id.get(request["id"])
+                if reply is None:
+                    raise UpstreamError(f"No JSON-RPC reply for {request['method']}")
+                if "error" in reply:
+                    error = RPCError(reply["error"].get("code", 0), reply["error"].get("message", ""))
+                    if not return_exceptions:
+                        raise error
+                    results.append(error)
+                else:
+                    results.append(reply["result"])
+        return results
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -1,25 +1,105 @@
 import httpx
+import logging
+import os
+from statistics import median
 from web3 import Web3
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Tuple, Union
 import json
+from functools import partial
+from services.retry import PERMANENT, RATE_LIMITED, UpstreamError, error_for_status, retry_policy
+from services.deadline import request_timeout
+from services.token_flows import aggregate_token_flows, format_units
+from services.eth_rpc import EthRPCClient
+from services.ens_resolver import reverse_resolve
+from services.cache_backend import make_cache
+from services.selector_index import SelectorIndex
+from services.multicall import (
+    DECIMALS_SELECTOR, MULTICALL3, SYMBOL_SELECTOR,
+    balance_of_call, decode_aggregate3, decode_symbol, decode_uint, encode_aggregate3
+)
+
+logger = logging.getLogger('EtherscanService')
+
+# Etherscan's balancemulti accepts at most this many addresses per call
+BALANCEMULTI_LIMIT = 20
+# Rows Etherscan serves for one account query across all pages (page * offset)
+ETHERSCAN_ROW_WINDOW = 10000
+# Tokens per Multicall3 eth_call sent through Etherscan's GET proxy (three
+# calls each); five keep the URL near 6 KB, under common 8 KB limits
+ETHERSCAN_MULTICALL_TOKENS = 5
+# Without a JSON-RPC node every ENS eth_call is a separate, rate-limited GET
+# (up to four per address), so uncached addresses are resolved this many at
+# a time and at most ETHERSCAN_ENS_LIMIT per call
+ETHERSCAN_ENS_CHUNK = 10
+ETHERSCAN_ENS_LIMIT = 20
 
 class EtherscanService:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, rpc_url: Optional[str] = None):
         self.api_key = api_key
         self.base_url = "https://api.etherscan.io/api"
         self.web3 = Web3()
+        self.retry_policy = retry_policy("api.etherscan.io")
+        # Optional JSON-RPC node for balance, gas and code reads; Etherscan is the fallback
+        self.rpc = EthRPCClient(rpc_url) if rpc_url else None
+        # Reverse ENS results, including "no name", persisted across restarts
+        self.ens_cache = make_cache(
+            "ens",
+            ttl=float(os.getenv("ENS_CACHE_TTL", "86400"))
+        )
+        self.ens_negative_ttl = float(os.getenv("ENS_NEGATIVE_TTL", "3600"))
+        # Token contracts each wallet has touched, inferred from its transfer history
+        self.token_list_cache = make_cache(
+            "token-lists",
+            ttl=float(os.getenv("TOKEN_LIST_CACHE_TTL", "900"))
+        )
+        # Verified ABIs, kept so paging through a large ABI fetches it once
+        self.abi_cache = make_cache(
+            "abis",
+            ttl=float(os.getenv("ABI_CACHE_TTL", "86400"))
+        )
+        # Function selectors and event topics from every ABI seen, for decoding
+        self.selector_index = SelectorIndex(os.getenv("CACHE_DB_PATH", "cache/cache.db"))
+
+    async def _read(self, method: str, rpc_read, etherscan_read):
+        """Read through the JSON-RPC node when configured, else (or on failure) Etherscan"""
+        if self.rpc is not None:
+            try:
+                return await rpc_read()
+            except Exception as error:
+                logger.warning(f"JSON-RPC {method} failed, falling back to Etherscan: {str(error)}")
+        return await etherscan_read()
 
-    async def _make_request(self, params: Dict[str, Any]) -> Dict:
-        """Make a request to Etherscan API"""
+    async def _make_request(self, params: Dict[str, Any], allow_empty: bool = False) -> Dict:
+        """Make a request to Etherscan API, retrying rate limits and transient errors
+
+        With `allow_empty`, an empty list result ("No transactions found") is
+        returned instead of raised, for paging past the end of a history.
+        """
         params["apikey"] = self.api_key
-        
+        return await self.retry_policy.call(partial(self._request_once, params, allow_empty))
+
+    async def _request_once(self, params: Dict[str, Any], allow_empty: bool = False) -> Dict:
         async with httpx.AsyncClient() as client:
-            response = await client.get(self.base_url, params=params)
+            response = await client.get(self.base_url, params=params, timeout=request_timeout(5))
+            http_error = error_for_status(response.status_code, response.headers, response.content)
+            if http_error is not None:
+                raise http_error
             data = response.json()
            #$ print(data)
             
+            # module=proxy passes the node's JSON-RPC reply through as is
+            if "jsonrpc" in data:
+                if "error" in data:
+                    raise UpstreamError(data["error"].get("message") or "Etherscan proxy call failed")
+                return data["result"]
+            if allow_empty and data.get("result") == []:
+                return []
             if data["status"] != "1" or not data.get("result"):
-                raise Exception(data.get("message") or "Failed to fetch data from Etherscan")
+                message = data.get("message") or "Failed to fetch data from Etherscan"
+                # Etherscan reports its rate limit in a 200 response ("Max rate limit reached")
+                if "rate limit" in str(data.get("result")).lower():
+                    raise UpstreamError(str(data.get("result")), RATE_LIMITED, retry_after=1)
+                raise UpstreamError(message)
             
             return data["result"]
 
@@ -39,7 +119,10 @@ class EtherscanService:
                 "tag": "latest",
             }
             
-            balance_wei = await self._make_request(params)
+            async def rpc_read():
+                return int(await self.rpc.call("eth_getBalance", [address, "latest"]), 16)
+
+            balance_wei = await self._read("eth_getBalance", rpc_read, partial(self._make_request, params))
          #   print(balance_wei)
             balance_eth = self.web3.from_wei(int(balance_wei), 'ether')
     
@@ -52,6 +135,65 @@ class EtherscanService:
         except Exception as error:
             raise Exception(f"Failed to get address balance: {str(error)}")
 
+    async def get_address_balances(self, addresses: List[str]) -> List[Dict[str, Any]]:
+        """Get ETH balances for many addresses
+
+        Over JSON-RPC all eth_getBalance calls travel in one batch request;
+        the Etherscan fallback uses balancemulti, 20 addresses per call.
+        """
+        try:
+            for address in addresses:
+                if not self.web3.is_address(address):
+                    raise ValueError(f"Invalid Ethereum address format: {address}")
+
+            async def rpc_read():
+                results = await self.rpc.batch([("eth_getBalance", [address, "latest"]) for address in addresses])
+                return [int(result, 16) for result in results]
+
+            async def etherscan_read():
+                balances = []
+                for start in range(0, len(addresses), BALANCEMULTI_LIMIT):
+                    chunk = addresses[start:start + BALANCEMULTI_LIMIT]
+                    rows = await self._make_request({
+                        "module": "account",
+                        "action": "balancemulti",
+                        "address": ",".join(chunk),
+                        "tag": "latest",
+                    })
+                    by_address = {row["account"].lower(): int(row["balance"]) for row in rows}
+                    balances.extend(by_address[address.lower()] for address in chunk)
+                return balances
+
+            balances = await self._read("eth_getBalance batch", rpc_read, etherscan_read)
+            return [
+                {"address": address, "balanceInEth": str(self.web3.from_wei(balance_wei, 'ether'))}
+                for address, balance_wei in zip(addresses, balances)
+            ]
+
+        except Exception as error:
+            raise Exception(f"Failed to get address balances: {str(error)}")
+
+    async def get_code(self, address: str) -> str:
+        """Get deployed bytecode at an address ("0x" for an externally owned account)"""
+        try:
+            if not self.web3.is_address(address):
+                raise ValueError("Invalid Ethereum address format")
+
+            params = {
+                "module": "proxy",
+                "action": "eth_getCode",
+                "address": address,
+                "tag": "latest"
+            }
+            return await self._read(
+                "eth_getCode",
+                partial(self.rpc.call, "eth_getCode", [address, "latest"]) if self.rpc else None,
+                partial(self._make_request, params)
+            )
+
+        except Exception as error:
+            raise Exception(f"Failed to get contract code: {str(error)}")
+
     async def get_transaction_history(
         self, 
         address: str,
@@ -89,7 +231,9 @@ class EtherscanService:
                     'hash': tx.get('hash'),
                     'from': tx.get('from'),
                     'to': tx.get('to'),
-                    'value': self.web3.from_wei(int(tx.get('value', '0')), 'ether')
+                    'value': self.web3.from_wei(int(tx.get('value', '0')), 'ether'),
+                    'input': tx.get('input'),
+                    'functionName': tx.get('functionName')
                 }
                 formatted_transactions.append(formatted_tx)
             
@@ -123,12 +267,174 @@ class EtherscanService:
         except Exception as error:
             raise Exception(f"Failed to get token transfers: {str(error)}")
 
+    async def get_token_transfer_history(
+        self,
+        address: str,
+        contract_address: Optional[str] = None,
+        max_transfers: int = 2000,
+        page_size: int = 1000
+    ) -> List[Dict[str, Any]]:
+        """Get raw ERC20 transfers for an address, oldest first
+
+        Pages are fetched in order until a short page or `max_transfers`.
+        Etherscan serves at most ETHERSCAN_ROW_WINDOW rows per query.
+        """
+        try:
+            if not self.web3.is_address(address):
+                raise ValueError("Invalid Ethereum address format")
+
+            params = {
+                "module": "account",
+                "action": "tokentx",
+                "address": address,
+                "sort": "asc",
+                "offset": min(page_size, max_transfers)
+            }
+            if contract_address:
+                params["contractaddress"] = contract_address
+
+            transfers = []
+            page = 1
+            while len(transfers) < max_transfers:
+                rows = await self._make_request({**params, "page": page}, allow_empty=True)
+                transfers.extend(rows)
+                if len(rows) < params["offset"]:
+                    break
+                page += 1
+            return transfers[:max_transfers]
+
+        except Exception as error:
+            raise Exception(f"Failed to get token transfer history: {str(error)}")
+
+    async def get_token_flows(
+        self,
+        address: str,
+        contract_address: Optional[str] = None,
+        max_transfers: int = 2000
+    ) -> Dict[str, Any]:
+        """Aggregate an address's ERC20 transfers into per-token flows
+
+        When exactly `max_transfers` come back, a one-row page just past them
+        tells whether the history was cut short. Where Etherscan's row window
+        leaves no room for it, a full window counts as truncated.
+        """
+        transfers = await self.get_token_transfer_history(address, contract_address, max_transfers)
+        truncated = len(transfers) >= max_transfers
+        if truncated and max_transfers < ETHERSCAN_ROW_WINDOW:
+            params = {
+                "module": "account",
+                "action": "tokentx",
+                "address": address,
+                "sort": "asc",
+                "page": max_transfers + 1,
+                "offset": 1
+            }
+            if contract_address:
+                params["contractaddress"] = contract_address
+            truncated = bool(await self._make_request(params, allow_empty=True))
+        return {
+            "address": address,
+            "transfer_count": len(transfers),
+            "truncated": truncated,
+            "flows": aggregate_token_flows(address, transfers)
+        }
+
+    async def get_wallet_tokens(self, address: str, max_transfers: int = 10000) -> List[str]:
+        """Token contracts an address has sent or received, cached per address"""
+        key = address.lower()
+        tokens = self.token_list_cache.get(key)
+        if tokens is None:
+            transfers = await self.get_token_transfer_history(address, max_transfers=max_transfers)
+            tokens = list(dict.fromkeys(tx["contractAddress"].lower() for tx in transfers))
+            self.token_list_cache.set(key, tokens)
+        return tokens
+
+    async def get_token_balances(
+        self,
+        address: str,
+        tokens: Optional[List[str]] = None,
+        chunk_size: int = 500,
+        include_zero: bool = False
+    ) -> List[Dict[str, Any]]:
+        """Get ERC20 balances of an address via Multicall3
+
+        balanceOf, decimals and symbol for up to `chunk_size` tokens are read
+        in a single eth_call to Multicall3.aggregate3. On the Etherscan
+        fallback the calldata goes in a GET query string, so chunks there are
+        capped at ETHERSCAN_MULTICALL_TOKENS. Without `tokens`, the list is
+        inferred from the address's transfer history. Tokens whose balanceOf
+        fails are left out.
+        """
+        try:
+            if not self.web3.is_address(address):
+                raise ValueError("Invalid Ethereum address format")
+            if tokens is None:
+                tokens = await self.get_wallet_tokens(address)
+            for token in tokens:
+                if not self.web3.is_address(token):
+                    raise ValueError(f"Invalid token address format: {token}")
+            tokens = list(dict.fromkeys(self.web3.to_checksum_address(token) for token in tokens))
+
+            balance_of = balance_of_call(address)
+
+            def multicalls(size: int) -> List[Tuple[str, str]]:
+                calls = []
+                for start in range(0, len(tokens), size):
+                    inner = []
+                    for token in tokens[start:start + size]:
+                        inner += [(token, balance_of), (token, DECIMALS_SELECTOR), (token, SYMBOL_SELECTOR)]
+                    calls.append((MULTICALL3, encode_aggregate3(inner)))
+                return calls
+
+            async def rpc_read():
+                return await self._rpc_eth_calls(multicalls(chunk_size))
+
+            async def etherscan_read():
+                # The calldata travels in the GET query string, so keep each URL short
+                return await self._etherscan_eth_calls(multicalls(min(chunk_size, ETHERSCAN_MULTICALL_TOKENS)))
+
+            results = await self._read("Multicall3 balances", rpc_read, etherscan_read) if tokens else []
+            if any(result is None for result in results):
+                raise Exception("Multicall3 aggregate3 call failed")
+
+            balances = []
+            returned = [data for result in results for data in decode_aggregate3(result)]
+            for index, token in enumerate(tokens):
+                balance_data, decimals_data, symbol_data = returned[index * 3:index * 3 + 3]
+                balance = decode_uint(balance_data)
+                if balance is None or (balance == 0 and not include_zero):
+                    continue
+                decimals = decode_uint(decimals_data) or 0
+                if decimals > 255:
+                    # decimals() is a uint8; anything larger is a broken token
+                    decimals = 0
+                balances.append({
+                    "token": token,
+                    "symbol": decode_symbol(symbol_data),
+                    "decimals": decimals,
+                    "balance_raw": balance,
+                    "balance": format_units(balance, decimals)
+                })
+            return balances
+
+        except Exception as error:
+            raise Exception(f"Failed to get token balances: {str(error)}")
+
     async def get_contract_abi(self, address: str) -> Dict[str, Any]:
         """Get contract ABI"""
         try:
             if not self.web3.is_address(address):
                 raise ValueError("Invalid Ethereum address format")
 
+            key = address.lower()
+            abi_json = self.abi_cache.get(key)
+            if abi_json is not None:
+                self.selector_index.add_abi(abi_json)
+                return {
+                    "address": address,
+                    "abi": abi_json
+                }
+
             params = {
                 "chainid": "1",  # Ethereum mainnet
                 "module": "contract",
@@ -138,6 +444,8 @@ class EtherscanService:
             
             abi_str = await self._make_request(params)
             abi_json = json.loads(abi_str)
+            self.abi_cache.set(key, abi_json)
+            self.selector_index.add_abi(abi_json)
             return {
                 "address": address,
                 "abi": abi_json
@@ -154,24 +462,189 @@ class EtherscanService:
                 "action": "gasoracle"
             }
             
-            gas_data = await self._make_request(params)
-            return {
-                "safeGwei": gas_data["SafeGasPrice"],
-                "proposeGwei": gas_data["ProposeGasPrice"],
-                "fastGwei": gas_data["FastGasPrice"]
-            }
+            async def rpc_read():
+                # Next block's base fee plus the median tip paid at the 10th/50th/90th
+                # percentile over the last 20 blocks, mirroring safe/propose/fast
+                history = await self.rpc.call("eth_feeHistory", [hex(20), "latest", [10, 50, 90]])
+                base_fee = int(history["baseFeePerGas"][-1], 16)
+                rewards = [[int(tip, 16) for tip in block] for block in history["reward"]]
+                safe, propose, fast = (
+                    str(round((base_fee + median(block[i] for block in rewards)) / 10**9, 3))
+                    for i in range(3)
+                )
+                return {"safeGwei": safe, "proposeGwei": propose, "fastGwei": fast}
+
+            async def etherscan_read():
+                gas_data = await self._make_request(params)
+                return {
+                    "safeGwei": gas_data["SafeGasPrice"],
+                    "proposeGwei": gas_data["ProposeGasPrice"],
+                    "fastGwei": gas_data["FastGasPrice"]
+                }
+
+            return await self._read("eth_feeHistory", rpc_read, etherscan_read)
             
         except Exception as error:
             raise Exception(f"Failed to get gas prices: {str(error)}")
 
+    async def _eth_calls(self, calls: List[Tuple[str, str]]) -> List[Optional[bytes]]:
+        """Run (to, data) eth_calls, None for any that revert
+
+        Over JSON-RPC the calls go out as one batch; the Etherscan fallback
+        (module=proxy) takes one request per call. Rate-limited and transient
+        failures are raised rather than reported as reverts.
+        """
+        if not calls:
+            return []
+        return await self._read(
+            "eth_call batch",
+            partial(self._rpc_eth_calls, calls),
+            partial(self._etherscan_eth_calls, calls)
+        )
+
+    async def _rpc_eth_calls(self, calls: List[Tuple[str, str]]) -> List[Optional[bytes]]:
+        results = await self.rpc.batch(
+            [("eth_call", [{"to": to, "data": data}, "latest"]) for to, data in calls],
+            return_exceptions=True
+        )
+        return [None if isinstance(result, Exception) else bytes.fromhex(result[2:]) for result in results]
+
+    async def _etherscan_eth_calls(self, calls: List[Tuple[str, str]]) -> List[Optional[bytes]]:
+        results = []
+        for to, data in calls:
+            try:
+                result = await self._make_request({
+                    "module": "proxy",
+                    "action": "eth_call",
+                    "to": to,
+                    "data": data,
+                    "tag": "latest"
+                })
+                results.append(bytes.fromhex(result[2:]))
+            except UpstreamError as error:
+                # Reverts come back as permanent errors; rate limits and
+                # outages must not pass for "no result" and get cached
+                if error.kind != PERMANENT:
+                    raise
+                results.append(None)
+        return results
+
+    async def get_receipts(self, hashes: List[str]) -> List[Union[Dict[str, Any], Exception, None]]:
+        """Transaction receipts for many hashes, None for any not found
+
+        Over JSON-RPC the reads go out as one batch; the Etherscan fallback
+        (module=proxy) takes one request per hash. A receipt that could not be
+        read has its error in its place instead. On the fallback a rate limit
+        or outage ends the run, and every remaining hash gets that error rather
+        than another request.
+        """
+        if not hashes:
+            return []
+
+        async def rpc_read():
+            return await self.rpc.batch(
+                [("eth_getTransactionReceipt", [tx_hash]) for tx_hash in hashes],
+                return_exceptions=True
+            )
+
+        async def etherscan_read():
+            results = []
+            for tx_hash in hashes:
+                try:
+                    results.append(await self._make_request({
+                        "module": "proxy",
+                        "action": "eth_getTransactionReceipt",
+                        "txhash": tx_hash
+                    }))
+                except UpstreamError as error:
+                    if error.kind != PERMANENT:
+                        results += [error] * (len(hashes) - len(results))
+                        break
+                    results.append(error)
+            return results
+
+        return await self._read("eth_getTransactionReceipt batch", rpc_read, etherscan_read)
+
+    async def decode_transactions(
+        self,
+        transactions: List[Dict[str, Any]],
+        include_logs: bool = False
+    ) -> List[Dict[str, Any]]:
+        """Attach decoded calls, and optionally decoded logs, to a page of transactions
+
+        Decoding only looks selectors and topics up in the local index, so a
+        page costs no ABI fetches; calls from contracts whose ABI has never
+        been fetched stay undecoded. With `include_logs` the receipts of the
+        whole page are read together; a transaction whose receipt could not
+        be read gets `logs` None and the reason in `logs_error`.
+        """
+        for tx in transactions:
+            tx['call'] = self.selector_index.decode_input(tx.get('input') or "")
+
+        if include_logs:
+            receipts = await self.get_receipts([tx['hash'] for tx in transactions])
+            for tx, receipt in zip(transactions, receipts):
+                if receipt is None or isinstance(receipt, Exception):
+                    tx['logs'] = None
+                    tx['logs_error'] = "Receipt not found" if receipt is None else str(receipt)
+                    continue
+                tx['logs'] = [
+                    {
+                        'address': log.get('address'),
+                        'topic': log['topics'][0] if log.get('topics') else None,
+                        'event': self.selector_index.decode_log(log.get('topics') or [], log.get('data') or "")
+                    }
+                    for log in receipt.get('logs') or []
+                ]
+        return transactions
+
+    async def get_ens_names(self, addresses: List[str]) -> Dict[str, Optional[str]]:
+        """Get verified primary ENS names for many addresses
+
+        Cached answers (names and "no name" alike) come from the disk cache;
+        the rest are resolved together, four batched round trips in all, and
+        cached as each chunk completes so a call cut short keeps its progress.
+        Without a JSON-RPC node only ETHERSCAN_ENS_LIMIT uncached addresses
+        are resolved per call; the others are left out of the result, and a
+        later call picks them up. Returns a mapping keyed by the addresses as
+        given.
+        """
+        try:
+            for address in addresses:
+                if not self.web3.is_address(address):
+                    raise ValueError(f"Invalid Ethereum address format: {address}")
+
+            wanted = list(dict.fromkeys(address.lower() for address in addresses))
+            cached = self.ens_cache.get_many(wanted)
+            missing = [address for address in wanted if address not in cached]
+            chunk_size = len(missing) or 1
+            if self.rpc is None:
+                missing = missing[:ETHERSCAN_ENS_LIMIT]
+                chunk_size = ETHERSCAN_ENS_CHUNK
+            for start in range(0, len(missing), chunk_size):
+                resolved = await reverse_resolve(missing[start:start + chunk_size], self._eth_calls)
+                found = {address: {"name": name} for address, name in resolved.items() if name}
+                not_found = {address: {"name": None} for address, name in resolved.items() if not name}
+                if found:
+                    self.ens_cache.set_many(found)
+                if not_found:
+                    self.ens_cache.set_many(not_found, ttl=self.ens_negative_ttl)
+                cached.update(found)
+                cached.update(not_found)
+
+            return {address: cached[address.lower()]["name"] for address in addresses if address.lower() in cached}
+
+        except Exception as error:
+            raise Exception(f"Failed to get ENS names: {str(error)}")
+
     async def get_ens_name(self, address: str) -> Optional[str]:
         """Get ENS name for an address"""
         try:
             if not self.web3.is_address(address):
                 raise ValueError("Invalid Ethereum address format")
 
-      
-            return None
+            names = await self.get_ens_names([address])
+            return names.get(address)
             
         except Exception as error:
-            raise Exception(f"Failed to get ENS name: {str(error)}") 
\ No newline at end of file
+            raise Exception(f"Failed to get ENS name: {str(error)}") 
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger('GasSampler')
+
+TIERS = ("safe", "propose", "fast")
+
+
+@dataclass
+class GasSample:
+    timestamp: float
+    safe: float
+    propose: float
+    fast: float
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Linearly interpolated percentile of an already sorted list"""
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def slope_per_minute(samples: List[GasSample], tier: str) -> float:
+    """Least-squares slope of a tier over time, in Gwei per minute"""
+    times = [sample.timestamp for sample in samples]
+    values = [getattr(sample, tier) for sample in samples]
+    mean_time = sum(times) / len(times)
+    mean_value = sum(values) / len(values)
+    variance = sum((t - mean_time) ** 2 for t in times)
+    if variance == 0:
+        return 0.0
+    covariance = sum((t - mean_time) * (v - mean_value) for t, v in zip(times, values))
+    return covariance / variance * 60
+
+
+class GasSampler:
+    """Sample gas prices on a fixed interval into an in-memory ring buffer
+
+    `fetch` returns the gas oracle dict (safeGwei/proposeGwei/fastGwei). The
+    buffer holds `capacity` samples, so with the defaults (12s, 1800) it
+    covers six hours. Reads never touch the upstream.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], Awaitable[Dict[str, Any]]],
+        interval: float = 12,
+        capacity: int = 1800
+    ):
+        self.fetch = fetch
+        self.interval = interval
+        self.samples: Deque[GasSample] = deque(maxlen=capacity)
+        self._task: Optional[asyncio.Task] = None
+
+    async def sample(self) -> GasSample:
+        prices = await self.fetch()
+        sample = GasSample(
+            timestamp=time.time(),
+            safe=float(prices["safeGwei"]),
+            propose=float(prices["proposeGwei"]),
+            fast=float(prices["fastGwei"])
+        )
+        self.samples.append(sample)
+        return sample
+
+    def latest(self, max_age: Optional[float] = None) -> Optional[GasSample]:
+        """Most recent sample, or None if there is none younger than `max_age`"""
+        if not self.samples:
+            return None
+        sample = self.samples[-1]
+        if max_age is not None and time.time() - sample.timestamp > max_age:
+            return None
+        return sample
+
+    def stats(self, window: float) -> Optional[Dict[str, Any]]:
+        """Percentiles, min/max and trend per tier over the last `window` seconds"""
+        since = time.time() - window
+        samples = [sample for sample in self.samples if sample.timestamp >= since]
+        if not samples:
+            return None
+
+        result: Dict[str, Any] = {
+            "window": window,
+            "count": len(samples),
+            "span": samples[-1].timestamp - samples[0].timestamp
+        }
+        for tier in TIERS:
+            ordered = sorted(getattr(sample, tier) for sample in samples)
+            result[tier] = {
+                "min": ordered[0],
+                "p10": percentile(ordered, 0.1),
+                "p50": percentile(ordered, 0.5),
+                "p90": percentile(ordered, 0.9),
+                "max": ordered[-1],
+                "slope_per_minute": slope_per_minute(samples, tier)
+            }
+        return result
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sample()
+            except Exception as error:
+                logger.warning(f"Gas sample failed: {str(error)}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
@@ -1,14 +1,19 @@
-from curl_cffi import requests
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, AsyncIterator, TypedDict, Union
 from datetime import datetime
 from enum import Enum
-from typing import Literal, TypedDict
 import logging
 import os
 from pathlib import Path
 from dotenv import load_dotenv
 import asyncio
 from functools import partial
+from services.cache_backend import make_cache
+from services.proxy_pool import shared_pool
+from services.deadline import run_in_thread
+from services.retry import PERMANENT, UpstreamError, error_for_status, retry_policy
+from services.records import Pair, Kline, Holding, HoldingToken, TokenSecurity
+from services.schemas import NewPairsData, KlineData, HoldingsData, gmgn_decoder, schema_error
+import msgspec
 
 load_dotenv()
 def setup_logger(name: str) -> logging.Logger:
@@ -67,27 +72,23 @@ class KlineResolution(str, Enum):
     ONE_WEEK = "1w"
    # ONE_MONTH = "1m"
 
+class EnrichedPair(TypedDict):
+    """A pair from get_new_pairs with its token's security and klines attached"""
+    pair: Pair
+    security: Optional[TokenSecurity]
+    klines: Optional[List[Kline]]
+    # Lookup name ("security", "klines") -> error message
+    errors: Dict[str, str]
+
 class GMGNScanService:
     def __init__(self):
         self.base_url = "https://gmgn.ai"
         
-        username = os.getenv('PROXY_USERNAME')
-        password = os.getenv('PROXY_PASSWORD')
-        proxy_host = os.getenv('PROXY_HOST' )
-        proxy_port = os.getenv('PROXY_PORT')
-        
-        if not all([username, password]):
-            self.logger.warning("Proxy credentials not found in environment variables")
-            self.proxies = None
-        else:
-            # Build proxy URL
-            proxy_url = f'http://{username}:{password}@{proxy_host}:{proxy_port}'
-            
-            # Set proxy
-            self.proxies = {
-                'http': proxy_url,
-                'https': proxy_url
-            }
+        self.logger = setup_logger(f'GMGNScanService.{id(self)}')
+
+        # Requests are spread over PROXY_POOL (or the single PROXY_* proxy)
+        self.proxy_pool = shared_pool("gmgn")
+        self.retry_policy = retry_policy("gmgn.ai")
         
         self.headers = {
      
@@ -106,10 +107,28 @@ class GMGNScanService:
         }
         self.body = {}
 
-        self.logger = setup_logger(f'GMGNScanService.{id(self)}')
+        # Token security results, including failed lookups, keyed by chain:address
+        self.security_cache = make_cache(
+            "token-security",
+            ttl=float(os.getenv("TOKEN_SECURITY_CACHE_TTL", "300")),
+            schema=Dict[str, Union[TokenSecurity, str]]
+        )
+        self.security_error_ttl = float(os.getenv("TOKEN_SECURITY_ERROR_TTL", "60"))
+        # Klines and new pair lists, keyed by their request parameters
+        self.kline_cache = make_cache(
+            "klines",
+            ttl=float(os.getenv("KLINE_CACHE_TTL", "60")),
+            schema=List[Kline]
+        )
+        self.pair_list_cache = make_cache(
+            "gmgn-pair-lists",
+            ttl=float(os.getenv("PAIR_LIST_CACHE_TTL", "10")),
+            schema=List[Pair]
+        )
+
         self.logger.info(f"GMGN_COOKIE: {os.getenv('GMGN_COOKIE', '')}")
         self.logger.info(f"USER_AGENT: {os.getenv('USER_AGENT', '')}")
-        self.logger.info(f"Using proxy: {self.proxies}")
+        self.logger.info(f"Using proxies: {[proxy.label for proxy in self.proxy_pool.proxies]}")
 
     async def __aenter__(self):
         return self
@@ -126,49 +145,62 @@ class GMGNScanService:
             handler.close()
             self.logger.removeHandler(handler)
 
-    async def _make_request(self, endpoint: str, params: Dict[str, Any]) -> Dict:
-        """Make a request to GMGN API"""
+    async def _make_request(self, endpoint: str, params: Dict[str, Any], schema: Any = Any) -> Any:
+        """Make a request to GMGN API
+
+        The body is decoded once, straight into `schema`; the raw bytes are
+        reused for the response log. Rate-limited and transient failures are
+        retried under the shared GMGN retry policy.
+        """
         try:
-            url = f"{self.base_url}{endpoint}"
-            
-  
-            request_log = f"=== HTTP Request ===\nGET {url} HTTP/1.1\n"
-            request_log += '\n'.join(f"{k}: {v}" for k, v in self.headers.items())
-            request_log += f"\n\nQuery Parameters: {params}\n"
-            self.logger.info(request_log)
-            
+            return await self.retry_policy.call(partial(self._request_once, endpoint, params, schema))
+        except Exception as error:
+            self.logger.error(f"Request failed: {str(error)}")
+            raise
 
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                partial(
-                    requests.get,
-                    url,
-                    params=params,
-                    headers=self.headers,
-                    proxies=self.proxies,
-                    impersonate="chrome124",
-                    # verify=False  # If SSL verification needs to be disabled
-                )
-            )
-            
-            response.encoding = 'utf-8'
+    async def _request_once(self, endpoint: str, params: Dict[str, Any], schema: Any) -> Any:
+        url = f"{self.base_url}{endpoint}"
+        
+
+        request_log = f"=== HTTP Request ===\nGET {url} HTTP/1.1\n"
+        request_log += '\n'.join(f"{k}: {v}" for k, v in self.headers.items())
+        request_log += f"\n\nQuery Parameters: {params}\n"
+        self.logger.info(request_log)
+        
+
+        response = await run_in_thread(
+            self.proxy_pool.get,
+            url,
+            params=params,
+            headers=self.headers,
+            impersonate="chrome124",
+            # verify=False  # If SSL verification needs to be disabled
+        )
         
+        body = response.content
+    
+        if self.logger.isEnabledFor(logging.INFO):
             response_log = f"=== HTTP Response ===\nHTTP/1.1 {response.status_code} {response.reason}\n"
             response_log += '\n'.join(f"{k}: {v}" for k, v in response.headers.items())
-            response_log += f"\n\nResponse Body: {response.text}\n"
+            response_log += f"\n\nResponse Body: {body.decode('utf-8', errors='replace')}\n"
             self.logger.info(response_log)
-            
-            data = response.json()
-            if data.get("code") != 0:
-                error_msg = (data.get("msg") or "Failed to fetch data from GMGN").encode('utf-8').decode('utf-8')
-                raise Exception(error_msg)
-            
-            return data["data"]
-            
-        except Exception as error:
-            self.logger.error(f"Request failed: {str(error)}")
-            raise
+
+        http_error = error_for_status(response.status_code, response.headers, body)
+        if http_error is not None:
+            raise http_error
+        
+        try:
+            envelope = gmgn_decoder(schema).decode(body)
+        except msgspec.ValidationError as error:
+            # Error responses may carry a payload that does not match the schema
+            envelope = gmgn_decoder().decode(body)
+            if envelope.code == 0:
+                raise schema_error("GMGN", error)
+        if envelope.code != 0:
+            error_msg = envelope.msg or "Failed to fetch data from GMGN"
+            raise UpstreamError(error_msg)
+        
+        return envelope.data
 
     async def get_new_pairs(
         self,
@@ -189,7 +221,7 @@ class GMGNScanService:
         launchpad: str = "pump",
         orderby: str = "open_timestamp",
         direction: str = "desc"
-    ) -> List[Dict[str, Any]]:
+    ) -> List[Pair]:
         """Get new trading pairs information
         
         Args:
@@ -216,74 +248,18 @@ class GMGNScanService:
                 "min_swaps1h": min_swaps1h,
                 "min_holder_count": min_holder_count
             }
+            key = f"{chain}:{period}:{msgspec.json.encode(params).decode()}"
+            cached = self.pair_list_cache.get(key)
+            if cached is not None:
+                return cached
             
             data = await self._make_request(
                 f"/defi/quotation/v1/pairs/{chain}/new_pairs/{period}",
-                params
+                params,
+                NewPairsData
             )
          
-            formatted_pairs = []
-            for pair in data["pairs"]:
-                token_info = pair["base_token_info"]
-                formatted_pair = {
-                    "id": pair["id"],
-                   # "address": pair["address"],
-                    "address": pair["base_address"],
-                  #  "quote_address": pair["quote_address"],
-                    "quote_reserve": pair["quote_reserve"],
-                    "initial_liquidity": pair["initial_liquidity"],
-                    "initial_quote_reserve": pair["initial_quote_reserve"],
-                    "creator": pair["creator"],
-                    "pool_type_str": pair["pool_type_str"],
-                    "pool_type": pair["pool_type"],
-                    "quote_symbol": pair["quote_symbol"],
-                    "base_token_info": {
-                        "symbol": token_info["symbol"],
-                        "name": token_info["name"],
-                        "logo": token_info.get("logo"),
-                        "total_supply": token_info["total_supply"],
-                        "price": token_info["price"],
-                        "holder_count": token_info["holder_count"],
-                        "launchpad_status": token_info.get("launchpad_status"),
-                        "price_change_percent1m": token_info.get("price_change_percent1m"),
-                        "price_change_percent5m": token_info.get("price_change_percent5m"),
-                        "price_change_percent1h": token_info.get("price_change_percent1h"),
-                        "burn_ratio": token_info.get("burn_ratio"),
-                        "burn_status": token_info.get("burn_status"),
-                        "is_show_alert": token_info.get("is_show_alert", False),
-                        "hot_level": token_info.get("hot_level", 0),
-                        "liquidity": token_info["liquidity"],
-                        "top_10_holder_rate": token_info.get("top_10_holder_rate"),
-                        "renounced_mint": token_info.get("renounced_mint"),
-                        "renounced_freeze_account": token_info.get("renounced_freeze_account"),
-                        "market_cap": token_info.get("market_cap"),
-                        "creator_balance_rate": token_info.get("creator_balance_rate"),
-                        "creator_token_status": token_info.get("creator_token_status"),
-                        "rat_trader_amount_rate": token_info.get("rat_trader_amount_rate"),
-                        "bluechip_owner_percentage": token_info.get("bluechip_owner_percentage"),
-                        "smart_degen_count": token_info.get("smart_degen_count"),
-                        "renowned_count": token_info.get("renowned_count"),
-                        "volume": token_info.get("volume"),
-                        "swaps": token_info.get("swaps"),
-                        "buys": token_info.get("buys"),
-                        "sells": token_info.get("sells"),
-                        "buy_tax": token_info.get("buy_tax"),
-                        "sell_tax": token_info.get("sell_tax"),
-                        "is_honeypot": token_info.get("is_honeypot"),
-                        "renounced": token_info.get("renounced"),
-                        "dev_token_burn_amount": token_info.get("dev_token_burn_amount"),
-                        "dev_token_burn_ratio": token_info.get("dev_token_burn_ratio"),
-                        "dexscr_ad": token_info.get("dexscr_ad"),
-                        "dexscr_update_link": token_info.get("dexscr_update_link"),
-                        "cto_flag": token_info.get("cto_flag"),
-                        "twitter_change_flag": token_info.get("twitter_change_flag"),
-                        "address": token_info.get("address"),
-                        "social_links": token_info.get("social_links", {})
-                    },
-                    "open_timestamp": pair["open_timestamp"],
-                    "launchpad": pair.get("launchpad")
-                }
-                formatted_pairs.append(formatted_pair)
+            formatted_pairs = data.pairs
             
             # Update logging to use logger and write to file
             self.logger.info("New pairs data retrieved:")
@@ -291,28 +267,29 @@ class GMGNScanService:
                 self.logger.info(
                     f"""
                     Pair Details:
-                    Address: {pair['address']}
-                    Token: {pair['base_token_info']['name']} ({pair['base_token_info']['symbol']})
-                    Price: ${pair['base_token_info']['price']}
-                    Market Cap: ${pair['base_token_info']['market_cap']}
-                    Liquidity: ${pair['base_token_info']['liquidity']}
-                    Volume: ${pair['base_token_info']['volume']}
-                    Holders: {pair['base_token_info']['holder_count']}
-                    Open Timestamp: {pair['open_timestamp']}
-                    Buy Tax: {pair['base_token_info']['buy_tax']}%
-                    Sell Tax: {pair['base_token_info']['sell_tax']}%
-                    Is Honeypot: {pair['base_token_info']['is_honeypot']}
-                    Renounced: {pair['base_token_info']['renounced']}
-                    Burn Ratio: {pair['base_token_info']['burn_ratio']}%
-                    Burn Status: {pair['base_token_info']['burn_status']}
-                    Top 10 Holder Rate: {pair['base_token_info']['top_10_holder_rate']}%
-                    Creator Balance Rate: {pair['base_token_info']['creator_balance_rate']}%
-                    Creator Token Status: {pair['base_token_info']['creator_token_status']}
-                    Smart Degen Count: {pair['base_token_info']['smart_degen_count']}
-                    Renowned Count: {pair['base_token_info']['renowned_count']}
-                    Social Links: {pair['base_token_info']['social_links']}
+                    Address: {pair.address}
+                    Token: {pair.base_token_info.name} ({pair.base_token_info.symbol})
+                    Price: ${pair.base_token_info.price}
+                    Market Cap: ${pair.base_token_info.market_cap}
+                    Liquidity: ${pair.base_token_info.liquidity}
+                    Volume: ${pair.base_token_info.volume}
+                    Holders: {pair.base_token_info.holder_count}
+                    Open Timestamp: {pair.open_timestamp}
+                    Buy Tax: {pair.base_token_info.buy_tax}%
+                    Sell Tax: {pair.base_token_info.sell_tax}%
+                    Is Honeypot: {pair.base_token_info.is_honeypot}
+                    Renounced: {pair.base_token_info.renounced}
+                    Burn Ratio: {pair.base_token_info.burn_ratio}%
+                    Burn Status: {pair.base_token_info.burn_status}
+                    Top 10 Holder Rate: {pair.base_token_info.top_10_holder_rate}%
+                    Creator Balance Rate: {pair.base_token_info.creator_balance_rate}%
+                    Creator Token Status: {pair.base_token_info.creator_token_status}
+                    Smart Degen Count: {pair.base_token_info.smart_degen_count}
+                    Renowned Count: {pair.base_token_info.renowned_count}
+                    Social Links: {pair.base_token_info.social_links}
                     """
                 )
+            self.pair_list_cache.set(key, formatted_pairs)
             return formatted_pairs
             
         except Exception as error:
@@ -326,7 +303,7 @@ class GMGNScanService:
         resolution: KlineResolution,
         from_time: int,
         to_time: int
-    ) -> List[Dict[str, Any]]:
+    ) -> List[Kline]:
         """Get token kline data
         
         Args:
@@ -342,10 +319,19 @@ class GMGNScanService:
                 "from": from_time,
                 "to": to_time
             }
+            # Callers usually pass "now" as to_time, so times are bucketed by the
+            # cache TTL; an entry is never staler than that TTL allows anyway
+            bucket = max(int(self.kline_cache.ttl), 1)
+            key = f"{chain}:{token_address}:{getattr(resolution, 'value', resolution)}:" \
+                f"{from_time // bucket}:{to_time // bucket}"
+            cached = self.kline_cache.get(key)
+            if cached is not None:
+                return cached
             
             data = await self._make_request(
                 f"/api/v1/token_kline/{chain}/{token_address}",
-                params
+                params,
+                KlineData
             )
 
             self.logger.info(
@@ -355,49 +341,18 @@ class GMGNScanService:
                 Chain: {chain}
                 Resolution: {resolution}
                 Time range: {from_time} to {to_time}
-                Data points: {len(data['list'])}
+                Data points: {len(data.list)}
                 """
             )
-            return data["list"]
+            self.kline_cache.set(key, data.list)
+            return data.list
             
         except Exception as error:
             self.logger.error(f"Failed to get token kline: {str(error)}")
             raise Exception(f"Failed to get token kline: {str(error)}") 
 
-    class TokenInfo(TypedDict):
-        address: str
-        token_address: str
-        symbol: str
-        name: str
-        decimals: int
-        logo: str
-        price_change_6h: str
-        is_show_alert: bool
-        is_honeypot: Optional[bool]
-
-    class HoldingInfo(TypedDict):
-        token: 'GMGNScanService.TokenInfo'
-        balance: str
-        usd_value: str
-        realized_profit_30d: str
-        realized_profit: str
-        realized_pnl: str
-        realized_pnl_30d: str
-        unrealized_profit: str
-        unrealized_pnl: str
-        total_profit: str
-        total_profit_pnl: str
-        avg_cost: str
-        avg_sold: str
-        buy_30d: int
-        sell_30d: int
-        sells: int
-        price: str
-        cost: str
-        position_percent: str
-        last_active_timestamp: int
-        history_sold_income: str
-        history_bought_cost: str
+    TokenInfo = HoldingToken
+    HoldingInfo = Holding
 
     async def get_wallet_holdings(
         self,
@@ -420,45 +375,172 @@ class GMGNScanService:
                 "sellout": str(sellout).lower(),
                 "hide_abnormal": str(hide_abnormal).lower()
             }
-            data = await self._make_request(f"/api/v1/wallet_holdings/{chain}/{address}", params)
-            return data["holdings"]
+            data = await self._make_request(f"/api/v1/wallet_holdings/{chain}/{address}", params, HoldingsData)
+            return data.holdings
         except Exception as error:
             self.logger.error(f"Failed to get wallet holdings: {str(error)}")
             raise Exception(f"Failed to get wallet holdings: {str(error)}") 
 
-    class TokenSecurityInfo(TypedDict):
-        address: str
-        is_show_alert: bool
-        top_10_holder_rate: str
-        renounced_mint: bool
-        renounced_freeze_account: bool
-        burn_ratio: str
-        burn_status: str
-        dev_token_burn_amount: str
-        dev_token_burn_ratio: str
- 
-        
+    async def iter_wallet_holdings(
+        self,
+        chain: str,
+        address: str,
+        max_holdings: Optional[int] = None,
+        page_size: int = 100,
+        orderby: str = "last_active_timestamp",
+        direction: str = "desc",
+        showsmall: bool = False,
+        sellout: bool = False,
+        hide_abnormal: bool = False
+    ) -> AsyncIterator[List[HoldingInfo]]:
+        """Yield pages of wallet token holdings following the API cursor
+
+        The cursor makes pages strictly sequential, so the request for the
+        next page is issued before the current page is yielded, overlapping
+        upstream latency with the caller's processing.
+
+        Args:
+            max_holdings: Stop after this many holdings (None for all)
+            page_size: Number of holdings per request (max 100)
+        """
+        endpoint = f"/api/v1/wallet_holdings/{chain}/{address}"
+        params = {
+            "limit": page_size,
+            "orderby": orderby,
+            "direction": direction,
+            "showsmall": str(showsmall).lower(),
+            "sellout": str(sellout).lower(),
+            "hide_abnormal": str(hide_abnormal).lower()
+        }
+        remaining = max_holdings
+        seen_cursors = set()
+        pending = asyncio.create_task(self._make_request(endpoint, params, HoldingsData))
+        try:
+            while pending is not None:
+                data = await pending
+                pending = None
+
+                holdings = data.holdings
+                if remaining is not None:
+                    holdings = holdings[:remaining]
+                    remaining -= len(holdings)
+
+                cursor = data.next
+                if cursor and holdings and cursor not in seen_cursors and (remaining is None or remaining > 0):
+                    seen_cursors.add(cursor)
+                    pending = asyncio.create_task(
+                        self._make_request(endpoint, {**params, "cursor": cursor}, HoldingsData)
+                    )
+
+                if holdings:
+                    yield holdings
+        except Exception as error:
+            self.logger.error(f"Failed to get wallet holdings: {str(error)}")
+            raise Exception(f"Failed to get wallet holdings: {str(error)}")
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    TokenSecurityInfo = TokenSecurity
+
     async def get_token_security(self, chain: str, token_address: str) -> TokenSecurityInfo:
-        """Get token security information"""
+        """Get token security information
+
+        Permanent misses, such as an unknown token or unsupported chain, are
+        cached for TOKEN_SECURITY_ERROR_TTL; any other failure is raised uncached.
+        """
+        cached = self.security_cache.get(f"{chain}:{token_address}")
+        if cached is not None:
+            if "error" in cached:
+                raise Exception(cached["error"])
+            return cached["info"]
+
         try:
-            data = await self._make_request(f"/api/v1/token_security_{chain}/{chain}/{token_address}", {})
-            self.logger.info(f"Token security data retrieved for {token_address}: {data}")
-            
-            # Ensure all keys are present, using .get() with default None
-            security_info = {
-                "address": data.get("address"),
-                "is_show_alert": data.get("is_show_alert"),
-                "top_10_holder_rate": data.get("top_10_holder_rate"),
-                "renounced_mint": data.get("renounced_mint"),
-                "renounced_freeze_account": data.get("renounced_freeze_account"),
-                "burn_ratio": data.get("burn_ratio"),
-                "burn_status": data.get("burn_status"),
-                "dev_token_burn_amount": data.get("dev_token_burn_amount"),
-                "dev_token_burn_ratio": data.get("dev_token_burn_ratio"),
-           
-            }
+            security_info = await self._make_request(
+                f"/api/v1/token_security_{chain}/{chain}/{token_address}", {}, TokenSecurity
+            )
+            self.logger.info(f"Token security data retrieved for {token_address}: {security_info}")
             
+            self.security_cache.set(f"{chain}:{token_address}", {"info": security_info})
             return security_info
         except Exception as error:
-            self.logger.error(f"Failed to get token security info for {token_address}: {str(error)}")
-            raise Exception(f"Failed to get token security info for {token_address}: {str(error)}") 
\ No newline at end of file
+            error_msg = f"Failed to get token security info for {token_address}: {str(error)}"
+            self.logger.error(error_msg)
+            if not isinstance(error, UpstreamError) or error.kind != PERMANENT:
+                # Rate limits, outages, deadlines and cancellations say nothing
+                # about the token, so the next call should ask again
+                raise
+            self.security_cache.set(f"{chain}:{token_address}", {"error": error_msg}, ttl=self.security_error_ttl)
+            raise Exception(error_msg)
+
+    async def screen_token_security(
+        self,
+        chain: str,
+        token_addresses: List[str],
+        concurrency: int = 8
+    ) -> Dict[str, Dict[str, Any]]:
+        """Get security information for many tokens concurrently
+
+        Args:
+            chain: Chain name (e.g. sol)
+            token_addresses: Token addresses to screen, duplicates are checked once
+            concurrency: Maximum number of upstream requests in flight
+
+        Returns:
+            {"results": {address: TokenSecurityInfo}, "errors": {address: message}}
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        results: Dict[str, GMGNScanService.TokenSecurityInfo] = {}
+        errors: Dict[str, str] = {}
+
+        async def screen(token_address: str):
+            async with semaphore:
+                try:
+                    results[token_address] = await self.get_token_security(chain, token_address)
+                except Exception as error:
+                    errors[token_address] = str(error)
+
+        await asyncio.gather(*(screen(address) for address in dict.fromkeys(token_addresses)))
+        return {"results": results, "errors": errors}
+
+    async def enrich_pairs(
+        self,
+        chain: str,
+        pairs: List[Pair],
+        resolution: KlineResolution,
+        from_time: int,
+        to_time: int,
+        concurrency: int = 8
+    ) -> List[EnrichedPair]:
+        """Attach token security and kline data to pairs from get_new_pairs
+
+        Every lookup runs concurrently under a shared limit. A failed lookup
+        leaves its field as None and records the message under "errors", so
+        one bad token never fails the whole batch.
+
+        Returns:
+            One EnrichedPair per pair, in the order given
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def limited(coro):
+            async with semaphore:
+                return await coro
+
+        async def enrich(pair: Pair) -> EnrichedPair:
+            security, klines = await asyncio.gather(
+                limited(self.get_token_security(chain, pair.address)),
+                limited(self.get_token_kline(chain, pair.address, resolution, from_time, to_time)),
+                return_exceptions=True
+            )
+            errors = {}
+            if isinstance(security, Exception):
+                errors["security"] = str(security)
+                security = None
+            if isinstance(klines, Exception):
+                errors["klines"] = str(klines)
+                klines = None
+            return EnrichedPair(pair=pair, security=security, klines=klines, errors=errors)
+
+        return list(await asyncio.gather(*(enrich(pair) for pair in pairs)))
+ 
\ No newline at end of file
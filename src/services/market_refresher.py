@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger('MarketRefresher')
+
+
+@dataclass
+class Snapshot:
+    data: Any
+    fetched_at: float
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+
+@dataclass
+class _Feed:
+    fetch: Callable[[], Awaitable[Any]]
+    on_update: Optional[Callable[[Any], None]] = None
+    snapshot: Optional[Snapshot] = None
+    last_requested: float = field(default_factory=time.time)
+    interval: float = 0
+    wake: asyncio.Event = field(default_factory=asyncio.Event)
+    task: Optional[asyncio.Task] = None
+
+
+class MarketRefresher:
+    """Keep warm snapshots of popular market lists in memory
+
+    Each registered feed is polled by its own background task. While the feed
+    is being asked for, it is refreshed every `interval` seconds; once nobody
+    has requested it for `idle_after` seconds the poll interval doubles on
+    every round up to `max_interval`. The next request wakes the poller again.
+    """
+
+    def __init__(
+        self,
+        interval: float = 15,
+        max_interval: float = 300,
+        idle_after: float = 120,
+        max_age: Optional[float] = None
+    ):
+        self.interval = interval
+        self.max_interval = max_interval
+        self.idle_after = idle_after
+        self.max_age = max_age if max_age is not None else interval * 2
+        self.feeds: Dict[str, _Feed] = {}
+
+    def register(
+        self,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        on_update: Optional[Callable[[Any], None]] = None
+    ) -> None:
+        """Register a feed
+
+        `fetch` is called with no arguments on every poll and `on_update`, if
+        given, receives each successfully fetched result.
+        """
+        self.feeds[key] = _Feed(fetch=fetch, on_update=on_update, interval=self.interval)
+
+    def get(self, key: str) -> Optional[Snapshot]:
+        """Return the latest snapshot for `key` if it is fresh enough
+
+        Every call counts as demand for the feed, so an idle poller that has
+        backed off is woken up and goes back to the base interval.
+        """
+        feed = self.feeds.get(key)
+        if feed is None:
+            return None
+
+        feed.last_requested = time.time()
+        if feed.interval > self.interval:
+            feed.interval = self.interval
+            feed.wake.set()
+
+        snapshot = feed.snapshot
+        if snapshot is None or snapshot.age > self.max_age:
+            return None
+        return snapshot
+
+    def start(self) -> None:
+        for key, feed in self.feeds.items():
+            if feed.task is None or feed.task.done():
+                feed.task = asyncio.create_task(self._poll(key, feed))
+
+    async def stop(self) -> None:
+        tasks = [feed.task for feed in self.feeds.values() if feed.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for feed in self.feeds.values():
+            feed.task = None
+
+    def _next_interval(self, feed: _Feed) -> float:
+        idle = time.time() - feed.last_requested
+        if idle < self.idle_after:
+            return self.interval
+        return min(feed.interval * 2, self.max_interval)
+
+    async def _poll(self, key: str, feed: _Feed) -> None:
+        while True:
+            try:
+                data = await feed.fetch()
+                feed.snapshot = Snapshot(data=data, fetched_at=time.time())
+                if feed.on_update is not None:
+                    feed.on_update(data)
+                logger.debug(f"Refreshed {key}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.warning(f"Failed to refresh {key}: {str(error)}")
+
+            feed.interval = self._next_interval(feed)
+            feed.wake.clear()
+            try:
+                await asyncio.wait_for(feed.wake.wait(), timeout=feed.interval)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,77 @@
+import hashlib
+import struct
+from typing import Optional, Tuple
+
+# Metaplex Token Metadata program, which holds names and symbols of classic SPL mints
+METADATA_PROGRAM_ID = "metaqbxxUerdq28cj1RbAWkYQm3ybzjb6a8bt518x1s"
+
+_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+# Curve25519 field prime and Edwards curve constant d
+_P = 2 ** 255 - 19
+_D = -121665 * pow(121666, _P - 2, _P) % _P
+
+
+def b58decode(text: str) -> bytes:
+    value = 0
+    for char in text:
+        value = value * 58 + _ALPHABET.index(char)
+    body = value.to_bytes((value.bit_length() + 7) // 8, "big")
+    return b"\0" * (len(text) - len(text.lstrip("1"))) + body
+
+
+def b58encode(data: bytes) -> str:
+    value = int.from_bytes(data, "big")
+    text = ""
+    while value:
+        value, digit = divmod(value, 58)
+        text = _ALPHABET[digit] + text
+    return "1" * (len(data) - len(data.lstrip(b"\0"))) + text
+
+
+def _on_curve(point: bytes) -> bool:
+    """Whether 32 bytes decode to an ed25519 point, as Solana checks for PDAs"""
+    y = int.from_bytes(point, "little") & ((1 << 255) - 1)
+    if y >= _P:
+        return False
+    y2 = y * y % _P
+    x2 = (y2 - 1) * pow(_D * y2 + 1, _P - 2, _P) % _P
+    # x² must be a square mod p (Euler's criterion)
+    return x2 == 0 or pow(x2, (_P - 1) // 2, _P) == 1
+
+
+def find_program_address(seeds: Tuple[bytes, ...], program_id: str) -> str:
+    """The program-derived address for `seeds`, trying bump seeds from 255 down"""
+    program = b58decode(program_id)
+    for bump in range(255, -1, -1):
+        digest = hashlib.sha256(b"".join(seeds) + bytes([bump]) + program + b"ProgramDerivedAddress").digest()
+        if not _on_curve(digest):
+            return b58encode(digest)
+    raise ValueError("No viable bump seed")
+
+
+def metadata_address(mint: str) -> str:
+    """The Metaplex metadata account of a mint"""
+    program = b58decode(METADATA_PROGRAM_ID)
+    return find_program_address((b"metadata", program, b58decode(mint)), METADATA_PROGRAM_ID)
+
+
+def _borsh_string(data: bytes, offset: int) -> Tuple[str, int]:
+    (length,) = struct.unpack_from("<I", data, offset)
+    offset += 4
+    # Fixed-size fields are padded with NULs
+    return data[offset:offset + length].decode("utf-8", errors="replace").rstrip("\0").strip(), offset + length
+
+
+def parse_metadata(data: bytes) -> Optional[Tuple[str, str]]:
+    """(name, symbol) from a Metaplex metadata account, or None if it does not parse
+
+    The layout starts with a key byte, the update authority and the mint
+    (32 bytes each), then the name and symbol as Borsh strings.
+    """
+    try:
+        name, offset = _borsh_string(data, 1 + 32 + 32)
+        symbol, _ = _borsh_string(data, offset)
+    except (struct.error, ValueError):
+        return None
+    return name, symbol
@@ -0,0 +1,48 @@
+from typing import List, Optional, Tuple
+
+from eth_abi import decode, encode
+
+MULTICALL3 = "0xcA11bde05977b3631167028862bE2a173976CA11"
+AGGREGATE3_SELECTOR = bytes.fromhex("82ad56cb")  # aggregate3((address,bool,bytes)[])
+
+BALANCE_OF_SELECTOR = bytes.fromhex("70a08231")  # balanceOf(address)
+DECIMALS_SELECTOR = bytes.fromhex("313ce567")  # decimals()
+SYMBOL_SELECTOR = bytes.fromhex("95d89b41")  # symbol()
+
+
+def encode_aggregate3(calls: List[Tuple[str, bytes]]) -> str:
+    """Calldata for Multicall3.aggregate3 running (target, calldata) pairs
+
+    Every call is allowed to fail, so one broken token does not revert the
+    whole batch.
+    """
+    payload = encode(["(address,bool,bytes)[]"], [[(target, True, data) for target, data in calls]])
+    return "0x" + (AGGREGATE3_SELECTOR + payload).hex()
+
+
+def decode_aggregate3(data: bytes) -> List[Optional[bytes]]:
+    """Return data per call from an aggregate3 result, None where a call failed"""
+    (results,) = decode(["(bool,bytes)[]"], data)
+    return [return_data if success else None for success, return_data in results]
+
+
+def balance_of_call(owner: str) -> bytes:
+    return BALANCE_OF_SELECTOR + encode(["address"], [owner])
+
+
+def decode_uint(data: Optional[bytes]) -> Optional[int]:
+    if not data or len(data) < 32:
+        return None
+    return int.from_bytes(data[:32], "big")
+
+
+def decode_symbol(data: Optional[bytes]) -> str:
+    """ERC20 symbol as a string, or as bytes32 for older tokens such as MKR"""
+    if not data:
+        return ""
+    if len(data) == 32:
+        return data.rstrip(b"\0").decode("utf-8", errors="replace")
+    try:
+        return decode(["string"], data)[0]
+    except Exception:
+        return ""
@@ -0,0 +1,170 @@
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from curl_cffi import requests
+
+from services.deadline import request_timeout
+
+logger = logging.getLogger('ProxyPool')
+
+# Status codes that mean the egress IP itself is being throttled or challenged
+BLOCKED_STATUS_CODES = (403, 429)
+
+# curl_cffi's own default, used when no tool call deadline is tighter
+DEFAULT_TIMEOUT = 30
+
+
+@dataclass
+class Proxy:
+    url: Optional[str]
+    in_flight: int = 0
+    served: int = 0
+    error_rate: float = 0
+    latency: float = 0
+    ejected_until: float = 0
+    _local: threading.local = field(default_factory=threading.local, repr=False)
+
+    @property
+    def label(self) -> str:
+        if self.url is None:
+            return "direct"
+        # Host and port only, never the credentials
+        return urlsplit(self.url).netloc.rsplit("@", 1)[-1]
+
+    @property
+    def proxies(self) -> Optional[Dict[str, str]]:
+        return {"http": self.url, "https": self.url} if self.url else None
+
+    def session(self) -> requests.Session:
+        """Per-thread session through this proxy, so connections are reused
+
+        curl_cffi sessions are not safe to share between threads, and requests
+        run in executor threads, hence one session per (proxy, thread).
+        """
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session(proxies=self.proxies)
+            self._local.session = session
+        return session
+
+
+class ProxyPool:
+    """Spread requests over several egress proxies and eject unhealthy ones
+
+    Each proxy tracks an exponentially weighted error rate and latency. Once a
+    proxy has served `min_samples` requests and its error rate exceeds
+    `max_error_rate` it is skipped for `eject_seconds`, then put back on
+    probation with its error rate halved.
+    """
+
+    def __init__(
+        self,
+        urls: List[Optional[str]],
+        strategy: str = "least_loaded",
+        max_error_rate: float = 0.5,
+        min_samples: int = 5,
+        eject_seconds: float = 60,
+        decay: float = 0.2
+    ):
+        if strategy not in ("least_loaded", "round_robin"):
+            raise ValueError(f"Unknown proxy strategy: {strategy}")
+        self.proxies = [Proxy(url=url) for url in (urls or [None])]
+        self.strategy = strategy
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+        self.eject_seconds = eject_seconds
+        self.decay = decay
+        self._next = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ProxyPool":
+        """Build a pool from PROXY_POOL, falling back to the single PROXY_* proxy"""
+        urls = [url.strip() for url in os.getenv("PROXY_POOL", "").split(",") if url.strip()]
+        if not urls:
+            username = os.getenv('PROXY_USERNAME')
+            password = os.getenv('PROXY_PASSWORD')
+            proxy_host = os.getenv('PROXY_HOST')
+            proxy_port = os.getenv('PROXY_PORT')
+            if all([username, password]):
+                urls = [f'http://{username}:{password}@{proxy_host}:{proxy_port}']
+            else:
+                logger.warning("Proxy credentials not found in environment variables")
+        return cls(
+            urls,
+            strategy=os.getenv("PROXY_POOL_STRATEGY", "least_loaded"),
+            eject_seconds=float(os.getenv("PROXY_EJECT_SECONDS", "60"))
+        )
+
+    def acquire(self) -> Proxy:
+        with self._lock:
+            now = time.time()
+            healthy = [proxy for proxy in self.proxies if proxy.ejected_until <= now]
+            if not healthy:
+                # Everything is ejected; use the proxy that comes back soonest
+                proxy = min(self.proxies, key=lambda p: p.ejected_until)
+            elif self.strategy == "round_robin":
+                proxy = healthy[self._next % len(healthy)]
+                self._next += 1
+            else:
+                proxy = min(healthy, key=lambda p: (p.in_flight, p.error_rate, p.latency))
+            proxy.in_flight += 1
+            return proxy
+
+    def release(self, proxy: Proxy, ok: bool, latency: float) -> None:
+        with self._lock:
+            proxy.in_flight -= 1
+            proxy.served += 1
+            proxy.error_rate += self.decay * ((0 if ok else 1) - proxy.error_rate)
+            proxy.latency = latency if proxy.served == 1 else proxy.latency + self.decay * (latency - proxy.latency)
+            if proxy.served >= self.min_samples and proxy.error_rate > self.max_error_rate:
+                proxy.ejected_until = time.time() + self.eject_seconds
+                proxy.error_rate /= 2
+                logger.warning(f"Ejecting proxy {proxy.label} for {self.eject_seconds}s")
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """Blocking GET through the next proxy, recording its outcome
+
+        The timeout is capped by the deadline of the current tool call.
+        """
+        kwargs.setdefault("timeout", request_timeout(DEFAULT_TIMEOUT))
+        proxy = self.acquire()
+        start = time.monotonic()
+        try:
+            response = proxy.session().get(url, **kwargs)
+        except Exception:
+            self.release(proxy, ok=False, latency=time.monotonic() - start)
+            raise
+        ok = response.status_code < 500 and response.status_code not in BLOCKED_STATUS_CODES
+        self.release(proxy, ok=ok, latency=time.monotonic() - start)
+        return response
+
+    def stats(self) -> List[Dict[str, object]]:
+        with self._lock:
+            now = time.time()
+            return [
+                {
+                    "proxy": proxy.label,
+                    "in_flight": proxy.in_flight,
+                    "served": proxy.served,
+                    "error_rate": round(proxy.error_rate, 3),
+                    "latency_ms": round(proxy.latency * 1000, 1),
+                    "ejected": proxy.ejected_until > now,
+                }
+                for proxy in self.proxies
+            ]
+
+
+_shared_pools: Dict[str, ProxyPool] = {}
+
+
+def shared_pool(name: str) -> ProxyPool:
+    """Return the process-wide pool for an upstream, creating it from env"""
+    if name not in _shared_pools:
+        _shared_pools[name] = ProxyPool.from_env()
+    return _shared_pools[name]
@@ -0,0 +1,158 @@
+"""Typed records for pair, holding, security and kline data
+
+Records are msgspec Structs: fixed slots, no per-instance __dict__, and they
+decode straight from upstream payloads with `msgspec.convert`. Numeric fields
+use lax conversion so string-encoded numbers from the APIs become floats.
+Upstream fields without a matching attribute are dropped while decoding.
+
+GMGN's pair and token fields are loosely typed: a number may arrive as a
+string, "", "N/A" or null in any single row. Those fields are left as Any,
+as sent, and parsed with `number` where a value is needed, so one odd row
+can never fail the decode of a whole list.
+"""
+from typing import Any, Optional
+
+import msgspec
+
+
+class TokenInfo(msgspec.Struct, omit_defaults=True):
+    symbol: Optional[str] = None
+    name: Optional[str] = None
+    logo: Optional[str] = None
+    total_supply: Any = None
+    price: Any = None
+    holder_count: Any = None
+    launchpad_status: Any = None
+    price_change_percent1m: Any = None
+    price_change_percent5m: Any = None
+    price_change_percent1h: Any = None
+    burn_ratio: Any = None
+    burn_status: Any = None
+    is_show_alert: Any = False
+    hot_level: Any = 0
+    liquidity: Any = None
+    top_10_holder_rate: Any = None
+    renounced_mint: Any = None
+    renounced_freeze_account: Any = None
+    market_cap: Any = None
+    creator_balance_rate: Any = None
+    creator_token_status: Any = None
+    rat_trader_amount_rate: Any = None
+    bluechip_owner_percentage: Any = None
+    smart_degen_count: Any = None
+    renowned_count: Any = None
+    volume: Any = None
+    swaps: Any = None
+    buys: Any = None
+    sells: Any = None
+    buy_tax: Any = None
+    sell_tax: Any = None
+    is_honeypot: Any = None
+    renounced: Any = None
+    dev_token_burn_amount: Any = None
+    dev_token_burn_ratio: Any = None
+    dexscr_ad: Any = None
+    dexscr_update_link: Any = None
+    cto_flag: Any = None
+    twitter_change_flag: Any = None
+    address: Optional[str] = None
+    social_links: Any = None
+
+
+class Pair(msgspec.Struct, omit_defaults=True):
+    id: Any
+    address: str = msgspec.field(name="base_address")
+    base_token_info: TokenInfo = msgspec.field(default_factory=TokenInfo)
+    quote_reserve: Any = None
+    initial_liquidity: Any = None
+    initial_quote_reserve: Any = None
+    creator: Optional[str] = None
+    pool_type_str: Any = None
+    pool_type: Any = None
+    quote_symbol: Optional[str] = None
+    open_timestamp: Any = None
+    launchpad: Optional[str] = None
+    chain: str = "sol"
+    tvl: Any = None
+
+
+class HoldingToken(msgspec.Struct, omit_defaults=True):
+    address: Optional[str] = None
+    token_address: Optional[str] = None
+    symbol: Optional[str] = None
+    name: Optional[str] = None
+    decimals: Optional[int] = None
+    logo: Optional[str] = None
+    price_change_6h: Any = None
+    is_show_alert: Any = False
+    is_honeypot: Any = None
+
+
+class Holding(msgspec.Struct, omit_defaults=True):
+    token: HoldingToken = msgspec.field(default_factory=HoldingToken)
+    balance: Any = None
+    usd_value: Any = None
+    realized_profit_30d: Any = None
+    realized_profit: Any = None
+    realized_pnl: Any = None
+    realized_pnl_30d: Any = None
+    unrealized_profit: Any = None
+    unrealized_pnl: Any = None
+    total_profit: Any = None
+    total_profit_pnl: Any = None
+    avg_cost: Any = None
+    avg_sold: Any = None
+    buy_30d: Optional[int] = None
+    sell_30d: Optional[int] = None
+    sells: Optional[int] = None
+    price: Any = None
+    cost: Any = None
+    position_percent: Any = None
+    last_active_timestamp: int = 0
+    history_sold_income: Any = None
+    history_bought_cost: Any = None
+
+
+class TokenSecurity(msgspec.Struct, omit_defaults=True):
+    address: Optional[str] = None
+    is_show_alert: Any = None
+    top_10_holder_rate: Any = None
+    renounced_mint: Any = None
+    renounced_freeze_account: Any = None
+    burn_ratio: Any = None
+    burn_status: Any = None
+    dev_token_burn_amount: Any = None
+    dev_token_burn_ratio: Any = None
+
+
+class Kline(msgspec.Struct):
+    time: int
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+
+
+def number(value: Any) -> Optional[float]:
+    """A loosely typed upstream value as a float, or None if it is not a number"""
+    try:
+        return float(value) if value is not None and value != "" else None
+    except (TypeError, ValueError):
+        return None
+
+
+def integer(value: Any) -> Optional[int]:
+    """Like `number`, for counts"""
+    parsed = number(value)
+    return int(parsed) if parsed is not None else None
+
+
+def convert(data: Any, record_type: type) -> Any:
+    """Convert already decoded JSON into records, accepting string numbers"""
+    return msgspec.convert(data, record_type, strict=False)
+
+
+def to_builtins(data: Any) -> Any:
+    """Turn records (or lists/dicts of records) back into plain JSON types"""
+    return msgspec.to_builtins(data)
@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+from curl_cffi.requests.exceptions import RequestException
+
+from services.deadline import current_scope
+
+logger = logging.getLogger('RetryPolicy')
+
+RATE_LIMITED = "rate_limited"
+TRANSIENT = "transient"
+PERMANENT = "permanent"
+
+
+class UpstreamError(Exception):
+    """An upstream failure the service has already classified"""
+
+    def __init__(self, message: str, kind: str = PERMANENT, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.kind = kind
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def error_for_status(status_code: int, headers: Any, body: bytes = b"") -> Optional[UpstreamError]:
+    """Classify a non-2xx HTTP response, or return None for success"""
+    if status_code < 400:
+        return None
+    retry_after = parse_retry_after(headers.get("Retry-After"))
+    if status_code == 429:
+        return UpstreamError("HTTP 429 rate limited", RATE_LIMITED, retry_after)
+    if status_code == 403 and (headers.get("cf-mitigated") or b"Just a moment" in body[:2048]):
+        return UpstreamError("HTTP 403 Cloudflare challenge", RATE_LIMITED, retry_after)
+    if status_code >= 500 or status_code == 408:
+        return UpstreamError(f"HTTP {status_code}", TRANSIENT, retry_after)
+    return UpstreamError(f"HTTP {status_code}", PERMANENT)
+
+
+def classify(error: BaseException) -> Tuple[str, Optional[float]]:
+    if isinstance(error, UpstreamError):
+        return error.kind, error.retry_after
+    if isinstance(error, (httpx.TransportError, RequestException, asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return TRANSIENT, None
+    return PERMANENT, None
+
+
+class RetryPolicy:
+    """Retry rate-limited and transient upstream errors for one host
+
+    Delays use decorrelated jitter (sleep = uniform(base, previous * 3),
+    capped at `max_delay`) and never undercut a Retry-After hint; a hint longer
+    than `max_delay` is passed straight to the caller instead. Retries are
+    paid from a per-host budget that earns `budget_ratio` tokens per first
+    attempt, so a failing upstream sees at most that fraction of extra load.
+    A retry is skipped if its delay would run past the caller's deadline,
+    given as a time.monotonic() timestamp and defaulting to the deadline of
+    the current tool call. Attempts stop once that call is cancelled.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        max_attempts: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 20,
+        budget_ratio: float = 0.2,
+        budget_max: float = 10
+    ):
+        self.host = host
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget_ratio = budget_ratio
+        self.budget_max = budget_max
+        self._budget = budget_max
+        self._lock = threading.Lock()
+
+    def _earn(self) -> None:
+        with self._lock:
+            self._budget = min(self.budget_max, self._budget + self.budget_ratio)
+
+    def _spend(self) -> bool:
+        with self._lock:
+            if self._budget < 1:
+                return False
+            self._budget -= 1
+            return True
+
+    def next_delay(self, error: BaseException, attempt: int, previous: float, deadline: Optional[float]) -> Optional[float]:
+        """Delay before the next attempt, or None if the error must be raised"""
+        kind, retry_after = classify(error)
+        if kind == PERMANENT or attempt >= self.max_attempts:
+            return None
+        delay = min(self.max_delay, random.uniform(self.base_delay, max(self.base_delay, previous * 3)))
+        if retry_after is not None:
+            if retry_after > self.max_delay:
+                return None
+            delay = max(delay, retry_after)
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return None
+        if not self._spend():
+            logger.warning(f"Retry budget for {self.host} exhausted")
+            return None
+        logger.info(f"Retrying {self.host} in {delay:.2f}s after {kind} error: {error}")
+        return delay
+
+    async def call(self, fn: Callable[[], Awaitable[Any]], deadline: Optional[float] = None) -> Any:
+        scope = current_scope()
+        if deadline is None and scope is not None:
+            deadline = scope.deadline
+        self._earn()
+        delay = self.base_delay
+        attempt = 1
+        while True:
+            if scope is not None:
+                scope.check()
+            try:
+                return await fn()
+            except Exception as error:
+                delay = self.next_delay(error, attempt, delay, deadline)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def call_sync(self, fn: Callable[[], Any], deadline: Optional[float] = None) -> Any:
+        scope = current_scope()
+        if deadline is None and scope is not None:
+            deadline = scope.deadline
+        self._earn()
+        delay = self.base_delay
+        attempt = 1
+        while True:
+            if scope is not None:
+                scope.check()
+            try:
+                return fn()
+            except Exception as error:
+                delay = self.next_delay(error, attempt, delay, deadline)
+                if delay is None:
+                    raise
+            if scope is not None:
+                # Wakes early if the call is abandoned while backing off
+                scope.cancelled.wait(delay)
+            else:
+                time.sleep(delay)
+            attempt += 1
+
+
+_policies: Dict[str, RetryPolicy] = {}
+
+
+def retry_policy(host: str) -> RetryPolicy:
+    """Return the process-wide retry policy for an upstream host"""
+    if host not in _policies:
+        _policies[host] = RetryPolicy(host)
+    return _policies[host]
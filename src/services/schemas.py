@@ -0,0 +1,87 @@
+"""Upstream response schemas decoded in one pass from raw bytes
+
+Each decoder parses the HTTP body straight into typed records with msgspec,
+skipping every field the schema does not declare. Decoders are lax so that
+numbers sent as strings are converted instead of rejected. Row fields the
+upstreams fill loosely are Any, so one odd row cannot fail a page; a body
+that still does not match is reported with `schema_error`.
+"""
+from functools import lru_cache
+from typing import Any, Generic, List, Optional, TypeVar
+
+import msgspec
+
+from services.records import Holding, Kline, Pair, TokenSecurity
+from services.retry import UpstreamError
+
+T = TypeVar("T")
+
+
+class GMGNEnvelope(msgspec.Struct, Generic[T]):
+    code: int
+    msg: Optional[str] = None
+    data: Optional[T] = None
+
+
+class NewPairsData(msgspec.Struct):
+    pairs: List[Pair] = []
+
+
+class KlineData(msgspec.Struct):
+    list: List[Kline] = []
+
+
+class HoldingsData(msgspec.Struct):
+    holdings: List[Holding] = []
+    next: Optional[str] = None
+
+
+class AveTreasurePair(msgspec.Struct):
+    pair: str
+    target_token: str
+    # Everything else is read loosely, as for GMGN pairs (see records)
+    chain: Optional[str] = None
+    amm: Any = None
+    reserve1: Any = None
+    init_tvl: Any = None
+    tvl: Any = None
+    token0_symbol: Optional[str] = None
+    token1_symbol: Optional[str] = None
+    token0_logo_url: Optional[str] = None
+    current_price_usd: Any = None
+    holders: Any = None
+    market_cap: Any = None
+    volume_u_24h: Any = None
+    tx_24h_count: Any = None
+    buys_tx_24h_count: Any = None
+    sells_tx_24h_count: Any = None
+    holders_top10_ratio: Any = None
+    dev_balance_ratio_cur: Any = None
+    smart_money_buy_count_24h: Any = None
+
+
+class AveTreasurePage(msgspec.Struct):
+    data: List[AveTreasurePair] = []
+
+
+class AveEnvelope(msgspec.Struct):
+    status: int
+    msg: Optional[str] = None
+    data: Optional[AveTreasurePage] = None
+
+
+@lru_cache(maxsize=None)
+def gmgn_decoder(schema: Any = Any) -> msgspec.json.Decoder:
+    return msgspec.json.Decoder(GMGNEnvelope[schema], strict=False)
+
+
+ave_treasure_decoder = msgspec.json.Decoder(AveEnvelope, strict=False)
+
+
+def schema_error(upstream: str, error: msgspec.ValidationError) -> UpstreamError:
+    """A successful response whose body does not match its schema
+
+    msgspec's message names the offending field, e.g. "Expected `str`, got
+    `null` - at `$.data.data[3].pair`".
+    """
+    return UpstreamError(f"Unexpected {upstream} response: {str(error)}")
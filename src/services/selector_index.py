@@ -0,0 +1,180 @@
+import atexit
+import json
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from eth_abi import decode
+from eth_utils import keccak
+
+from services.abi_views import canonical_signature, canonical_type
+
+logger = logging.getLogger('SelectorIndex')
+
+# Indexed parameters of these types are stored as their keccak hash
+DYNAMIC_TYPES = ("string", "bytes")
+
+
+def _is_hashed_topic(abi_type: str) -> bool:
+    return abi_type in DYNAMIC_TYPES or abi_type.endswith("]") or abi_type.startswith("tuple")
+
+
+def format_value(value: Any, max_length: int = 66) -> str:
+    """Short display form of a decoded ABI value"""
+    if isinstance(value, bytes):
+        text = "0x" + value.hex()
+        return text if len(text) <= max_length else f"{text[:max_length]}… ({len(value)} bytes)"
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(format_value(item, max_length) for item in value) + "]"
+    text = str(value)
+    return text if len(text) <= max_length else f"{text[:max_length]}…"
+
+
+class SelectorIndex:
+    """Persistent 4-byte selector -> function and topic0 -> event index
+
+    Filled from every ABI that passes through the service, so decoding a
+    transaction or log is a dictionary lookup rather than an ABI fetch for
+    its contract. The whole index is held in memory; new entries are queued
+    for a writer thread that stores them in a SQLite table, so the index
+    survives restarts without blocking the event loop. Several functions can
+    share a selector, so each selector keeps every signature seen for it.
+    """
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS selectors ("
+            "selector TEXT NOT NULL, signature TEXT NOT NULL, kind TEXT NOT NULL, entry TEXT NOT NULL, "
+            "PRIMARY KEY (selector, signature))"
+        )
+        self.functions: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.events: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for selector, signature, kind, entry in self._db.execute("SELECT selector, signature, kind, entry FROM selectors"):
+            self._table(kind).setdefault(selector, {})[signature] = json.loads(entry)
+        # Rows waiting for the writer thread, which owns the connection from here on
+        self._queued: List[Tuple[str, str, str, str]] = []
+        self._queue_changed = threading.Condition()
+        self._writer: Optional[threading.Thread] = None
+
+    def _table(self, kind: str) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        return self.functions if kind == "function" else self.events
+
+    def add_abi(self, abi: List[Dict[str, Any]]) -> int:
+        """Index the functions and events of an ABI, returning how many were new"""
+        rows = []
+        for entry in abi:
+            kind = entry.get("type", "function")
+            if kind not in ("function", "event") or (kind == "event" and entry.get("anonymous")):
+                continue
+            signature = canonical_signature(entry)
+            digest = keccak(text=signature)
+            selector = "0x" + (digest[:4] if kind == "function" else digest).hex()
+            if signature in self._table(kind).get(selector, {}):
+                continue
+            self._table(kind).setdefault(selector, {})[signature] = entry
+            rows.append((selector, signature, kind, json.dumps(entry)))
+
+        if rows:
+            with self._queue_changed:
+                self._queued.extend(rows)
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name="selector-index", daemon=True)
+                    self._writer.start()
+                    atexit.register(self.flush)
+                self._queue_changed.notify_all()
+        return len(rows)
+
+    def flush(self, timeout: float = 5) -> bool:
+        """Wait until queued rows are committed, returning False on timeout"""
+        with self._queue_changed:
+            return self._queue_changed.wait_for(lambda: not self._queued, timeout)
+
+    def _write_loop(self) -> None:
+        while True:
+            with self._queue_changed:
+                self._queue_changed.wait_for(lambda: self._queued)
+                batch = list(self._queued)
+            try:
+                self._db.execute("BEGIN")
+                try:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO selectors (selector, signature, kind, entry) VALUES (?, ?, ?, ?)", batch
+                    )
+                except Exception:
+                    self._db.execute("ROLLBACK")
+                    raise
+                self._db.execute("COMMIT")
+            except Exception as error:
+                logger.warning(f"Dropping {len(batch)} selector index writes: {str(error)}")
+            with self._queue_changed:
+                # Rows queued while the batch was being written stay behind it
+                del self._queued[:len(batch)]
+                self._queue_changed.notify_all()
+
+    def decode_input(self, data: str) -> Optional[Dict[str, Any]]:
+        """Decode transaction input, or None if its selector is not indexed
+
+        When several signatures share the selector, the first whose argument
+        types decode the input wins; if none do, the call is still named but
+        `args` is None.
+        """
+        if not data or len(data) < 10:
+            return None
+        candidates = self.functions.get(data[:10].lower())
+        if not candidates:
+            return None
+
+        payload = bytes.fromhex(data[10:])
+        for signature, entry in candidates.items():
+            inputs = entry.get("inputs", [])
+            try:
+                values = decode([canonical_type(param) for param in inputs], payload)
+            except Exception:
+                continue
+            return {
+                "signature": signature,
+                "args": [(param.get("name", ""), format_value(value)) for param, value in zip(inputs, values)]
+            }
+        return {"signature": next(iter(candidates)), "args": None}
+
+    def decode_log(self, topics: List[str], data: str) -> Optional[Dict[str, Any]]:
+        """Decode a log from its topics and data, or None if topic0 is not indexed"""
+        if not topics:
+            return None
+        candidates = self.events.get(topics[0].lower())
+        if not candidates:
+            return None
+
+        payload = bytes.fromhex(data[2:]) if data else b""
+        for signature, entry in candidates.items():
+            inputs = entry.get("inputs", [])
+            indexed = [param for param in inputs if param.get("indexed")]
+            if len(indexed) != len(topics) - 1:
+                continue
+            try:
+                plain = [param for param in inputs if not param.get("indexed")]
+                plain_values = iter(decode([canonical_type(param) for param in plain], payload))
+                topic_values = iter(topics[1:])
+                args = []
+                for param in inputs:
+                    if not param.get("indexed"):
+                        value = format_value(next(plain_values))
+                    elif _is_hashed_topic(param["type"]):
+                        # Only the hash of the value is logged
+                        value = next(topic_values)
+                    else:
+                        value = format_value(decode([param["type"]], bytes.fromhex(next(topic_values)[2:]))[0])
+                    args.append((param.get("name", ""), value))
+            except Exception:
+                continue
+            return {"signature": signature, "args": args}
+        return {"signature": next(iter(candidates)), "args": None}
+
+    def __len__(self) -> int:
+        return sum(len(signatures) for signatures in self.functions.values()) + \
+            sum(len(signatures) for signatures in self.events.values())
@@ -0,0 +1,248 @@
+import asyncio
+import json
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field, fields
+from typing import Any, AsyncIterator, Deque, Dict, Hashable, Optional, Tuple
+
+
+@dataclass
+class SessionLimits:
+    # Share of the upstream slots relative to other busy sessions
+    weight: float = 1
+    # Credits refilled per minute and the most that can be saved up
+    rate: float = 120
+    burst: float = 30
+    # Upstream slots one session may hold at once
+    max_concurrent: int = 4
+
+
+def parse_limits(config: str) -> Tuple[SessionLimits, Dict[str, SessionLimits]]:
+    """Default and per-client limits from JSON
+
+    The format is {"default": {...}, "clients": {"<clientInfo.name>": {...}}}.
+    A client's limits only need the fields that differ from the default.
+    """
+    data = json.loads(config) if config else {}
+    names = {f.name for f in fields(SessionLimits)}
+    default = SessionLimits(**{k: v for k, v in data.get("default", {}).items() if k in names})
+    clients = {
+        client: SessionLimits(**{**default.__dict__, **{k: v for k, v in overrides.items() if k in names}})
+        for client, overrides in data.get("clients", {}).items()
+    }
+    return default, clients
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass(eq=False)
+class _Waiter:
+    start: float
+    future: asyncio.Future
+
+
+@dataclass
+class SessionUsage:
+    session: str
+    client: str
+    limits: SessionLimits
+    credits: float
+    refilled_at: float
+    started_at: float = field(default_factory=time.time)
+    last_call_at: Optional[float] = None
+    calls: int = 0
+    rejected: int = 0
+    cost: float = 0
+    # Disconnected; forgotten as soon as its last call finishes
+    closed: bool = False
+    in_flight: int = 0
+    busy_seconds: float = 0
+    wait_seconds: float = 0
+    tools: Dict[str, int] = field(default_factory=dict)
+    finish_tag: float = 0
+    waiting: Deque[_Waiter] = field(default_factory=deque)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "session": self.session,
+            "client": self.client,
+            "weight": self.limits.weight,
+            "started_at": self.started_at,
+            "last_call_at": self.last_call_at,
+            "calls": self.calls,
+            "rejected": self.rejected,
+            "cost": self.cost,
+            "credits": round(self.credits, 2),
+            "in_flight": self.in_flight,
+            "queued": len(self.waiting),
+            "busy_seconds": round(self.busy_seconds, 3),
+            "wait_seconds": round(self.wait_seconds, 3),
+            "tools": dict(self.tools)
+        }
+
+
+class FairScheduler:
+    """Per-session quotas and weighted fair queuing for upstream-bound tool calls
+
+    Each session spends credits from a token bucket (its client's `rate` per
+    minute, up to `burst`); a call that cannot pay its cost is rejected with
+    QuotaExceeded instead of queuing. Admitted calls share `capacity` slots.
+    When the slots are busy, calls wait in per-session queues and are
+    dispatched by start-time fair queuing: a call's start tag is the later
+    of the scheduler's virtual time and its session's previous finish tag,
+    and each call moves its session's finish tag on by cost / weight. The
+    smallest start tag goes next, so a session that floods the server only
+    lengthens its own queue. No session holds more than `max_concurrent`
+    slots. A session is forgotten when drop_session is called on disconnect,
+    or after `idle_ttl` idle seconds if that never happens. Session keys must
+    not be reused by later sessions.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 16,
+        default_limits: Optional[SessionLimits] = None,
+        client_limits: Optional[Dict[str, SessionLimits]] = None,
+        idle_ttl: float = 3600
+    ):
+        self.capacity = capacity
+        self.default_limits = default_limits or SessionLimits()
+        self.client_limits = client_limits or {}
+        self.idle_ttl = idle_ttl
+        self.sessions: Dict[Hashable, SessionUsage] = {}
+        self.active = 0
+        self.virtual_time = 0.0
+
+    def session(self, key: Hashable, client: str) -> SessionUsage:
+        usage = self.sessions.get(key)
+        if usage is None:
+            self._prune()
+            limits = self.client_limits.get(client, self.default_limits)
+            usage = self.sessions[key] = SessionUsage(
+                session=str(key),
+                client=client,
+                limits=limits,
+                credits=limits.burst,
+                refilled_at=time.monotonic()
+            )
+        return usage
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.idle_ttl
+        for key, usage in list(self.sessions.items()):
+            if not usage.in_flight and not usage.waiting and (usage.last_call_at or usage.started_at) < cutoff:
+                del self.sessions[key]
+
+    def drop_session(self, key: Hashable) -> None:
+        """Forget a disconnected session once it has nothing in flight"""
+        usage = self.sessions.get(key)
+        if usage is None:
+            return
+        usage.closed = True
+        if not usage.in_flight and not usage.waiting:
+            del self.sessions[key]
+
+    def _forget_if_closed(self, usage: SessionUsage) -> None:
+        if usage.closed and not usage.in_flight and not usage.waiting:
+            for key, other in list(self.sessions.items()):
+                if other is usage:
+                    del self.sessions[key]
+
+    def _charge(self, usage: SessionUsage, tool: str, cost: float) -> None:
+        now = time.monotonic()
+        limits = usage.limits
+        usage.credits = min(limits.burst, usage.credits + (now - usage.refilled_at) * limits.rate / 60)
+        usage.refilled_at = now
+        # A call dearer than the whole burst would otherwise never run
+        cost = min(cost, limits.burst)
+        if usage.credits < cost:
+            usage.rejected += 1
+            retry_after = (cost - usage.credits) * 60 / limits.rate if limits.rate > 0 else float("inf")
+            raise QuotaExceeded(
+                f"Session quota exceeded for {tool}: {limits.rate:g} credits/min, burst {limits.burst:g}; "
+                f"retry in {retry_after:.1f}s",
+                retry_after
+            )
+        usage.credits -= cost
+        usage.calls += 1
+        usage.cost += cost
+        usage.last_call_at = time.time()
+        usage.tools[tool] = usage.tools.get(tool, 0) + 1
+
+    def _dispatch(self) -> None:
+        while self.active < self.capacity:
+            best = None
+            for usage in self.sessions.values():
+                if usage.waiting and usage.in_flight < usage.limits.max_concurrent:
+                    if best is None or usage.waiting[0].start < best.waiting[0].start:
+                        best = usage
+            if best is None:
+                return
+            waiter = best.waiting.popleft()
+            if waiter.future.done():
+                # Cancelled while queued
+                continue
+            self.virtual_time = max(self.virtual_time, waiter.start)
+            best.in_flight += 1
+            self.active += 1
+            waiter.future.set_result(None)
+
+    def _release(self, usage: SessionUsage) -> None:
+        usage.in_flight -= 1
+        self.active -= 1
+        self._forget_if_closed(usage)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, key: Hashable, client: str, tool: str, cost: float = 1, queued: bool = True) -> AsyncIterator[None]:
+        """Charge the session for a call and hold an upstream slot while it runs
+
+        With `queued` False the call is only charged and counted, for tools
+        that never leave the process.
+        """
+        usage = self.session(key, client)
+        self._charge(usage, tool, cost)
+        if not queued:
+            yield
+            return
+
+        start = max(self.virtual_time, usage.finish_tag)
+        usage.finish_tag = start + cost / usage.limits.weight
+        waiter = _Waiter(start, asyncio.get_running_loop().create_future())
+        usage.waiting.append(waiter)
+        queued_at = time.monotonic()
+        self._dispatch()
+        try:
+            await waiter.future
+        except BaseException:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted a slot just as the wait was cancelled
+                self._release(usage)
+            else:
+                waiter.future.cancel()
+                if waiter in usage.waiting:
+                    usage.waiting.remove(waiter)
+                self._forget_if_closed(usage)
+            raise
+        finally:
+            usage.wait_seconds += time.monotonic() - queued_at
+
+        began = time.monotonic()
+        try:
+            yield
+        finally:
+            usage.busy_seconds += time.monotonic() - began
+            self._release(usage)
+
+    def usage(self) -> Dict[str, Any]:
+        return {
+            "capacity": self.capacity,
+            "active": self.active,
+            "queued": sum(len(usage.waiting) for usage in self.sessions.values()),
+            "sessions": [usage.snapshot() for usage in self.sessions.values()]
+        }
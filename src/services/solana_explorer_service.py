@@ -1,10 +1,51 @@
+import asyncio
+import base64
 import httpx
 import json
-from typing import Optional, Dict, List, Any
+import os
+from functools import partial
+from typing import Optional, Dict, List, Any, Tuple
+from urllib.parse import urlsplit
 import uuid   
+from services.deadline import request_timeout
+from services.cache_backend import make_cache
+from services.retry import UpstreamError, error_for_status, retry_policy
+from services.token_flows import format_units
+from services.solana_transfers import parse_transfers
+from services.account_watcher import AccountWatcher
+from services.metaplex import metadata_address, parse_metadata
+
+TOKEN_PROGRAM_ID = "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA"
+TOKEN_2022_PROGRAM_ID = "TokenzQdBNbLqP5VEhdkAS6EPFLC1PHnBqCXEpPxuEb"
+
+# getMultipleAccounts accepts at most this many accounts per call
+MULTIPLE_ACCOUNTS_LIMIT = 100
+# getSignaturesForAddress returns at most this many signatures per page
+SIGNATURES_PAGE_LIMIT = 1000
+# Transfers kept per address in the local history cache
+TRANSFER_CACHE_MAX = 10000
+
 class SolanaExplorerService:
-    def __init__(self):
-        self.base_url = "https://explorer-api.mainnet-beta.solana.com/"
+    def __init__(self, rpc_url: Optional[str] = None, ws_url: Optional[str] = None):
+        self.base_url = rpc_url or "https://explorer-api.mainnet-beta.solana.com/"
+        # Balances of looked-up accounts kept fresh over accountSubscribe, when a websocket is configured
+        self.account_watcher = AccountWatcher(
+            ws_url,
+            read_account=self._read_lamports,
+            max_accounts=int(os.getenv("SOLANA_WATCH_MAX_ACCOUNTS", "200"))
+        ) if ws_url else None
+        self.retry_policy = retry_policy(urlsplit(self.base_url).netloc)
+        # Mint decimals and names rarely change, so they are kept on disk
+        self.mint_cache = make_cache(
+            "solana-mints",
+            ttl=float(os.getenv("SOLANA_MINT_CACHE_TTL", "604800"))
+        )
+        self.mint_negative_ttl = float(os.getenv("SOLANA_MINT_NEGATIVE_TTL", "3600"))
+        # Parsed transfer history per address, extended from its newest signature
+        self.transfer_cache = make_cache(
+            "solana-transfers",
+            ttl=float(os.getenv("SOLANA_TRANSFER_CACHE_TTL", "86400"))
+        )
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:133.0) Gecko/20100101 Firefox/133.0",
             "Accept": "*/*",
@@ -21,6 +62,264 @@ class SolanaExplorerService:
             "Te": "trailers"
         }
 
+    async def _post_batch(self, payload: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        async with httpx.AsyncClient() as client:
+            response = await client.post(self.base_url, headers=self.headers, json=payload, timeout=request_timeout(10))
+            http_error = error_for_status(response.status_code, response.headers, response.content)
+            if http_error is not None:
+                raise http_error
+            return response.json()
+
+    async def _rpc_batch(self, calls: List[Tuple[str, List[Any]]]) -> List[Any]:
+        """Send JSON-RPC calls as one batch request, results in call order"""
+        payload = [
+            {"jsonrpc": "2.0", "id": index, "method": method, "params": params}
+            for index, (method, params) in enumerate(calls)
+        ]
+        replies = await self.retry_policy.call(partial(self._post_batch, payload))
+        if not isinstance(replies, list):
+            raise UpstreamError((replies.get("error") or {}).get("message") or "Invalid JSON-RPC batch response")
+        by_id = {reply.get("id"): reply for reply in replies}
+        results = []
+        for request in payload:
+            reply = by_id.get(request["id"], {})
+            if "result" not in reply:
+                error = reply.get("error") or {}
+                raise UpstreamError(f"{request['method']} failed: {error.get('message', 'no reply')}")
+            results.append(reply["result"])
+        return results
+
+    def remember_mints(self, mints: Dict[str, Dict[str, Any]]) -> None:
+        """Add symbol/name/decimals learnt elsewhere (e.g. GMGN) to the mint table"""
+        known = self.mint_cache.get_many(mints)
+        updates = {
+            mint: {**known.get(mint, {}), **{k: v for k, v in info.items() if v is not None}}
+            for mint, info in mints.items()
+        }
+        if updates:
+            self.mint_cache.set_many(updates)
+
+    async def get_mint_info(self, mints: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Decimals, symbol and name per mint from the mint table
+
+        Mints not yet in the table are read with getMultipleAccounts
+        (jsonParsed) in one batch; Token-2022 mints carry their name and
+        symbol in the token metadata extension. For the rest, classic SPL
+        mints mostly, a second batch reads their Metaplex metadata accounts.
+        Mints still without a name are kept for SOLANA_MINT_NEGATIVE_TTL only,
+        so a name found later (e.g. from GMGN) is not hidden for long.
+        """
+        info = self.mint_cache.get_many(mints)
+        missing = [mint for mint in mints if mint not in info]
+        if not missing:
+            return info
+
+        fetched = {}
+        for mint, account in zip(missing, await self._multiple_accounts(missing, "jsonParsed")):
+            parsed = ((account or {}).get("data") or {})
+            mint_info = parsed.get("parsed", {}).get("info", {}) if isinstance(parsed, dict) else {}
+            metadata = next(
+                (ext.get("state", {}) for ext in mint_info.get("extensions", []) if ext.get("extension") == "tokenMetadata"),
+                {}
+            )
+            fetched[mint] = {
+                "decimals": mint_info.get("decimals"),
+                "symbol": metadata.get("symbol"),
+                "name": metadata.get("name")
+            }
+
+        unnamed = [mint for mint, mint_info in fetched.items() if not mint_info["name"]]
+        if unnamed:
+            accounts = await self._multiple_accounts([metadata_address(mint) for mint in unnamed], "base64")
+            for mint, account in zip(unnamed, accounts):
+                metadata = parse_metadata(base64.b64decode(account["data"][0])) if account else None
+                if metadata:
+                    fetched[mint]["name"], fetched[mint]["symbol"] = metadata
+
+        named = {mint: mint_info for mint, mint_info in fetched.items() if mint_info["name"]}
+        if named:
+            self.mint_cache.set_many(named)
+        if len(named) < len(fetched):
+            self.mint_cache.set_many(
+                {mint: mint_info for mint, mint_info in fetched.items() if mint not in named},
+                ttl=self.mint_negative_ttl
+            )
+        info.update(fetched)
+        return info
+
+    async def _multiple_accounts(self, addresses: List[str], encoding: str) -> List[Optional[Dict[str, Any]]]:
+        """getMultipleAccounts for any number of addresses, in one batch request"""
+        chunks = [addresses[i:i + MULTIPLE_ACCOUNTS_LIMIT] for i in range(0, len(addresses), MULTIPLE_ACCOUNTS_LIMIT)]
+        results = await self._rpc_batch([
+            ("getMultipleAccounts", [chunk, {"encoding": encoding, "commitment": "confirmed"}])
+            for chunk in chunks
+        ])
+        return [account for result in results for account in result["value"]]
+
+    async def get_token_holdings(self, owner: str, include_zero: bool = False) -> List[Dict[str, Any]]:
+        """SPL and Token-2022 balances of a wallet straight from RPC
+
+        Both token programs are queried with getTokenAccountsByOwner in a
+        single batch request; balances of several accounts for the same mint
+        are summed. Largest balances first.
+        """
+        try:
+            results = await self._rpc_batch([
+                ("getTokenAccountsByOwner", [owner, {"programId": program}, {"encoding": "jsonParsed", "commitment": "confirmed"}])
+                for program in (TOKEN_PROGRAM_ID, TOKEN_2022_PROGRAM_ID)
+            ])
+
+            amounts: Dict[str, int] = {}
+            decimals: Dict[str, int] = {}
+            for result in results:
+                for account in result["value"]:
+                    info = account["account"]["data"]["parsed"]["info"]
+                    token_amount = info["tokenAmount"]
+                    amounts[info["mint"]] = amounts.get(info["mint"], 0) + int(token_amount["amount"])
+                    decimals[info["mint"]] = token_amount["decimals"]
+
+            if not include_zero:
+                amounts = {mint: amount for mint, amount in amounts.items() if amount}
+            mints = await self.get_mint_info(list(amounts))
+
+            holdings = [
+                {
+                    "mint": mint,
+                    "symbol": mints.get(mint, {}).get("symbol"),
+                    "name": mints.get(mint, {}).get("name"),
+                    "decimals": decimals[mint],
+                    "amount_raw": amount,
+                    "amount": format_units(amount, decimals[mint])
+                }
+                for mint, amount in amounts.items()
+            ]
+            holdings.sort(key=lambda holding: holding["amount_raw"] / 10 ** holding["decimals"], reverse=True)
+            return holdings
+
+        except Exception as error:
+            raise Exception(f"Failed to get token holdings: {str(error)}")
+
+    async def _crawl_signatures(
+        self,
+        address: str,
+        limit: int,
+        until: Optional[str] = None,
+        before: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Signatures for an address, newest first, paging with `before`"""
+        signatures = []
+        while len(signatures) < limit:
+            page_limit = min(SIGNATURES_PAGE_LIMIT, limit - len(signatures))
+            options = {"limit": page_limit, "commitment": "confirmed"}
+            if until:
+                options["until"] = until
+            if before:
+                options["before"] = before
+            (page,) = await self._rpc_batch([("getSignaturesForAddress", [address, options])])
+            signatures.extend(page)
+            if len(page) < page_limit:
+                break
+            before = page[-1]["signature"]
+        return signatures
+
+    async def _fetch_transfers(
+        self,
+        address: str,
+        signatures: List[Dict[str, Any]],
+        batch_size: int,
+        concurrency: int
+    ) -> List[Dict[str, Any]]:
+        """getTransaction for successful signatures, batched, then parsed"""
+        wanted = [info["signature"] for info in signatures if not info.get("err")]
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(chunk):
+            async with semaphore:
+                return await self._rpc_batch([
+                    ("getTransaction", [signature, {
+                        "encoding": "jsonParsed",
+                        "maxSupportedTransactionVersion": 0,
+                        "commitment": "confirmed"
+                    }])
+                    for signature in chunk
+                ])
+
+        chunks = [wanted[i:i + batch_size] for i in range(0, len(wanted), batch_size)]
+        results = await asyncio.gather(*(fetch(chunk) for chunk in chunks))
+        transfers = []
+        for chunk, transactions in zip(chunks, results):
+            for signature, tx in zip(chunk, transactions):
+                if tx:
+                    transfers.extend(parse_transfers(address, signature, tx))
+        return transfers
+
+    async def get_transfer_history(
+        self,
+        address: str,
+        max_signatures: int = 200,
+        batch_size: int = 25,
+        concurrency: int = 4
+    ) -> Dict[str, Any]:
+        """SOL and SPL transfers of an address, newest first
+
+        The parsed history is cached per address with its newest and oldest
+        signature. Later calls only crawl signatures newer than the cached
+        head (getSignaturesForAddress `until`) and, when `max_signatures`
+        asks for more depth, older than the cached tail. Transactions are
+        fetched with batched getTransaction calls, `batch_size` per request
+        and at most `concurrency` requests in flight. At most
+        TRANSFER_CACHE_MAX transfers are kept; a history cut there is
+        reported as `truncated` and is not crawled further back.
+        """
+        try:
+            # Copied: the memory tier hands out the cached object itself
+            entry = dict(self.transfer_cache.get(address) or {
+                "newest": None, "oldest": None, "signatures": 0, "exhausted": False, "truncated": False, "transfers": []
+            })
+
+            newer = await self._crawl_signatures(address, max_signatures, until=entry["newest"])
+            if entry["newest"] and len(newer) >= max_signatures:
+                # Too much new activity to bridge the gap to the cached head; start over
+                entry = {"newest": None, "oldest": None, "signatures": 0, "exhausted": False, "truncated": False, "transfers": []}
+
+            older = []
+            wanted = max_signatures - entry["signatures"] - len(newer)
+            # A history cut at TRANSFER_CACHE_MAX has no room for older transfers
+            if entry["oldest"] and not entry["exhausted"] and not entry.get("truncated") and wanted > 0:
+                older = await self._crawl_signatures(address, wanted, before=entry["oldest"])
+                entry["exhausted"] = len(older) < wanted
+            elif not entry["newest"]:
+                entry["exhausted"] = len(newer) < max_signatures
+
+            new_transfers, old_transfers = await asyncio.gather(
+                self._fetch_transfers(address, newer, batch_size, concurrency),
+                self._fetch_transfers(address, older, batch_size, concurrency)
+            )
+
+            transfers = new_transfers + entry["transfers"] + old_transfers
+            if len(transfers) > TRANSFER_CACHE_MAX:
+                transfers = transfers[:TRANSFER_CACHE_MAX]
+                entry["truncated"] = True
+            entry.update({
+                "newest": newer[0]["signature"] if newer else entry["newest"],
+                "oldest": older[-1]["signature"] if older else entry["oldest"] or (newer[-1]["signature"] if newer else None),
+                "signatures": entry["signatures"] + len(newer) + len(older),
+                "transfers": transfers
+            })
+            self.transfer_cache.set(address, entry)
+
+            return {
+                "address": address,
+                "signatures": entry["signatures"],
+                "exhausted": entry["exhausted"],
+                "truncated": entry.get("truncated", False),
+                "fetched": len(newer) + len(older),
+                "transfers": transfers
+            }
+
+        except Exception as error:
+            raise Exception(f"Failed to get transfer history: {str(error)}")
+
     async def get_multiple_accounts(self, addresses: List[str]) -> Dict[str, Any]:
         payload = {
             "method": "getMultipleAccounts",
@@ -29,19 +328,38 @@ class SolanaExplorerService:
             "id": str(uuid.uuid4())  
         }
         async with httpx.AsyncClient() as client:
-            response = await client.post(self.base_url, headers=self.headers, json=payload)
+            response = await client.post(self.base_url, headers=self.headers, json=payload, timeout=request_timeout(5))
             response.raise_for_status()
             return response.json()
 
+    async def _read_lamports(self, address: str) -> Tuple[int, int]:
+        """Lamports of an address and the slot they were read at, 0 if it does not exist"""
+        data = await self.get_multiple_accounts([address])
+        account = data["result"]["value"][0]
+        return (account or {}).get("lamports", 0), data["result"]["context"]["slot"]
+
     async def get_address_balance(self, address: str) -> Dict[str, Any]:
+        """SOL balance of an address
+
+        With an account watcher, a looked-up address is watched from then on
+        and later lookups are answered from memory while its subscription is
+        live.
+        """
+        if self.account_watcher is not None:
+            lamports = self.account_watcher.get(address)
+            if lamports is not None:
+                return {"address": address, "balance": str(float(lamports) / 1000000000)}
+
         data = await self.get_multiple_accounts([address])
         if not data or not data.get("result") or not data["result"].get("value") or not data["result"]["value"][0]:
             return None
         
         account_data = data["result"]["value"][0]
         balance = account_data.get("lamports", 0)
+        if self.account_watcher is not None:
+            self.account_watcher.watch(address, balance, data["result"]["context"]["slot"])
         
         return {
             "address": address,
             "balance": str(float(balance) / 1000000000)
-        } 
\ No newline at end of file
+        }
@@ -0,0 +1,75 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+SOL_DECIMALS = 9
+
+SYSTEM_TRANSFER_TYPES = ("transfer", "transferWithSeed")
+TOKEN_PROGRAMS = ("spl-token", "spl-token-2022")
+TOKEN_TRANSFER_TYPES = ("transfer", "transferChecked")
+
+
+def _instructions(tx: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Top-level and inner instructions, in execution order"""
+    inner = {group["index"]: group["instructions"] for group in (tx.get("meta") or {}).get("innerInstructions") or []}
+    ordered = []
+    for index, instruction in enumerate(tx["transaction"]["message"]["instructions"]):
+        ordered.append(instruction)
+        ordered.extend(inner.get(index, []))
+    return ordered
+
+
+def _token_accounts(tx: Dict[str, Any]) -> Dict[str, Tuple[str, Optional[str], int]]:
+    """Token account -> (mint, owner, decimals) from pre/post token balances"""
+    keys = [key["pubkey"] if isinstance(key, dict) else key for key in tx["transaction"]["message"]["accountKeys"]]
+    accounts = {}
+    meta = tx.get("meta") or {}
+    for balance in (meta.get("preTokenBalances") or []) + (meta.get("postTokenBalances") or []):
+        accounts[keys[balance["accountIndex"]]] = (
+            balance["mint"],
+            balance.get("owner"),
+            balance["uiTokenAmount"]["decimals"]
+        )
+    return accounts
+
+
+def parse_transfers(address: str, signature: str, tx: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """SOL and SPL transfers in a jsonParsed transaction that touch `address`
+
+    Token transfers move between token accounts; their owners and mints are
+    looked up in the transaction's token balances, so a wallet matches the
+    transfers of every token account it owns.
+    """
+    accounts = _token_accounts(tx)
+    base = {"signature": signature, "slot": tx.get("slot"), "time": tx.get("blockTime")}
+    transfers = []
+    for instruction in _instructions(tx):
+        parsed = instruction.get("parsed")
+        if not isinstance(parsed, dict):
+            continue
+        kind = parsed.get("type")
+        info = parsed.get("info", {})
+
+        if instruction.get("program") == "system" and kind in SYSTEM_TRANSFER_TYPES:
+            sender, recipient = info.get("source"), info.get("destination")
+            record = {**base, "mint": None, "decimals": SOL_DECIMALS, "amount": int(info.get("lamports", 0))}
+        elif instruction.get("program") in TOKEN_PROGRAMS and kind in TOKEN_TRANSFER_TYPES:
+            source = accounts.get(info.get("source"))
+            destination = accounts.get(info.get("destination"))
+            known = source or destination
+            if known is None:
+                continue
+            sender = source[1] if source else info.get("authority")
+            recipient = destination[1] if destination else info.get("destination")
+            amount = info.get("tokenAmount", {}).get("amount") if kind == "transferChecked" else info.get("amount")
+            record = {**base, "mint": info.get("mint") or known[0], "decimals": known[2], "amount": int(amount or 0)}
+        else:
+            continue
+
+        if address not in (sender, recipient):
+            continue
+        record.update({
+            "from": sender,
+            "to": recipient,
+            "direction": "self" if sender == recipient else "out" if sender == address else "in"
+        })
+        transfers.append(record)
+    return transfers
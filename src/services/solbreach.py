@@ -1,6 +1,7 @@
 import httpx
 import json
 from typing import Optional, Dict, List, Any
+from services.deadline import request_timeout
 
 class SolbeachService:
     def __init__(self):
@@ -25,7 +26,7 @@ class SolbeachService:
     async def get_account_info(self, address: str):
         url = f"{self.base_url}/account/{address}"
         async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=self.headers)
+            response = await client.get(url, headers=self.headers, timeout=request_timeout(5))
             response.raise_for_status()
             return response.json()
 
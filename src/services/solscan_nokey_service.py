@@ -4,6 +4,7 @@ from datetime import datetime
 import logging
 import os
 from pathlib import Path
+from services.deadline import request_timeout
 #this service is not used anymore
 
 log_dir = Path("logs")
@@ -33,7 +34,8 @@ class SolscanService:
             response = await client.get(
                 f"{self.base_url}{endpoint}",
                 params=params,
-                headers=self.headers
+                headers=self.headers,
+                timeout=request_timeout(5)
             )
             response.encoding = 'utf-8'
             data = response.json()
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from pydantic import AnyUrl
+
+from services.records import to_builtins
+
+logger = logging.getLogger('SubscriptionHub')
+
+
+@dataclass
+class _Feed:
+    fetch: Callable[[], Awaitable[Any]]
+    interval: float
+    content: Optional[str] = None
+    updated_at: float = 0
+    # Content as of the last change notification; reads never move it
+    notified: Optional[str] = None
+    subscribers: Set[Any] = field(default_factory=set)
+    task: Optional[asyncio.Task] = None
+
+
+class SubscriptionHub:
+    """Share one upstream poller per resource across all subscribed sessions
+
+    A feed is only polled while it has subscribers. Each poll result is
+    serialized to JSON and subscribers receive a `notifications/resources/updated`
+    message only when that serialized content differs from the content at
+    the previous notification.
+    """
+
+    def __init__(self):
+        self.feeds: Dict[str, _Feed] = {}
+
+    def register(self, uri: str, fetch: Callable[[], Awaitable[Any]], interval: float) -> None:
+        self.feeds[uri] = _Feed(fetch=fetch, interval=interval)
+
+    def _feed(self, uri: str) -> _Feed:
+        feed = self.feeds.get(uri)
+        if feed is None:
+            raise ValueError(f"Unknown resource: {uri}")
+        return feed
+
+    async def read(self, uri: str) -> str:
+        """Return the latest content, fetching once if the feed is not polled"""
+        feed = self._feed(uri)
+        if feed.content is None or time.time() - feed.updated_at > feed.interval:
+            await self._refresh(feed)
+        return feed.content
+
+    def subscribe(self, uri: str, session: Any) -> None:
+        feed = self._feed(uri)
+        feed.subscribers.add(session)
+        if feed.task is None or feed.task.done():
+            # Changes are reported relative to what was last served
+            feed.notified = feed.content
+            feed.task = asyncio.create_task(self._poll(uri, feed))
+
+    def unsubscribe(self, uri: str, session: Any) -> None:
+        feed = self._feed(uri)
+        feed.subscribers.discard(session)
+        if not feed.subscribers and feed.task is not None:
+            feed.task.cancel()
+            feed.task = None
+
+    def drop_session(self, session: Any) -> None:
+        """Remove a closed session from every feed"""
+        for uri, feed in self.feeds.items():
+            if session in feed.subscribers:
+                self.unsubscribe(uri, session)
+
+    async def stop(self) -> None:
+        tasks = [feed.task for feed in self.feeds.values() if feed.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for feed in self.feeds.values():
+            feed.task = None
+            feed.subscribers.clear()
+
+    async def _refresh(self, feed: _Feed) -> None:
+        data = await feed.fetch()
+        feed.content = json.dumps(to_builtins(data), sort_keys=True, default=str)
+        feed.updated_at = time.time()
+
+    async def _poll(self, uri: str, feed: _Feed) -> None:
+        while feed.subscribers:
+            try:
+                await self._refresh(feed)
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.warning(f"Failed to poll {uri}: {str(error)}")
+
+            # Compared with the last notified content rather than the last
+            # fetch, so a change picked up by a read() is still announced
+            changed = feed.notified is not None and feed.content != feed.notified
+            if feed.content is not None:
+                feed.notified = feed.content
+
+            if changed:
+                for session in list(feed.subscribers):
+                    try:
+                        await session.send_resource_updated(AnyUrl(uri))
+                    except Exception as error:
+                        logger.info(f"Dropping subscriber of {uri}: {str(error)}")
+                        feed.subscribers.discard(session)
+
+            await asyncio.sleep(feed.interval)
+        feed.task = None
@@ -0,0 +1,91 @@
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+
+def format_units(raw: int, decimals: int) -> str:
+    """Raw integer token amount as an exact decimal string in whole units"""
+    whole, fraction = divmod(abs(raw), 10 ** decimals)
+    text = str(whole)
+    if fraction:
+        text += "." + str(fraction).rjust(decimals, "0").rstrip("0")
+    return f"-{text}" if raw < 0 else text
+
+
+@dataclass
+class TokenFlow:
+    """Running totals for one token contract, kept in raw integer units"""
+    contract: str
+    symbol: str
+    name: str
+    decimals: int
+    inflow: int = 0
+    outflow: int = 0
+    transfers_in: int = 0
+    transfers_out: int = 0
+    first_timestamp: Optional[int] = None
+    last_timestamp: Optional[int] = None
+    counterparties: Counter = field(default_factory=Counter)
+
+    @property
+    def transfers(self) -> int:
+        return self.transfers_in + self.transfers_out
+
+    def summary(self, top_counterparties: int = 3) -> Dict[str, Any]:
+        return {
+            "contract": self.contract,
+            "symbol": self.symbol,
+            "name": self.name,
+            "decimals": self.decimals,
+            "inflow": format_units(self.inflow, self.decimals),
+            "outflow": format_units(self.outflow, self.decimals),
+            "net": format_units(self.inflow - self.outflow, self.decimals),
+            "transfers_in": self.transfers_in,
+            "transfers_out": self.transfers_out,
+            "counterparty_count": len(self.counterparties),
+            "top_counterparties": self.counterparties.most_common(top_counterparties),
+            "first_timestamp": self.first_timestamp,
+            "last_timestamp": self.last_timestamp,
+        }
+
+
+def aggregate_token_flows(address: str, transfers: Iterable[Dict[str, Any]]) -> List[TokenFlow]:
+    """Fold raw Etherscan `tokentx` rows into one TokenFlow per contract
+
+    Amounts are summed as integers in the token's smallest unit and only
+    scaled by `tokenDecimal` in the summary, so no precision is lost on
+    18-decimal tokens. A transfer from the wallet to itself counts on both
+    sides and nets to zero. Flows are returned busiest first.
+    """
+    wallet = address.lower()
+    flows: Dict[str, TokenFlow] = {}
+    for tx in transfers:
+        contract = tx["contractAddress"].lower()
+        flow = flows.get(contract)
+        if flow is None:
+            flow = flows[contract] = TokenFlow(
+                contract=contract,
+                symbol=tx.get("tokenSymbol", ""),
+                name=tx.get("tokenName", ""),
+                decimals=int(tx.get("tokenDecimal") or 0)
+            )
+
+        value = int(tx.get("value") or 0)
+        sender = tx["from"].lower()
+        recipient = tx["to"].lower()
+        if recipient == wallet:
+            flow.inflow += value
+            flow.transfers_in += 1
+            flow.counterparties[sender] += 1
+        if sender == wallet:
+            flow.outflow += value
+            flow.transfers_out += 1
+            flow.counterparties[recipient] += 1
+
+        timestamp = int(tx["timeStamp"])
+        if flow.first_timestamp is None or timestamp < flow.first_timestamp:
+            flow.first_timestamp = timestamp
+        if flow.last_timestamp is None or timestamp > flow.last_timestamp:
+            flow.last_timestamp = timestamp
+
+    return sorted(flows.values(), key=lambda flow: flow.transfers, reverse=True)
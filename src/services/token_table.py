@@ -0,0 +1,122 @@
+import time
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from services.records import Pair, number
+
+INDEXED_FIELDS = (
+    "market_cap",
+    "liquidity",
+    "volume",
+    "holder_count",
+    "price_change_1h",
+    "open_timestamp",
+)
+
+
+def pair_to_row(pair: Pair, source: str) -> Dict[str, Any]:
+    """Flatten a pair record from GMGN new pairs or the Ave treasure list"""
+    token = pair.base_token_info
+    return {
+        "address": pair.address,
+        "symbol": token.symbol,
+        "name": token.name,
+        "source": source,
+        "chain": pair.chain,
+        "price": number(token.price),
+        "market_cap": number(token.market_cap),
+        "liquidity": number(token.liquidity),
+        "volume": number(token.volume),
+        "holder_count": number(token.holder_count),
+        "price_change_1h": number(token.price_change_percent1h),
+        "open_timestamp": number(pair.open_timestamp),
+    }
+
+
+class TokenTable:
+    """In-memory token rows with sorted secondary indexes for local queries
+
+    Rows are keyed by token address. Every ingest rebuilds one sorted
+    (value, address) index per field in INDEXED_FIELDS, so range filters are
+    two bisects and top-k reads walk an index without sorting. Rows missing a
+    field are left out of that field's index.
+    """
+
+    def __init__(self, row_ttl: float = 900):
+        self.row_ttl = row_ttl
+        self.rows: Dict[str, Dict[str, Any]] = {}
+        self.updated_at: Dict[str, float] = {}
+        self._indexes: Dict[str, Tuple[List[float], List[str]]] = {}
+        self._rebuild()
+
+    def ingest(self, pairs: Iterable[Pair], source: str) -> None:
+        now = time.time()
+        for pair in pairs:
+            row = pair_to_row(pair, source)
+            row["updated_at"] = now
+            self.rows[row["address"]] = row
+        self.updated_at[source] = now
+
+        expired = [address for address, row in self.rows.items() if now - row["updated_at"] > self.row_ttl]
+        for address in expired:
+            del self.rows[address]
+        self._rebuild()
+
+    def is_stale(self, max_age: float) -> bool:
+        return not self.updated_at or time.time() - min(self.updated_at.values()) > max_age
+
+    def _rebuild(self) -> None:
+        for field in INDEXED_FIELDS:
+            entries = sorted(
+                (row[field], address) for address, row in self.rows.items() if row[field] is not None
+            )
+            self._indexes[field] = ([value for value, _ in entries], [address for _, address in entries])
+
+    def _range(self, field: str, minimum: Optional[float], maximum: Optional[float]) -> List[str]:
+        values, addresses = self._indexes[field]
+        start = 0 if minimum is None else bisect_left(values, minimum)
+        end = len(values) if maximum is None else bisect_right(values, maximum)
+        return addresses[start:end]
+
+    def query(
+        self,
+        filters: Optional[List[Tuple[str, Optional[float], Optional[float]]]] = None,
+        sort_by: str = "market_cap",
+        direction: str = "desc",
+        limit: int = 20
+    ) -> List[Dict[str, Any]]:
+        """Run range filters, sort and top-k against the table
+
+        Args:
+            filters: (field, min, max) tuples; None leaves that side open
+            sort_by: Indexed field to order results by
+            direction: Sort direction (asc/desc)
+            limit: Maximum number of rows to return
+        """
+        filters = filters or []
+        for field, _, _ in filters:
+            if field not in INDEXED_FIELDS:
+                raise ValueError(f"Field {field} is not indexed, use one of {', '.join(INDEXED_FIELDS)}")
+        if sort_by not in INDEXED_FIELDS:
+            raise ValueError(f"Field {sort_by} is not indexed, use one of {', '.join(INDEXED_FIELDS)}")
+        if direction not in ("asc", "desc"):
+            raise ValueError(f"Invalid direction {direction}, use asc or desc")
+
+        candidates = None
+        for field, minimum, maximum in filters:
+            matched = set(self._range(field, minimum, maximum))
+            candidates = matched if candidates is None else candidates & matched
+            if not candidates:
+                return []
+
+        _, ordered = self._indexes[sort_by]
+        if direction == "desc":
+            ordered = reversed(ordered)
+
+        results = []
+        for address in ordered:
+            if candidates is None or address in candidates:
+                results.append(self.rows[address])
+                if len(results) >= limit:
+                    break
+        return results
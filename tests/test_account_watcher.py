@@ -0,0 +1,88 @@
+"""AccountWatcher against a local websocket standing in for a Solana RPC node
+
+Run from the repository root:
+
+    python -m unittest discover tests
+"""
+import asyncio
+import json
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from websockets.asyncio.server import serve  # noqa: E402
+
+from services.account_watcher import AccountWatcher  # noqa: E402
+
+ADDRESS = "So11111111111111111111111111111111111111112"
+
+
+async def wait_for(predicate, timeout: float = 5) -> None:
+    async with asyncio.timeout(timeout):
+        while not predicate():
+            await asyncio.sleep(0.01)
+
+
+class AccountWatcherTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.connections = []
+        self.subscribes = []
+        self.server = await serve(self.handler, "127.0.0.1", 0)
+        port = self.server.sockets[0].getsockname()[1]
+
+        # (lamports, slot) served by the HTTP read after each confirmation
+        self.reads = [(100, 5), (700, 20)]
+        self.read_count = 0
+
+        async def read_account(address):
+            self.read_count += 1
+            return self.reads[self.read_count - 1]
+
+        self.watcher = AccountWatcher(f"ws://127.0.0.1:{port}", read_account, reconnect_delay=0.01)
+
+    async def asyncTearDown(self):
+        await self.watcher.stop()
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def handler(self, ws):
+        self.connections.append(ws)
+        async for raw in ws:
+            message = json.loads(raw)
+            if message["method"] != "accountSubscribe":
+                continue
+            self.subscribes.append(message["params"][0])
+            subscription = len(self.subscribes)
+            await ws.send(json.dumps({"jsonrpc": "2.0", "id": message["id"], "result": subscription}))
+            if subscription == 1:
+                await ws.send(json.dumps({
+                    "jsonrpc": "2.0",
+                    "method": "accountNotification",
+                    "params": {
+                        "subscription": subscription,
+                        "result": {"context": {"slot": 10}, "value": {"lamports": 500}}
+                    }
+                }))
+
+    async def test_notification_then_resubscribe_after_disconnect(self):
+        self.watcher.watch(ADDRESS, lamports=1, slot=1)
+        # The seed predates the subscription and is not served
+        self.assertIsNone(self.watcher.get(ADDRESS))
+        self.watcher.start()
+
+        # The slot-10 notification wins over the slot-5 re-read
+        await wait_for(lambda: self.watcher.get(ADDRESS) == 500 and self.read_count == 1)
+        self.assertEqual(self.watcher.get(ADDRESS), 500)
+
+        await self.connections[0].close()
+
+        await wait_for(lambda: self.watcher.get(ADDRESS) == 700)
+        self.assertEqual(len(self.connections), 2)
+        self.assertEqual(self.subscribes, [ADDRESS, ADDRESS])
+        self.assertEqual(self.read_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+"""JSON-RPC batches against canned node replies, and the Etherscan fallback
+
+Run from the repository root:
+
+    python -m unittest discover tests
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+os.environ.setdefault("CACHE_BACKEND", "memory")
+os.environ.setdefault("CACHE_DB_PATH", os.path.join(tempfile.mkdtemp(), "cache.db"))
+
+import httpx  # noqa: E402
+
+from services.eth_rpc import EthRPCClient, RPCError  # noqa: E402
+from services.etherscan_service import EtherscanService  # noqa: E402
+from services.retry import UpstreamError  # noqa: E402
+
+NODE_URL = "http://node.test"
+ADDRESSES = ["0x" + f"{index:040x}" for index in range(1, 4)]
+
+
+def node(reply):
+    """An httpx client whose node answers each batch with `reply(requests)`"""
+    requests = []
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        requests.append(payload)
+        return httpx.Response(200, json=reply(payload))
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handle)), requests
+
+
+def balances_reversed_with_error(payload):
+    """Replies in reverse order, the second call failing"""
+    replies = [
+        {"jsonrpc": "2.0", "id": request["id"], "error": {"code": -32000, "message": "header not found"}}
+        if index == 1
+        else {"jsonrpc": "2.0", "id": request["id"], "result": hex(index + 1)}
+        for index, request in enumerate(payload)
+    ]
+    return replies[::-1]
+
+
+class EthRPCBatchTest(unittest.TestCase):
+    def balance_calls(self):
+        return [("eth_getBalance", [address, "latest"]) for address in ADDRESSES]
+
+    def test_results_follow_call_order(self):
+        client = EthRPCClient(NODE_URL)
+        client._client, requests = node(balances_reversed_with_error)
+
+        results = asyncio.run(client.batch(self.balance_calls(), return_exceptions=True))
+
+        self.assertEqual(len(requests), 1)
+        self.assertEqual(results[0], "0x1")
+        self.assertIsInstance(results[1], RPCError)
+        self.assertEqual(results[1].code, -32000)
+        self.assertEqual(results[2], "0x3")
+
+    def test_item_error_raises_without_return_exceptions(self):
+        client = EthRPCClient(NODE_URL)
+        client._client, _ = node(balances_reversed_with_error)
+
+        with self.assertRaises(RPCError):
+            asyncio.run(client.batch(self.balance_calls()))
+
+    def test_batches_split_at_max_batch_size(self):
+        client = EthRPCClient(NODE_URL, max_batch_size=2)
+        client._client, requests = node(lambda payload: [
+            {"jsonrpc": "2.0", "id": request["id"], "result": request["params"][0]} for request in payload
+        ])
+
+        results = asyncio.run(client.batch(self.balance_calls()))
+
+        self.assertEqual([len(payload) for payload in requests], [2, 1])
+        self.assertEqual(results, ADDRESSES)
+
+    def test_reply_with_unknown_id(self):
+        client = EthRPCClient(NODE_URL)
+        client._client, _ = node(lambda payload: [
+            {"jsonrpc": "2.0", "id": request["id"] + 1000, "result": "0x1"} for request in payload
+        ])
+
+        with self.assertRaises(UpstreamError):
+            asyncio.run(client.batch(self.balance_calls()))
+
+
+class EtherscanFallbackTest(unittest.TestCase):
+    def test_failed_batch_falls_back_to_balancemulti(self):
+        service = EtherscanService("key", rpc_url=NODE_URL)
+        service.rpc._client, requests = node(balances_reversed_with_error)
+        etherscan = []
+
+        async def make_request(params, allow_empty=False):
+            etherscan.append(params)
+            return [{"account": address, "balance": str(10 ** 18)} for address in params["address"].split(",")]
+
+        service._make_request = make_request
+        balances = asyncio.run(service.get_address_balances(ADDRESSES))
+
+        self.assertEqual(len(requests), 1)
+        self.assertEqual([params["action"] for params in etherscan], ["balancemulti"])
+        self.assertEqual([balance["address"] for balance in balances], ADDRESSES)
+        self.assertEqual({balance["balanceInEth"] for balance in balances}, {"1"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+"""Metaplex metadata addresses and names of classic SPL mints
+
+Run from the repository root:
+
+    python -m unittest discover tests
+"""
+import struct
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from services.metaplex import b58decode, b58encode, metadata_address, parse_metadata  # noqa: E402
+
+USDC = "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v"
+
+
+def borsh_string(text: str, size: int) -> bytes:
+    return struct.pack("<I", size) + text.encode().ljust(size, b"\0")
+
+
+class MetaplexTest(unittest.TestCase):
+    def test_base58_round_trip(self):
+        self.assertEqual(b58encode(b58decode(USDC)), USDC)
+        self.assertEqual(b58encode(bytes(32)), "1" * 32)
+
+    def test_metadata_address_of_usdc(self):
+        self.assertEqual(metadata_address(USDC), "5x38Kp4hvdomTCnCrAny4UtMUt5rQBdB6px2K1Ui45Wq")
+
+    def test_parse_metadata(self):
+        data = bytes(1 + 32 + 32) + borsh_string("USD Coin", 32) + borsh_string("USDC", 10) + bytes(200)
+        self.assertEqual(parse_metadata(data), ("USD Coin", "USDC"))
+        self.assertIsNone(parse_metadata(bytes(40)))
+
+
+if __name__ == "__main__":
+    unittest.main()
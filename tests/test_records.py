@@ -0,0 +1,106 @@
+"""Decoding upstream pairs whose fields arrive empty, null or off-type
+
+Run from the repository root:
+
+    python -m unittest discover tests
+"""
+import json
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import msgspec  # noqa: E402
+
+from services.records import number  # noqa: E402
+from services.retry import PERMANENT  # noqa: E402
+from services.schemas import NewPairsData, ave_treasure_decoder, gmgn_decoder, schema_error  # noqa: E402
+from services.token_table import pair_to_row  # noqa: E402
+
+
+def upstream_pair(index: int, **token_info) -> dict:
+    return {
+        "id": index,
+        "base_address": f"Mint{index}",
+        "quote_reserve": "12.5",
+        "initial_liquidity": "100",
+        "initial_quote_reserve": "80",
+        "creator": f"Creator{index}",
+        "pool_type_str": "amm",
+        "pool_type": 1,
+        "quote_symbol": "SOL",
+        "open_timestamp": 1736000000,
+        "base_token_info": {
+            "symbol": f"TKN{index}",
+            "name": f"Token {index}",
+            "price": "0.0000054",
+            "market_cap": "5400",
+            "liquidity": "1200",
+            "holder_count": 150,
+            "price_change_percent1h": "3.5",
+            "is_show_alert": False,
+            "hot_level": 1,
+            "social_links": {"twitter": "x"},
+            **token_info
+        }
+    }
+
+
+class LooseNewPairsTest(unittest.TestCase):
+    def test_odd_values_do_not_fail_the_list(self):
+        body = json.dumps({"code": 0, "data": {"pairs": [
+            upstream_pair(1),
+            upstream_pair(
+                2,
+                price_change_percent1h="",
+                is_show_alert=None,
+                hot_level=None,
+                market_cap="N/A",
+                social_links=None,
+                holder_count=None
+            ),
+        ]}}).encode()
+
+        pairs = gmgn_decoder(NewPairsData).decode(body).data.pairs
+
+        self.assertEqual([pair.address for pair in pairs], ["Mint1", "Mint2"])
+        odd = pairs[1].base_token_info
+        self.assertEqual(odd.market_cap, "N/A")
+        self.assertIsNone(odd.social_links)
+        self.assertIsNone(number(odd.price_change_percent1h))
+        self.assertIsNone(number(odd.market_cap))
+
+        row = pair_to_row(pairs[1], "gmgn")
+        self.assertIsNone(row["market_cap"])
+        self.assertIsNone(row["price_change_1h"])
+        self.assertEqual(row["price"], 0.0000054)
+        self.assertEqual(pair_to_row(pairs[0], "gmgn")["market_cap"], 5400)
+
+
+class LooseAveTreasureTest(unittest.TestCase):
+    def test_odd_values_do_not_fail_the_page(self):
+        body = json.dumps({"status": 1, "data": {"data": [
+            {"pair": "P1", "target_token": "T1", "chain": "solana", "tvl": "300", "holders": "12"},
+            {"pair": "P2", "target_token": "T2", "chain": None, "tvl": "", "holders": None,
+             "market_cap": "N/A", "token0_symbol": None, "current_price_usd": None},
+        ]}}).encode()
+
+        rows = ave_treasure_decoder.decode(body).data.data
+
+        self.assertEqual([row.pair for row in rows], ["P1", "P2"])
+        self.assertEqual(number(rows[0].tvl), 300)
+        self.assertIsNone(number(rows[1].market_cap))
+
+    def test_schema_error_names_the_field(self):
+        body = json.dumps({"status": 1, "data": {"data": [{"pair": None, "target_token": "T1"}]}}).encode()
+        with self.assertRaises(msgspec.ValidationError) as caught:
+            ave_treasure_decoder.decode(body)
+
+        error = schema_error("Ave.ai", caught.exception)
+        self.assertEqual(error.kind, PERMANENT)
+        self.assertIn("$.data.data[0].pair", str(error))
+
+
+if __name__ == "__main__":
+    unittest.main()
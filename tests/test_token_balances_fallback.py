@@ -0,0 +1,56 @@
+"""Request size of get_token_balances on the Etherscan GET fallback
+
+Run from the repository root:
+
+    python -m unittest discover tests
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from urllib.parse import urlencode
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+os.environ.setdefault("CACHE_BACKEND", "memory")
+os.environ.setdefault("CACHE_DB_PATH", os.path.join(tempfile.mkdtemp(), "cache.db"))
+
+from eth_abi import decode, encode  # noqa: E402
+
+from services.etherscan_service import EtherscanService  # noqa: E402
+from services.multicall import AGGREGATE3_SELECTOR  # noqa: E402
+
+# Conservative limit shared by common proxies and servers
+MAX_URL_LENGTH = 8000
+OWNER = "0x" + "11" * 20
+
+
+def aggregate3_result(calldata: str) -> str:
+    """Every inner call succeeding with a balance, decimals or symbol of 1"""
+    (calls,) = decode(["(address,bool,bytes)[]"], bytes.fromhex(calldata[2 + len(AGGREGATE3_SELECTOR) * 2:]))
+    return "0x" + encode(["(bool,bytes)[]"], [[(True, encode(["uint256"], [1])) for _ in calls]]).hex()
+
+
+class TokenBalancesFallbackTest(unittest.TestCase):
+    def test_etherscan_urls_stay_short(self):
+        service = EtherscanService("key")
+        self.assertIsNone(service.rpc)
+        urls = []
+
+        async def make_request(params, allow_empty=False):
+            urls.append(f"{service.base_url}?{urlencode({**params, 'apikey': service.api_key})}")
+            return aggregate3_result(params["data"])
+
+        service._make_request = make_request
+        tokens = ["0x" + f"{index:040x}" for index in range(1, 501)]
+        balances = asyncio.run(service.get_token_balances(OWNER, tokens, chunk_size=500))
+
+        self.assertEqual(len(balances), len(tokens))
+        self.assertGreater(len(urls), 1)
+        self.assertLess(max(map(len, urls)), MAX_URL_LENGTH)
+
+
+if __name__ == "__main__":
+    unittest.main()